@@ -1,9 +1,11 @@
 # agent_models.py
 
-from agents import Agent, ModelSettings, OpenAIChatCompletionsModel
+import re
+
+from agents import Agent, ModelSettings, OpenAIChatCompletionsModel, handoff
 # from agents.extensions.models.litellm_model import LitellmModel
 
-from openai import AsyncAzureOpenAI
+from openai import AsyncAzureOpenAI, DefaultAsyncHttpxClient
 from agent_hackathon.agent_system_prompts import (
     get_coordination_agent,
     get_account_billing_agent_prompt,
@@ -11,23 +13,82 @@ from agent_hackathon.agent_system_prompts import (
     get_order_management_agent_prompt
 )
 
+from agent_hackathon.agent_tools import (
+    check_stock_availability,
+    get_customer_by_identifier,
+    get_order_status,
+    get_order_status_counts,
+    get_orders_by_customer,
+    get_product_by_id,
+    get_spending_summary,
+    get_top_products,
+    search_products,
+    update_customer_name,
+)
+from agent_hackathon.handoff_filters import handoff_input_filter
 from agent_hackathon.utils.config import settings
+from agent_hackathon.utils.model_tiering import TieredModel
+from agent_hackathon.utils.http_transport import shared_async_transport
+from agent_hackathon.utils.rate_limiter import AsyncRateLimitedTransport, get_rate_limiter
+
+# One client per deployment, all chat requests of this process share one rate limiter per deployment
+_azure_clients: dict[str, AsyncAzureOpenAI] = {}
+
+def _azure_client(deployment: str) -> AsyncAzureOpenAI:
+    if deployment not in _azure_clients:
+        # all deployments are on the same endpoint and share one connection pool
+        transport = shared_async_transport()
+        if settings.rate_limit_enabled:
+            chat_rate_limiter = get_rate_limiter(
+                f"chat:{deployment}",
+                requests_per_minute=settings.chat_requests_per_minute,
+                tokens_per_minute=settings.chat_tokens_per_minute,
+                max_concurrency=settings.chat_max_concurrency,
+            )
+            transport = AsyncRateLimitedTransport(chat_rate_limiter, transport)
+
+        _azure_clients[deployment] = AsyncAzureOpenAI(
+            api_key=settings.azure_openai_key,
+            api_version=settings.azure_openai_api_version,
+            azure_endpoint=settings.azure_openai_endpoint,
+            http_client=DefaultAsyncHttpxClient(transport=transport),
+        )
+    return _azure_clients[deployment]
 
 # Create the Async Azure OpenAI client
-azure_client = AsyncAzureOpenAI(
-    api_key=settings.azure_openai_key,
-    api_version=settings.azure_openai_api_version,
-    azure_endpoint=settings.azure_openai_endpoint,
-)
+azure_client = _azure_client(settings.azure_openai_gpt_deployment)
 
 def _azure_model(deployment_env_var: str) -> OpenAIChatCompletionsModel:
     return OpenAIChatCompletionsModel(
         model          = deployment_env_var,
-        openai_client  = azure_client,
+        openai_client  = _azure_client(deployment_env_var),
     )
 
 model_definition = _azure_model(settings.azure_openai_gpt_deployment)
 
+# What the coordinator has to hand off instead of answering itself: order, customer, product and tracking
+# ids, and email addresses (a customer lookup)
+ROUTED_ENTITY_PATTERN = re.compile(r"\b(?:ORD|CUST|PROD|TRK)-?\d+\b|[\w.+-]+@[\w-]+\.[\w.-]+", re.IGNORECASE)
+
+def _agent_model(agent_name: str,
+                 deployment: str | None,
+                 require_tool_call_for: re.Pattern | None = None) -> TieredModel:
+    """
+    Model for one agent: its own deployment (default: AZURE_OPENAI_GPT_DEPLOYMENT), escalating failed turns
+    to the escalation deployment if MODEL_ESCALATION_ENABLED is set and the agent uses a different one.
+    """
+    deployment = deployment or settings.azure_openai_gpt_deployment
+    escalation_deployment = settings.escalation_deployment or settings.azure_openai_gpt_deployment
+    escalate = settings.model_escalation_enabled and deployment != escalation_deployment
+    return TieredModel(
+        agent_name=agent_name,
+        model=_azure_model(deployment),
+        tier=deployment,
+        escalation_model=_azure_model(escalation_deployment) if escalate else None,
+        escalation_tier=escalation_deployment if escalate else None,
+        require_tool_call_for=require_tool_call_for,
+    )
+
 # LiteLLM model definition (for providers other than Azure AI Foundry)
 
 # model = "gemini/gemini-2.0-flash"
@@ -38,8 +99,9 @@ account_billing_agent = Agent(
     name="AccountBillingAgent",
     instructions=get_account_billing_agent_prompt(),
     # TODO(task 4): add tools to read database and answer questions
-    tools=[],
-    model=model_definition,
+    tools=[get_customer_by_identifier, get_orders_by_customer, get_spending_summary, get_order_status_counts,
+           update_customer_name],
+    model=_agent_model("AccountBillingAgent", settings.account_billing_deployment),
     output_type=None
 )
 
@@ -47,8 +109,8 @@ product_support_agent = Agent(
     name="ProductSupportAgent",
     instructions=get_product_support_agent_prompt(),
     # TODO(task 4): add tools to read database and answer questions
-    tools=[],
-    model=model_definition,
+    tools=[search_products, get_product_by_id, check_stock_availability],
+    model=_agent_model("ProductSupportAgent", settings.product_support_deployment),
     output_type=None
 )
 
@@ -56,8 +118,9 @@ order_management_agent = Agent(
     name="OrderManagementAgent",
     instructions=get_order_management_agent_prompt(),
     # TODO(task 4): add tools to read database and answer questions
-    tools=[],
-    model=model_definition,
+    tools=[get_customer_by_identifier, get_order_status, get_orders_by_customer, get_order_status_counts,
+           get_top_products, get_product_by_id, check_stock_availability],
+    model=_agent_model("OrderManagementAgent", settings.order_management_deployment),
     output_type=None
 )
 
@@ -65,12 +128,24 @@ main_agent = Agent(
     name="CustomerSupportCoordinator",
     instructions=get_coordination_agent(),
     # TODO(task 1): add handoffs
-    handoffs=[],
-    model=model_definition,
+    handoffs=[
+        handoff(specialist, input_filter=handoff_input_filter(specialist.name))
+        for specialist in (account_billing_agent, product_support_agent, order_management_agent)
+    ],
+    model=_agent_model("CustomerSupportCoordinator", settings.coordinator_deployment,
+                       require_tool_call_for=ROUTED_ENTITY_PATTERN),
     model_settings=ModelSettings(
         temperature=0.7,
     ),
     output_type=None
 )
 
-# TODO(task 1): Handoff back to the main agent to process complex requests
\ No newline at end of file
+# TODO(task 1): Handoff back to the main agent to process complex requests
+for specialist in (account_billing_agent, product_support_agent, order_management_agent):
+    specialist.handoffs.append(handoff(main_agent, input_filter=handoff_input_filter(main_agent.name)))
+
+# Agents by name, to continue a stored session with the agent that answered last
+agents_by_name: dict[str, Agent] = {
+    agent.name: agent
+    for agent in (main_agent, account_billing_agent, product_support_agent, order_management_agent)
+}
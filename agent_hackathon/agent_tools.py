@@ -3,24 +3,66 @@
 # TODO(task 5): add tools to write database for specialized agents
 
 
-from typing import Optional
+import asyncio
+from datetime import date
+from typing import Any, Callable, List, Literal, Optional
 from loguru import logger
-from agents import function_tool
+from agents import RunContextWrapper, function_tool
+from azure.core.exceptions import ResourceNotFoundError
 from agent_hackathon.data_models import (
     Order,
     Customer,
     Product,
-    SearchResult
+    SearchResult,
+    StockAvailabilityResult,
+    OrderStatusSummary,
+    SpendingSummary,
+    TopProductsSummary,
 )
 from agent_hackathon.utils.database_service import db_service
+from agent_hackathon.utils.prefetcher import CustomerContextPrefetcher
+from agent_hackathon.utils.tool_memoization import ToolFailure, memoized, mutating, on_invalidate
 
 # NOTE:  the function signature is automatically parsed to extract the schema for the tool,
 # and the docstring to extract descriptions for the tool and for individual arguments.
 # For more info see: https://openai.github.io/openai-agents-python/tools/#automatic-argument-and-docstring-parsing
 
+# Read-only tools are @memoized: identical calls within one run return the cached result.
+# Tools that change data are @mutating, which clears that cache after they ran.
+# A read that failed returns a ToolFailure (never cached), "not found" is None or an empty result.
+
+
+def _prefetcher(ctx: RunContextWrapper[Any]) -> Optional[CustomerContextPrefetcher]:
+    """The session's prefetcher, if the frontend passed one in the run context."""
+    context = ctx.context
+    return context.get("prefetcher") if isinstance(context, dict) else None
+
+
+@on_invalidate
+def _invalidate_prefetches(ctx: RunContextWrapper[Any]) -> None:
+    """Prefetched reads may predate the write of a mutating tool."""
+    prefetcher = _prefetcher(ctx)
+    if prefetcher is not None:
+        prefetcher.invalidate()
+
+
+def _failure(message: str, e: Exception) -> ToolFailure:
+    """Log a failed lookup and tell the model that it failed, rather than that nothing was found."""
+    logger.error(f"{message}: {e}")
+    return ToolFailure(f"{message}: {e}. This is a temporary error, the lookup can be retried.")
+
+
+async def _load(ctx: RunContextWrapper[Any], kind: str, key: str, loader: Callable[[str], Any]) -> Any:
+    """Use a prefetched result if there is one, otherwise run the (blocking) loader in a worker thread."""
+    prefetcher = _prefetcher(ctx)
+    if prefetcher is not None:
+        return await prefetcher.get(kind, key, loader)
+    return await asyncio.to_thread(loader, key)
+
 # Order Management Tools
 
 # As an example, one tool is already implemented.
+@memoized
 @function_tool
 def get_order_status(order_id: str) -> Optional[Order]:
     """
@@ -30,7 +72,7 @@ def get_order_status(order_id: str) -> Optional[Order]:
         order_id: The order ID to look up
 
     Returns:
-        Order object if found, None otherwise
+        Order object if found, None otherwise, an error message if the lookup failed
     """
     try:
         logger.info(f"Looking up order: {order_id}")
@@ -41,6 +83,248 @@ def get_order_status(order_id: str) -> Optional[Order]:
 
         return order
 
+    except ResourceNotFoundError:
+        logger.warning(f"Order not found: {order_id}")
+        return None
+    except Exception as e:
+        return _failure(f"Error retrieving order {order_id}", e)
+
+
+@memoized
+@function_tool
+async def get_orders_by_customer(ctx: RunContextWrapper[Any], customer_id: str) -> List[Order]:
+    """
+    Get all orders of a customer.
+
+    Args:
+        customer_id: The customer ID, e.g. CUST001
+
+    Returns:
+        List of the customer's orders, empty if there are none, an error message if the lookup failed
+    """
+    try:
+        logger.info(f"Looking up orders of customer: {customer_id}")
+        return await _load(ctx, "orders", customer_id, db_service.get_orders_by_customer)
+
+    except Exception as e:
+        return _failure(f"Error retrieving orders of customer {customer_id}", e)
+
+
+# Aggregation Tools
+# Prefer these over get_orders_by_customer for counts and sums, the backend returns a small summary.
+
+@memoized
+@function_tool
+async def get_order_status_counts(customer_id: str) -> Optional[OrderStatusSummary]:
+    """
+    Count a customer's orders per status, e.g. to answer "how many of my orders are still pending?".
+
+    Args:
+        customer_id: The customer ID, e.g. CUST001
+
+    Returns:
+        OrderStatusSummary with the total number of orders and the number per status, an error message on error
+    """
+    try:
+        logger.info(f"Counting orders per status of customer: {customer_id}")
+        return await asyncio.to_thread(db_service.get_order_status_counts, customer_id)
+
+    except Exception as e:
+        return _failure(f"Error counting orders of customer {customer_id}", e)
+
+
+@memoized
+@function_tool
+async def get_spending_summary(
+    customer_id: str,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    group_by: Optional[Literal["month", "year"]] = None,
+) -> Optional[SpendingSummary]:
+    """
+    Sum up how much a customer spent, in total and per month or year, e.g. to answer
+    "how much have I spent this year?". Cancelled and returned orders are not counted.
+
+    Args:
+        customer_id: The customer ID, e.g. CUST001
+        start_date: First day to include, as YYYY-MM-DD
+        end_date: Last day to include, as YYYY-MM-DD
+        group_by: Break the total down per "month" (default) or per "year"
+
+    Returns:
+        SpendingSummary with the number of orders, the total and the amount per period, an error message on error
+    """
+    try:
+        logger.info(f"Summarizing spending of customer {customer_id} ({start_date} - {end_date}, per {group_by})")
+        return await asyncio.to_thread(
+            db_service.get_spending_summary,
+            customer_id,
+            start_date=date.fromisoformat(start_date) if start_date else None,
+            end_date=date.fromisoformat(end_date) if end_date else None,
+            group_by=group_by or "month",
+        )
+
+    except Exception as e:
+        return _failure(f"Error summarizing spending of customer {customer_id}", e)
+
+
+@memoized
+@function_tool
+async def get_top_products(customer_id: str, limit: Optional[int] = None) -> Optional[TopProductsSummary]:
+    """
+    Get the products a customer bought most often, by quantity.
+
+    Args:
+        customer_id: The customer ID, e.g. CUST001
+        limit: Maximum number of products to return, 5 if not given
+
+    Returns:
+        TopProductsSummary with product ids, quantities, number of orders and amount spent,
+        an error message on error
+    """
+    try:
+        logger.info(f"Looking up top products of customer: {customer_id}")
+        return await asyncio.to_thread(db_service.get_top_products, customer_id, limit=limit or 5)
+
+    except Exception as e:
+        return _failure(f"Error retrieving top products of customer {customer_id}", e)
+
+
+# Customer Tools
+
+@memoized
+@function_tool
+async def get_customer_by_identifier(ctx: RunContextWrapper[Any], identifier: str) -> Optional[Customer]:
+    """
+    Find a customer by customer ID, email address or full name.
+
+    Args:
+        identifier: The customer ID (e.g. CUST001), email address or full name
+
+    Returns:
+        Customer object if exactly one customer matches, None otherwise, an error message if the lookup failed
+    """
+    try:
+        logger.info(f"Looking up customer: {identifier}")
+        customer = await asyncio.to_thread(db_service.get_customer_by_identifier, identifier)
+
+        prefetcher = _prefetcher(ctx)
+        if customer is not None and prefetcher is not None:
+            # the next questions are almost always about this customer's orders
+            prefetcher.prefetch_customer(customer.customer_id)
+
+        return customer
+
+    except Exception as e:
+        return _failure(f"Error retrieving customer {identifier}", e)
+
+# Product Support Tools
+
+@memoized
+@function_tool
+async def get_product_by_id(ctx: RunContextWrapper[Any], product_id: str) -> Optional[Product]:
+    """
+    Get product details, price and stock count by product ID.
+
+    Args:
+        product_id: The product ID, e.g. PROD001
+
+    Returns:
+        Product object if found, None otherwise, an error message if the lookup failed
+    """
+    try:
+        logger.info(f"Looking up product: {product_id}")
+        return await _load(ctx, "product", product_id, db_service.get_product_by_id)
+
+    except ResourceNotFoundError:
+        logger.warning(f"Product not found: {product_id}")
+        return None
+    except Exception as e:
+        return _failure(f"Error retrieving product {product_id}", e)
+
+@memoized
+@function_tool
+async def check_stock_availability(product_ids: List[str]) -> Optional[StockAvailabilityResult]:
+    """
+    Check stock and price of several products at once, e.g. "are these five items in stock?".
+    Prefer this over calling get_product_by_id for every product.
+
+    Args:
+        product_ids: The product IDs to check, e.g. ["PROD001", "PROD007"]
+
+    Returns:
+        StockAvailabilityResult with stock count, price and in_stock per product and the ids that were not found,
+        an error message on error
+    """
+    try:
+        logger.info(f"Checking stock availability of {len(product_ids)} products: {product_ids}")
+        return await asyncio.to_thread(db_service.get_stock_availability, product_ids)
+
+    except Exception as e:
+        return _failure(f"Error checking stock availability of {product_ids}", e)
+
+@memoized
+@function_tool
+async def search_products(
+    query: str,
+    category: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    in_stock_only: Optional[bool] = None,
+) -> SearchResult:
+    """
+    Search the product catalog by keywords and meaning, optionally narrowed down by structured filters.
+    Prefer the filters over filtering the results yourself, e.g. "laptops under 1000 in stock" becomes
+    query="laptop", category="Laptops", max_price=1000, in_stock_only=True.
+
+    Args:
+        query: Free text describing the wanted product
+        category: Exact product category, e.g. Laptops, Phones, Tablets, Monitors, Audio, Accessories, Storage, Cameras
+        min_price: Minimum price in dollars
+        max_price: Maximum price in dollars
+        in_stock_only: Only return products that are currently in stock
+
+    Returns:
+        SearchResult with the matching products, an error message if the search failed
+    """
+    try:
+        logger.info(f"Searching products: {query} (category={category}, price={min_price}-{max_price}, "
+                    f"in_stock_only={in_stock_only})")
+        # the query embedding may wait for the embedding rate limiter, which blocks its thread
+        products = await asyncio.to_thread(
+            db_service.search_products,
+            query,
+            category=category,
+            min_price=min_price,
+            max_price=max_price,
+            in_stock_only=bool(in_stock_only),
+        )
+        return SearchResult(query=query, products=products, results_count=len(products))
+
+    except Exception as e:
+        return _failure(f"Error searching products for '{query}'", e)
+
+
+# Account Management Tools
+
+@mutating
+@function_tool
+async def update_customer_name(customer_id: str, new_name: str) -> bool:
+    """
+    Change the name of a customer. Only call this after the customer confirmed the new name.
+
+    Args:
+        customer_id: The customer ID, e.g. CUST001
+        new_name: The new full name of the customer
+
+    Returns:
+        True if the name was updated, False otherwise
+    """
+    try:
+        logger.info(f"Updating name of customer {customer_id}")
+        # waits for the search service to acknowledge the write, which must not block the event loop
+        return await asyncio.to_thread(db_service.update_customer_name, customer_id, new_name)
+
     except Exception as e:
-        logger.error(f"Error retrieving order {order_id}: {e}")
-        return None
\ No newline at end of file
+        logger.error(f"Error updating name of customer {customer_id}: {e}")
+        return False
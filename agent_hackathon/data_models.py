@@ -5,7 +5,7 @@ These models provide type safety and validation for our customer support system.
 """
 
 from pydantic import BaseModel, Field, field_validator
-from typing import List, Optional, Literal
+from typing import Dict, List, Optional, Literal
 from datetime import date
 from decimal import Decimal
 
@@ -48,4 +48,53 @@ class SearchResult(BaseModel):
     """Search results containing matching products"""
     query: str
     products: List[Product]
-    results_count: int
\ No newline at end of file
+    results_count: int
+
+class WriteResult(BaseModel):
+    """Acknowledgement of a single (possibly coalesced) write to the search indexes"""
+    index_name: str
+    key: str
+    succeeded: bool
+    status_code: Optional[int] = None
+    error_message: Optional[str] = None
+    coalesced_writes: int = 1  # number of submitted updates that were merged into this write
+
+class StockAvailability(BaseModel):
+    """Stock count and price of one product"""
+    product_id: str
+    stock_count: int
+    price: Decimal = Field(decimal_places=2)
+    in_stock: bool
+
+class StockAvailabilityResult(BaseModel):
+    """Availability of several products, checked with one query"""
+    products: List[StockAvailability]
+    missing_product_ids: List[str]
+
+class OrderStatusSummary(BaseModel):
+    """Number of a customer's orders per status"""
+    customer_id: str
+    total_orders: int
+    status_counts: Dict[str, int]
+
+class SpendingSummary(BaseModel):
+    """A customer's spending, in total and per period"""
+    customer_id: str
+    start_date: Optional[date] = None
+    end_date: Optional[date] = None
+    order_count: int
+    total_spent: Decimal = Field(decimal_places=2)
+    spent_by_period: Dict[str, Decimal]  # "2024" or "2024-05" -> amount
+    excluded_statuses: List[str]
+
+class ProductPurchase(BaseModel):
+    """How often and how much a customer bought of one product"""
+    product_id: str
+    quantity: int
+    order_count: int
+    total_spent: Decimal = Field(decimal_places=2)
+
+class TopProductsSummary(BaseModel):
+    """A customer's most bought products"""
+    customer_id: str
+    products: List[ProductPurchase]
@@ -1,7 +1,9 @@
 import mlflow
 import chainlit as cl
 import asyncio
+import atexit
 from agent_hackathon.agent_models import (
+    agents_by_name,
     main_agent,
     account_billing_agent,
     order_management_agent,
@@ -18,6 +20,15 @@ from agents import (
 )
 from loguru import logger
 import requests
+from agent_hackathon.handoff_filters import HandoffTranscript, log_handoff_filter_stats
+from agent_hackathon.utils.database_service import log_query_stats
+from agent_hackathon.utils.model_tiering import log_model_tier_stats
+from agent_hackathon.utils.http_transport import start_warm_up
+from agent_hackathon.utils.prefetcher import CustomerContextPrefetcher
+from agent_hackathon.utils.session_store import StoredSession, get_session_store, log_session_store_stats
+from agent_hackathon.utils.run_control import RunCancelled, RunHandle, get_run_controller, log_run_control_stats
+from agent_hackathon.utils.rate_limiter import current_session_id, log_rate_limiter_stats
+from agent_hackathon.utils.tool_memoization import log_tool_cache_stats
 
 # Check if MLFlow is running
 tracking_uri = "http://localhost:5000"
@@ -39,40 +50,100 @@ set_tracing_disabled(disabled=True)
 # Load env vars for azure, openai
 from agent_hackathon.utils.config import settings
 
+def log_stats() -> None:
+    """Log the stats of all subsystems, they are process-wide (all sessions of this worker)."""
+    log_rate_limiter_stats()
+    log_model_tier_stats()
+    log_handoff_filter_stats()
+    log_tool_cache_stats()
+    log_query_stats()
+    log_session_store_stats()
+    log_run_control_stats()
+
+async def _log_stats_periodically() -> None:
+    while True:
+        await asyncio.sleep(settings.stats_log_interval_seconds)
+        log_stats()
+
+atexit.register(log_stats)
+_stats_task: asyncio.Task | None = None
+
 @cl.on_chat_start
 async def start():
     """
     Initializes the chat session.
-    Stores the agent and an empty conversation history in the user session.
+    The agent and the conversation history are kept in the session store, keyed by the chat's thread id.
     """
-    cl.user_session.set("agent", main_agent)
-    cl.user_session.set("conversation", [])
+    global _stats_task
+    # open connections to all endpoints while the user is typing the first message
+    start_warm_up()
+    if _stats_task is None and settings.stats_log_interval_seconds > 0:
+        _stats_task = asyncio.create_task(_log_stats_periodically())
+    if settings.prefetch_enabled:
+        cl.user_session.set("prefetcher", CustomerContextPrefetcher(
+            max_concurrency=settings.prefetch_max_concurrency,
+            max_products=settings.prefetch_max_products,
+        ))
+
+@cl.on_chat_end
+async def end():
+    prefetcher: CustomerContextPrefetcher | None = cl.user_session.get("prefetcher")
+    if prefetcher is not None:
+        prefetcher.cancel()
+        prefetcher.log_stats()
+    session_store = get_session_store()
+    if not session_store.persistent:
+        await asyncio.to_thread(session_store.delete, cl.context.session.thread_id)
 
 @cl.on_message
 async def main(message: cl.Message):
-    try:
-        full_conversation: list[TResponseInputItem] = cl.user_session.get("conversation", [])
-        full_conversation.append({"role": "user", "content": message.content})
-        agent: Agent = cl.user_session.get("agent", main_agent)
+    # model requests of this conversation are queued fairly against the other sessions
+    current_session_id.set(cl.context.session.id)
+    session_id = cl.context.session.thread_id
+    session_store = get_session_store()
+    async def respond(run: RunHandle) -> None:
+        # the session as this chat saved it last: its items are only read from the store on the first run
+        # (or when another worker continued the conversation meanwhile)
+        cached: StoredSession | None = cl.user_session.get("stored_session")
+        session = await asyncio.to_thread(session_store.load, session_id, cached)
+        history: list[TResponseInputItem] = await asyncio.to_thread(lambda: session.items) if session else []
+        # run.messages also holds the messages of runs a newer message cancelled
+        full_conversation = [*history, *run.messages]
+        agent: Agent = agents_by_name.get(session.agent_name, main_agent) if session else main_agent
+        prefetcher: CustomerContextPrefetcher | None = cl.user_session.get("prefetcher")
+        if prefetcher is not None:
+            prefetcher.start_run()
         # Send user request to agent and show result
+        transcript = HandoffTranscript.start()
         result = await Runner.run(
             starting_agent=agent,
             input=full_conversation,
-            context={},
+            context={"prefetcher": prefetcher},
             max_turns=20,
+            hooks=run,
         )
+        # the answer is ready, a newer message now waits until it is shown and saved
+        run.finish()
 
         await cl.Message(
             content=result.final_output, author=result.last_agent.name
         ).send()
 
-        full_conversation = result.to_input_list()
-        cl.user_session.set("conversation", full_conversation)
-        # If handoff occured, set agent to new agent
-        cl.user_session.set("agent", result.last_agent)
+        # If handoff occured, continue with the new agent
+        # the full history, a handoff condenses only the specialist's input
+        saved = await asyncio.to_thread(session_store.save, session_id, transcript.input_list(result),
+                                        result.last_agent.name, session)
+        cl.user_session.set("stored_session", saved)
+
+    try:
+        # runs of this conversation wait for each other (or a newer message cancels them) and share
+        # the worker's run slots with the other sessions
+        await get_run_controller().run(session_id, {"role": "user", "content": message.content}, respond)
 
         # TODO(task Bonus): implement handoff to human
 
+    except RunCancelled as e:
+        logger.info(str(e))
     except OpenAIError as e:
         message = f"OpenAI API Error: {e}"
         logger.error(message)
@@ -0,0 +1,187 @@
+# handoff_filters.py
+"""
+Handoff input filters that condense the conversation before it is passed to the next agent.
+
+Without a filter the receiving agent gets the whole transcript, including the previous agent's own
+messages and all tool calls and outputs, and re-tokenizes all of it on every turn. The filter keeps
+only the most recent user turns and replaces everything else with one compact context message that
+lists the identifiers mentioned so far (order, customer and product ids, emails, tracking numbers) and
+a short summary of the previous agent's last reply.
+
+The filtered input also becomes the run's history (`result.to_input_list()`). Only the specialist's
+input should be condensed, not the stored conversation, so the frontends start a HandoffTranscript
+before the run: the filter records the full history in it, and `transcript.input_list(result)` returns
+the full input list to keep for the following turns. The next turn of the session resumes at the
+specialist that answered last, with that full history, so condensing only shrinks the specialist's first
+turn after a handoff.
+
+The filter also times every handoff, from the transfer (when the filter runs, right after the model's
+transfer call) to the receiving agent's first model response: per run in `transcript.handoff_latencies`,
+and in the stats. Handoffs are timed (but not condensed) with HANDOFF_INPUT_FILTER_ENABLED off as well.
+"""
+
+import json
+import re
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, field, replace
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from agents import HandoffInputData, RunResult, TResponseInputItem
+from loguru import logger
+
+from agent_hackathon.utils.config import settings
+from agent_hackathon.utils.model_tiering import on_model_response
+from agent_hackathon.utils.stats import StatsRecorder
+
+CONTEXT_MESSAGE_PREFIX = "Context from the conversation so far"
+IDENTIFIER_PATTERNS = {
+    "order ids": re.compile(r"\bORD\d+\b"),
+    "customer ids": re.compile(r"\bCUST\d+\b"),
+    "product ids": re.compile(r"\bPROD\d+\b"),
+    "tracking numbers": re.compile(r"\bTRK\d+\b"),
+    "emails": re.compile(r"\b[\w.+-]+@[\w-]+\.[\w.-]+\b"),
+}
+LAST_REPLY_MAX_CHARS = 400
+
+
+@dataclass
+class HandoffFilterStats:
+    handoffs: int = 0
+    chars_before: int = 0
+    chars_after: int = 0
+    # handoffs timed up to the receiving agent's first model response, and the total time they took
+    timed_handoffs: int = 0
+    latency_s: float = 0.0
+
+
+# keyed by the name of the receiving agent
+_stats: StatsRecorder[HandoffFilterStats] = StatsRecorder(HandoffFilterStats)
+
+
+@dataclass
+class HandoffTranscript:
+    # full input list up to the last condensed handoff of the run, None while nothing was condensed
+    items: Optional[List[Dict[str, Any]]] = None
+    # (receiving agent, seconds from the transfer to its first model response) of every handoff of the run
+    handoff_latencies: List[Tuple[str, float]] = field(default_factory=list)
+    # the handoff waiting for the receiving agent's first response: (agent name, perf_counter at the transfer)
+    pending_handoff: Optional[Tuple[str, float]] = None
+
+    @classmethod
+    def start(cls) -> "HandoffTranscript":
+        """Record the full history of the next run in this task (and the tasks it starts)."""
+        transcript = cls()
+        _transcript.set(transcript)
+        return transcript
+
+    def input_list(self, result: RunResult) -> List[TResponseInputItem]:
+        """Like `result.to_input_list()`, but with the history as it was before any handoff condensed it."""
+        if self.items is None:
+            return result.to_input_list()
+        return [*self.items, *(item.to_input_item() for item in result.new_items)]
+
+
+_transcript: ContextVar[Optional[HandoffTranscript]] = ContextVar("handoff_transcript", default=None)
+
+
+def _start_handoff_timer(target_agent_name: str) -> None:
+    transcript = _transcript.get()
+    if transcript is not None:
+        transcript.pending_handoff = (target_agent_name, time.perf_counter())
+
+
+@on_model_response
+def _stop_handoff_timer(agent_name: str) -> None:
+    """The agent answered: if it received a handoff of this run, that handoff is complete."""
+    transcript = _transcript.get()
+    if transcript is None or transcript.pending_handoff is None or transcript.pending_handoff[0] != agent_name:
+        return
+    latency = time.perf_counter() - transcript.pending_handoff[1]
+    transcript.pending_handoff = None
+    transcript.handoff_latencies.append((agent_name, latency))
+    with _stats.update(agent_name) as stats:
+        stats.timed_handoffs += 1
+        stats.latency_s += latency
+    logger.info(f"Handoff to {agent_name}: first response after {1000 * latency:.0f}ms")
+
+
+def _item_text(item: Dict[str, Any]) -> str:
+    """Plain text of an input item (message content, tool arguments or tool output)."""
+    content = item.get("content")
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return str(item.get("arguments") or item.get("output") or "")
+
+
+def _size(items: List[Dict[str, Any]]) -> int:
+    return len(json.dumps(items, default=str))
+
+
+def _context_message(items: List[Dict[str, Any]]) -> Dict[str, Any]:
+    text = " ".join(_item_text(item) for item in items)
+    lines = [f"{CONTEXT_MESSAGE_PREFIX} (condensed at handoff):"]
+    for label, pattern in IDENTIFIER_PATTERNS.items():
+        found = list(dict.fromkeys(pattern.findall(text)))
+        if found:
+            lines.append(f"- Known {label}: {', '.join(found)}")
+
+    assistant_replies = [_item_text(item) for item in items if item.get("role") == "assistant" and _item_text(item)]
+    if assistant_replies:
+        last_reply = assistant_replies[-1].replace("\n", " ")
+        if len(last_reply) > LAST_REPLY_MAX_CHARS:
+            last_reply = last_reply[:LAST_REPLY_MAX_CHARS] + "..."
+        lines.append(f"- Last reply to the customer: {last_reply}")
+    return {"role": "system", "content": "\n".join(lines)}
+
+
+def condense_handoff_input(data: HandoffInputData, target_agent_name: str) -> HandoffInputData:
+    """Keep the last user turns plus one context message, drop tool calls and previous agents' messages."""
+    history = data.input_history
+    if isinstance(history, str):
+        history = [{"role": "user", "content": history}]
+    generated = [item.to_input_item() for item in (*data.pre_handoff_items, *data.new_items)]
+    items = list(history) + generated
+
+    transcript = _transcript.get()
+    if transcript is not None:
+        # after an earlier handoff of this run the history is already condensed, extend the recorded one
+        transcript.items = [*(transcript.items if transcript.items is not None else history), *generated]
+
+    user_turns = [item for item in items if item.get("role") == "user"][-settings.handoff_max_user_turns:]
+    condensed = [_context_message(items), *user_turns]
+
+    before, after = _size(items), _size(condensed)
+    with _stats.update(target_agent_name) as stats:
+        stats.handoffs += 1
+        stats.chars_before += before
+        stats.chars_after += after
+    logger.info(f"Handoff to {target_agent_name}: input condensed from {len(items)} items / {before} chars "
+                f"to {len(condensed)} items / {after} chars")
+
+    return replace(data, input_history=tuple(condensed), pre_handoff_items=(), new_items=())
+
+
+def handoff_input_filter(target_agent_name: str) -> Callable[[HandoffInputData], HandoffInputData]:
+    """
+    Input filter for handoffs to `target_agent_name`: times the handoff, and condenses the input unless
+    HANDOFF_INPUT_FILTER_ENABLED is off.
+    """
+    def input_filter(data: HandoffInputData) -> HandoffInputData:
+        _start_handoff_timer(target_agent_name)
+        if not settings.handoff_input_filter_enabled:
+            return data
+        return condense_handoff_input(data, target_agent_name)
+
+    return input_filter
+
+
+def log_handoff_filter_stats() -> None:
+    for target_agent_name, stats in sorted(_stats.snapshot().items()):
+        reduction = 100 * (1 - stats.chars_after / stats.chars_before) if stats.chars_before else 0.0
+        latency_ms = 1000 * stats.latency_s / stats.timed_handoffs if stats.timed_handoffs else 0.0
+        logger.info(f"[handoffs to {target_agent_name}] {stats.handoffs} handoffs, "
+                    f"~{stats.chars_before // 4} -> ~{stats.chars_after // 4} tokens of history "
+                    f"({reduction:.0f}% smaller), mean {latency_ms:.0f}ms to the first response")
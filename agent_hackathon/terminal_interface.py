@@ -1,8 +1,22 @@
 # main.py
+import argparse
+import json
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Set
+
 import mlflow
 import asyncio
 from agent_hackathon.agent_models import main_agent
 from agent_hackathon.utils.debug_agent import log_intermediate_agent_results
+from agent_hackathon.utils.benchmarking import summarize_latencies
+from agent_hackathon.handoff_filters import HandoffTranscript, log_handoff_filter_stats
+from agent_hackathon.utils.database_service import log_query_stats
+from agent_hackathon.utils.model_tiering import log_model_tier_stats
+from agent_hackathon.utils.http_transport import start_warm_up
+from agent_hackathon.utils.prefetcher import CustomerContextPrefetcher
+from agent_hackathon.utils.rate_limiter import current_session_id, log_rate_limiter_stats
+from agent_hackathon.utils.tool_memoization import log_tool_cache_stats
 from openai import AsyncAzureOpenAI, OpenAIError, AuthenticationError
 from agents import (
     Agent,
@@ -38,8 +52,21 @@ set_tracing_disabled(disabled=True)
 # Load env vars for azure, openai
 from agent_hackathon.utils.config import settings
 
+def _new_prefetcher() -> Optional[CustomerContextPrefetcher]:
+    if not settings.prefetch_enabled:
+        return None
+    return CustomerContextPrefetcher(
+        max_concurrency=settings.prefetch_max_concurrency,
+        max_products=settings.prefetch_max_products,
+    )
+
 async def main():
     agent = main_agent
+    prefetcher = _new_prefetcher()
+    warm_up = start_warm_up()
+    if warm_up is not None:
+        # input() blocks the event loop, so the warm-up has to finish before the first prompt
+        await warm_up
     with mlflow.start_run():
         try:
             # conversation history needs to be tracked
@@ -58,23 +85,26 @@ async def main():
 
                 full_conversation.append({"role": "user", "content": user_input})
 
+                if prefetcher is not None:
+                    prefetcher.start_run()
                 # Send user request to agent and show result
+                transcript = HandoffTranscript.start()
                 result = await Runner.run(
                     starting_agent=agent,
                     input=full_conversation,
-                    context={},
+                    context={"prefetcher": prefetcher},
                     max_turns=20,
                 )
                 logger.info(f"Agent reply: {result.final_output}")
 
-                full_conversation = result.to_input_list()
+                full_conversation = transcript.input_list(result)
                 agent = result.last_agent
 
                 # TODO(task Bonus): implement handoff to human
                 # Only for debugging / developing:
                 log_intermediate_agent_results(result, cycle_counter)
 
-                full_conversation = result.to_input_list()
+                full_conversation = transcript.input_list(result)
                 cycle_counter += 1
                 # TODO(task Bonus): implement handoff to human
 
@@ -84,7 +114,175 @@ async def main():
             logger.error(f"Azure OpenAI Authentication Error: {e}")
         except Exception as e:
             logger.error(f"An unexpected error occurred: {e}")
+        finally:
+            if prefetcher is not None:
+                prefetcher.cancel()
+                prefetcher.log_stats()
+
+
+# Batch mode: process a JSONL file of tickets with bounded concurrency.
+# Input lines look like {"ticket_id": "T1", "content": "..."} ("subject" and "body" are accepted as well).
+# Every finished ticket is appended to the output JSONL right away and its id is recorded in the checkpoint
+# file, so an interrupted batch can be restarted with the same arguments and skips completed tickets.
+# Failed tickets and input lines that cannot be read are appended to a separate errors JSONL with an "error";
+# failed tickets are not checkpointed, so they are retried on the next run without duplicating output rows.
+
+def _ticket_text(ticket: Dict[str, Any]) -> str:
+    if "content" in ticket:
+        return ticket["content"]
+    return "\n\n".join(part for part in (ticket.get("subject"), ticket.get("body")) if part)
+
+
+def _load_checkpoint(checkpoint_path: Path) -> Set[str]:
+    if not checkpoint_path.exists():
+        return set()
+    with open(checkpoint_path, "r", encoding="utf-8") as f:
+        return {line.strip() for line in f if line.strip()}
+
+
+async def process_ticket(ticket: Dict[str, Any]) -> Dict[str, Any]:
+    """Run a single ticket through the main agent and return the output record."""
+    start = time.perf_counter()
+    current_session_id.set(ticket["ticket_id"])
+    prefetcher = _new_prefetcher()
+    # not saved, the ticket's run is timed with it
+    transcript = HandoffTranscript.start()
+    try:
+        result = await Runner.run(
+            starting_agent=main_agent,
+            input=[{"role": "user", "content": _ticket_text(ticket)}],
+            context={"prefetcher": prefetcher},
+            max_turns=20,
+        )
+        usage = [response.usage for response in result.raw_responses]
+        return {
+            "ticket_id": ticket["ticket_id"],
+            "agent": result.last_agent.name,
+            "response": result.final_output,
+            "latency_s": round(time.perf_counter() - start, 3),
+            "input_tokens": sum(u.input_tokens for u in usage),
+            "output_tokens": sum(u.output_tokens for u in usage),
+            "total_tokens": sum(u.total_tokens for u in usage),
+            "handoff_latencies_s": [round(latency, 3) for _, latency in transcript.handoff_latencies],
+        }
+    except Exception as e:
+        logger.error(f"Ticket {ticket['ticket_id']} failed: {e}")
+        return {
+            "ticket_id": ticket["ticket_id"],
+            "error": str(e),
+            "latency_s": round(time.perf_counter() - start, 3),
+        }
+    finally:
+        if prefetcher is not None:
+            prefetcher.cancel()
+
+
+def _parse_ticket(line: str) -> Dict[str, Any]:
+    ticket = json.loads(line)
+    if not isinstance(ticket, dict):
+        raise ValueError("not a JSON object")
+    if "ticket_id" not in ticket:
+        raise ValueError("ticket has no ticket_id")
+    ticket["ticket_id"] = str(ticket["ticket_id"])
+    return ticket
+
+
+async def run_batch(input_path: Path, output_path: Path, concurrency: int, checkpoint_path: Optional[Path] = None,
+                    errors_path: Optional[Path] = None):
+    checkpoint_path = checkpoint_path or output_path.with_name(output_path.name + ".checkpoint")
+    errors_path = errors_path or output_path.with_name(output_path.stem + ".errors.jsonl")
+    completed = _load_checkpoint(checkpoint_path)
+    if completed:
+        logger.info(f"Resuming batch, {len(completed)} tickets already completed")
+
+    start_warm_up()
+    queue: asyncio.Queue = asyncio.Queue(maxsize=2 * concurrency)
+    latencies: list[float] = []
+    stats = {"succeeded": 0, "failed": 0, "skipped": 0, "invalid": 0, "total_tokens": 0}
+
+    def write_error(errors_file, record: Dict[str, Any]) -> None:
+        errors_file.write(json.dumps(record, default=str) + "\n")
+        errors_file.flush()
+
+    async def worker(output_file, checkpoint_file, errors_file):
+        while True:
+            ticket = await queue.get()
+            if ticket is None:
+                return
+            record = await process_ticket(ticket)
+            # no awaits below, so records and checkpoints of concurrent workers never interleave
+            latencies.append(record["latency_s"])
+            if "error" in record:
+                write_error(errors_file, record)
+                stats["failed"] += 1
+                continue
+            output_file.write(json.dumps(record, default=str) + "\n")
+            output_file.flush()
+            checkpoint_file.write(record["ticket_id"] + "\n")
+            checkpoint_file.flush()
+            stats["succeeded"] += 1
+            stats["total_tokens"] += record["total_tokens"]
+            if stats["succeeded"] % 50 == 0:
+                logger.info(f"{stats['succeeded']} tickets completed")
+
+    start = time.perf_counter()
+    with open(input_path, "r", encoding="utf-8") as input_file, \
+            open(output_path, "a", encoding="utf-8") as output_file, \
+            open(checkpoint_path, "a", encoding="utf-8") as checkpoint_file, \
+            open(errors_path, "a", encoding="utf-8") as errors_file:
+        workers = [asyncio.create_task(worker(output_file, checkpoint_file, errors_file)) for _ in range(concurrency)]
+        try:
+            for line_number, line in enumerate(input_file, 1):
+                if not line.strip():
+                    continue
+                try:
+                    ticket = _parse_ticket(line)
+                except (ValueError, TypeError) as e:
+                    logger.error(f"Skipping line {line_number} of {input_path}: {e}")
+                    write_error(errors_file, {"line": line_number, "error": f"invalid ticket: {e}"})
+                    stats["invalid"] += 1
+                    continue
+                if ticket["ticket_id"] in completed:
+                    stats["skipped"] += 1
+                    continue
+                await queue.put(ticket)
+        finally:
+            # the queued tickets are still processed, then the workers stop
+            for _ in workers:
+                await queue.put(None)
+            await asyncio.gather(*workers)
+    elapsed = time.perf_counter() - start
+
+    processed = stats["succeeded"] + stats["failed"]
+    latency_summary = summarize_latencies(latencies)
+    print("\n=== Batch summary ===")
+    print(f"Processed {processed} tickets in {elapsed:.1f}s ({processed / elapsed if elapsed else 0:.2f} tickets/s), "
+          f"{stats['failed']} failed, {stats['skipped']} skipped from checkpoint, {stats['invalid']} invalid lines")
+    if stats["failed"] or stats["invalid"]:
+        print(f"Errors written to {errors_path}, failed tickets are retried when the batch is run again")
+    print(f"Latency per ticket: p50 {latency_summary['p50_ms']:.0f}ms, p95 {latency_summary['p95_ms']:.0f}ms, "
+          f"max {latency_summary['max_ms']:.0f}ms")
+    if stats["succeeded"]:
+        print(f"Tokens: {stats['total_tokens']} total, {stats['total_tokens'] / stats['succeeded']:.0f} per ticket")
+    log_rate_limiter_stats()
+    log_model_tier_stats()
+    log_handoff_filter_stats()
+    log_tool_cache_stats()
+    log_query_stats()
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    parser = argparse.ArgumentParser(description="ElectroStore customer support (interactive or batch)")
+    parser.add_argument("--batch", type=Path, help="JSONL file with tickets to process instead of the interactive chat")
+    parser.add_argument("--output", type=Path, help="JSONL file the batch results are appended to")
+    parser.add_argument("--checkpoint", type=Path, help="Checkpoint file (default: <output>.checkpoint)")
+    parser.add_argument("--errors", type=Path, help="JSONL file failed tickets are appended to "
+                                                    "(default: <output stem>.errors.jsonl)")
+    parser.add_argument("--concurrency", type=int, default=8, help="Maximum number of tickets processed concurrently")
+    args = parser.parse_args()
+
+    if args.batch:
+        output = args.output or args.batch.with_name(args.batch.stem + ".results.jsonl")
+        asyncio.run(run_batch(args.batch, output, args.concurrency, args.checkpoint, args.errors))
+    else:
+        asyncio.run(main())
@@ -0,0 +1,152 @@
+# benchmark_embedding_store.py
+"""
+Benchmark the memory-mapped embedding store: open time, memory per worker process and the recall lost
+by searching the quantized sidecars instead of the float32 vectors.
+
+Queries are stored vectors with some noise added, the exact float32 scan is the ground truth.
+Memory is read from /proc (Linux): RSS counts the shared store pages in every process, PSS divides them
+between the processes sharing them.
+
+Usage:
+    uv run agent_hackathon/utils/benchmark_embedding_store.py --store data/embeddings
+    uv run agent_hackathon/utils/benchmark_embedding_store.py --synthetic 100000 --workers 4
+"""
+
+import argparse
+import multiprocessing
+import tempfile
+from typing import Any, Dict, List
+
+import numpy as np
+
+from agent_hackathon.utils.benchmarking import print_table, recall_at_k, stopwatch, summarize_latencies
+from agent_hackathon.utils.config import settings
+from agent_hackathon.utils.embedding_store import EmbeddingStore, content_hash
+
+# size of a Python list of boxed floats: list header + one pointer and one float object per value
+PY_LIST_BYTES = 56
+PY_FLOAT_BYTES = 8 + 24
+
+
+def write_synthetic_store(path: str, count: int, dim: int, seed: int = 0) -> EmbeddingStore:
+    """Clustered unit vectors, so that nearest neighbours are meaningful."""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(max(1, count // 100), dim)).astype(np.float32)
+
+    def rows():
+        for start in range(0, count, 10_000):
+            size = min(10_000, count - start)
+            chunk = centers[rng.integers(0, len(centers), size)] + 0.5 * rng.normal(size=(size, dim)).astype(np.float32)
+            chunk /= np.linalg.norm(chunk, axis=1, keepdims=True)
+            for i, vector in enumerate(chunk):
+                product_id = f"PROD{start + i:07d}"
+                yield product_id, content_hash(product_id, "synthetic"), vector
+
+    return EmbeddingStore.write(path, "synthetic", rows(), quantizations=("int8", "binary"))
+
+
+def memory_kb() -> Dict[str, int]:
+    """Rss and Pss of this process in kB, empty if /proc is not available."""
+    try:
+        with open("/proc/self/smaps_rollup", "r") as f:
+            fields = dict(line.split(":", 1) for line in f if ":" in line)
+    except OSError:
+        return {}
+    return {key: int(fields[key].split()[0]) for key in ("Rss", "Pss") if key in fields}
+
+
+def worker(path: str, queries: np.ndarray, barrier, results) -> None:
+    baseline = memory_kb()
+    open_s: List[float] = []
+    with stopwatch(open_s):
+        store = EmbeddingStore(path)
+    for query in queries:
+        store.search(query, quantization="int8")
+        store.search(query, quantization="none")
+    # measure while all workers hold the store, so PSS shows the sharing
+    barrier.wait()
+    after = memory_kb()
+    results.put({key: after[key] - baseline.get(key, 0) for key in after} | {"open_ms": 1000 * open_s[0]})
+    barrier.wait()
+
+
+def measure_workers(path: str, queries: np.ndarray, workers: int) -> List[Dict[str, Any]]:
+    context = multiprocessing.get_context("spawn")
+    barrier, results = context.Barrier(workers), context.Queue()
+    processes = [context.Process(target=worker, args=(path, queries, barrier, results)) for _ in range(workers)]
+    for process in processes:
+        process.start()
+    rows = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    return rows
+
+
+def measure_recall(store: EmbeddingStore, queries: np.ndarray, top_k: int) -> List[Dict[str, Any]]:
+    exact = [[m.product_id for m in store.search(query, top_k, quantization="none")] for query in queries]
+    rows = [{"mode": "float32 exact", "recall": 1.0,
+             **_latency(lambda q: store.search(q, top_k, quantization="none"), queries)}]
+    for quantization in ("int8", "binary"):
+        for rescore_factor in (1, 4, 16):
+            def search(query, quantization=quantization, rescore_factor=rescore_factor):
+                return store.search(query, top_k, quantization=quantization, rescore_factor=rescore_factor)
+
+            recalls = [recall_at_k([m.product_id for m in search(query)], relevant, top_k)
+                       for query, relevant in zip(queries, exact)]
+            rows.append({"mode": f"{quantization} + rescore x{rescore_factor}",
+                         "recall": sum(recalls) / len(recalls), **_latency(search, queries)})
+    return rows
+
+
+def _latency(search, queries: np.ndarray) -> Dict[str, float]:
+    latencies: List[float] = []
+    for query in queries:
+        with stopwatch(latencies):
+            search(query)
+    summary = summarize_latencies(latencies)
+    return {"p50_ms": summary["p50_ms"], "p95_ms": summary["p95_ms"]}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--store", default=settings.embedding_store_path, help="Embedding store to benchmark")
+    parser.add_argument("--synthetic", type=int, default=0,
+                        help="Benchmark a temporary synthetic store with this many vectors instead")
+    parser.add_argument("--dim", type=int, default=1536, help="Dimension of the synthetic vectors")
+    parser.add_argument("--queries", type=int, default=50, help="Number of queries")
+    parser.add_argument("--top-k", type=int, default=5, help="Number of results per query")
+    parser.add_argument("--workers", type=int, default=4, help="Worker processes opening the store")
+    args = parser.parse_args()
+
+    store_path = args.store
+    if args.synthetic:
+        store_path = tempfile.mkdtemp(prefix="embedding-store-")
+        write_s: List[float] = []
+        with stopwatch(write_s):
+            write_synthetic_store(store_path, args.synthetic, args.dim)
+        print(f"Wrote synthetic store with {args.synthetic} vectors to {store_path} in {write_s[0]:.1f}s")
+
+    open_s: List[float] = []
+    with stopwatch(open_s):
+        store = EmbeddingStore(store_path)
+    rng = np.random.default_rng(1)
+    sample = np.asarray(store.vectors[rng.choice(len(store), size=min(args.queries, len(store)), replace=False)])
+    queries = sample + 0.05 * rng.normal(size=sample.shape).astype(np.float32)
+
+    float_mb = store.vectors.nbytes / 2**20
+    print(f"\n--- Embedding store: {len(store)} vectors x {store.dim} dims, opened in {1000 * open_s[0]:.1f}ms ---")
+    print_table([
+        {"representation": "python float lists (estimate)",
+         "size_mb": len(store) * (PY_LIST_BYTES + store.dim * PY_FLOAT_BYTES) / 2**20},
+        {"representation": "float32 memmap", "size_mb": float_mb},
+        {"representation": "int8 + scales", "size_mb": (store.int8_vectors.nbytes + store.scales.nbytes) / 2**20
+            if store.int8_vectors is not None else float("nan")},
+        {"representation": "binary", "size_mb": store.binary_vectors.nbytes / 2**20
+            if store.binary_vectors is not None else float("nan")},
+    ])
+
+    print(f"\n--- Recall@{args.top_k} against the exact float32 scan ({len(queries)} queries) ---")
+    print_table(measure_recall(store, queries, args.top_k))
+
+    print(f"\n--- Memory per worker process ({args.workers} workers, kB added by opening and searching) ---")
+    print_table([{"worker": i, **row} for i, row in enumerate(measure_workers(store_path, queries, args.workers))])
@@ -0,0 +1,77 @@
+# benchmark_projection.py
+"""
+Benchmark response size and decode time of the DatabaseService accessors with and without field projection.
+
+Every accessor is run against ids and queries taken from the local database file, once requesting all
+fields of the documents and once requesting only the fields the accessor needs (QUERY_PROJECTIONS_ENABLED).
+
+Usage:
+    uv run agent_hackathon/utils/benchmark_projection.py --database data/database.json
+"""
+
+import argparse
+import json
+from typing import Any, Callable, Dict, List
+
+from agent_hackathon.utils.benchmarking import print_table
+from agent_hackathon.utils.database_service import db_service, query_stats, reset_query_stats
+
+
+def accessor_calls(database: Dict[str, List[Dict[str, Any]]], queries: List[str],
+                   sample_size: int) -> List[Callable[[], Any]]:
+    customer_ids = [customer["customer_id"] for customer in database["customers"][:sample_size]]
+    product_ids = [product["product_id"] for product in database["products"][:sample_size]]
+    order_ids = [order["order_id"] for order in database["orders"][:sample_size]]
+
+    calls: List[Callable[[], Any]] = []
+    calls += [lambda order_id=order_id: db_service.get_order_by_id(order_id) for order_id in order_ids]
+    calls += [lambda product_id=product_id: db_service.get_product_by_id(product_id) for product_id in product_ids]
+    calls += [lambda customer_id=customer_id: db_service.get_customer_by_identifier(customer_id)
+              for customer_id in customer_ids]
+    calls += [lambda customer_id=customer_id: db_service.get_orders_by_customer(customer_id)
+              for customer_id in customer_ids]
+    calls += [lambda query=query: db_service.search_products(query) for query in queries[:sample_size]]
+    calls.append(lambda: db_service.get_stock_availability(product_ids))
+    return calls
+
+
+def run(calls: List[Callable[[], Any]], projections_enabled: bool, repeats: int) -> List[Dict[str, Any]]:
+    db_service.projections_enabled = projections_enabled
+    reset_query_stats()
+    for _ in range(repeats):
+        for call in calls:
+            call()
+
+    return [
+        {
+            "accessor": accessor,
+            "projection": "on" if projections_enabled else "off",
+            "queries": stats.queries,
+            "mean_bytes": stats.response_bytes / stats.queries,
+            "mean_ms": 1000 * stats.latency_s / stats.queries,
+            "decode_ms": 1000 * stats.decode_s / stats.queries,
+        }
+        for accessor, stats in sorted(query_stats().items())
+    ]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database", default="data/database.json", help="Database file the indexes were built from")
+    parser.add_argument("--queries", default="data/search_benchmark_queries.json", help="Product search queries (JSON)")
+    parser.add_argument("--sample-size", type=int, default=10, help="Number of ids / queries per accessor")
+    parser.add_argument("--repeats", type=int, default=3, help="Repetitions of every call")
+    args = parser.parse_args()
+
+    with open(args.database, "r", encoding="utf-8") as f:
+        database = json.load(f)
+    with open(args.queries, "r", encoding="utf-8") as f:
+        search_queries = [labelled["query"] for labelled in json.load(f)["queries"]]
+
+    benchmark_calls = accessor_calls(database, search_queries, args.sample_size)
+    rows = run(benchmark_calls, projections_enabled=False, repeats=args.repeats)
+    rows += run(benchmark_calls, projections_enabled=True, repeats=args.repeats)
+    rows.sort(key=lambda row: (row["accessor"], row["projection"]))
+
+    print(f"\n--- Field projection benchmark ({len(benchmark_calls)} calls x {args.repeats} repeats per mode) ---")
+    print_table(rows)
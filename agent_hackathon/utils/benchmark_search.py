@@ -0,0 +1,71 @@
+# benchmark_search.py
+"""
+Benchmark latency and recall of the product search modes on a labelled query set.
+
+Usage:
+    uv run agent_hackathon/utils/benchmark_search.py --queries data/search_benchmark_queries.json
+"""
+
+import argparse
+import json
+from typing import Any, Dict, List
+
+from agent_hackathon.utils.benchmarking import print_table, recall_at_k, stopwatch, summarize_latencies
+from agent_hackathon.utils.database_service import db_service
+
+# name -> keyword arguments for DatabaseService.search_products
+SEARCH_MODES: Dict[str, Dict[str, Any]] = {
+    "vector (no filters)": {"hybrid": False, "semantic_rerank": False, "use_filters": False},
+    "vector + filters": {"hybrid": False, "semantic_rerank": False, "use_filters": True},
+    "hybrid + filters": {"hybrid": True, "semantic_rerank": False, "use_filters": True},
+    "hybrid + filters + semantic": {"hybrid": True, "semantic_rerank": True, "use_filters": True},
+}
+FILTER_KEYS = ("category", "min_price", "max_price", "in_stock_only")
+
+
+def run_mode(queries: List[Dict[str, Any]], mode: Dict[str, Any], top_k: int, repeats: int) -> Dict[str, Any]:
+    latencies: List[float] = []
+    recalls: List[float] = []
+    for labelled in queries:
+        filters = {key: labelled[key] for key in FILTER_KEYS if key in labelled} if mode["use_filters"] else {}
+        for _ in range(repeats):
+            with stopwatch(latencies):
+                products = db_service.search_products(
+                    labelled["query"],
+                    top_k=top_k,
+                    hybrid=mode["hybrid"],
+                    semantic_rerank=mode["semantic_rerank"],
+                    **filters,
+                )
+        retrieved_ids = [product.product_id for product in products]
+        recalls.append(recall_at_k(retrieved_ids, labelled["relevant_ids"], top_k))
+
+    summary = summarize_latencies(latencies)
+    return {
+        f"recall@{top_k}": sum(recalls) / len(recalls),
+        "p50_ms": summary["p50_ms"],
+        "p95_ms": summary["p95_ms"],
+        "mean_ms": summary["mean_ms"],
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", default="data/search_benchmark_queries.json", help="Labelled query set (JSON)")
+    parser.add_argument("--top-k", type=int, default=5, help="Number of results per query")
+    parser.add_argument("--repeats", type=int, default=3, help="Repetitions per query for latency measurements")
+    parser.add_argument("--skip-semantic", action="store_true",
+                        help="Skip the semantic reranking mode (e.g. if the semantic ranker is disabled on the service)")
+    args = parser.parse_args()
+
+    with open(args.queries, "r", encoding="utf-8") as f:
+        labelled_queries = json.load(f)["queries"]
+
+    rows = []
+    for mode_name, mode in SEARCH_MODES.items():
+        if args.skip_semantic and mode["semantic_rerank"]:
+            continue
+        rows.append({"mode": mode_name, **run_mode(labelled_queries, mode, args.top_k, args.repeats)})
+
+    print(f"\n--- Product search benchmark ({len(labelled_queries)} queries, top_k={args.top_k}) ---")
+    print_table(rows)
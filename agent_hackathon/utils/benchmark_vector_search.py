@@ -0,0 +1,149 @@
+# benchmark_vector_search.py
+"""
+Compare recall and latency of HNSW (approximate) and exhaustive KNN vector queries
+on synthetic product catalogs of increasing size.
+
+For every catalog size a temporary products index is created with the HNSW profile and filled with
+clustered random vectors. Each query is run twice against the same index: once approximate and once with
+exhaustive=True, which serves as ground truth for recall@k. The temporary indexes are deleted afterwards
+unless --keep-indexes is given.
+
+Usage:
+    uv run agent_hackathon/utils/benchmark_vector_search.py --sizes 1000 10000 50000
+"""
+
+import argparse
+import math
+import random
+import time
+from typing import Dict, Iterator, List
+
+from azure.core.credentials import AzureKeyCredential
+from azure.search.documents import SearchClient
+from azure.search.documents.indexes import SearchIndexClient
+from azure.search.documents.models import VectorizedQuery
+
+from agent_hackathon.utils.benchmarking import print_table, recall_at_k, stopwatch, summarize_latencies
+from agent_hackathon.utils.config import settings
+from agent_hackathon.utils.upload_data_to_azure_search import define_products_index
+
+EMBEDDING_DIMENSIONS = 1536
+# Documents with 1536 floats are ~30KB as JSON, this keeps a batch well below the 16MB request limit
+UPLOAD_BATCH_SIZE = 250
+
+
+def _normalize(vector: List[float]) -> List[float]:
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+
+def _make_centers(rng: random.Random, n_clusters: int) -> List[List[float]]:
+    return [_normalize([rng.gauss(0, 1) for _ in range(EMBEDDING_DIMENSIONS)]) for _ in range(n_clusters)]
+
+
+def _noisy(rng: random.Random, center: List[float], noise: float) -> List[float]:
+    return _normalize([c + rng.gauss(0, noise) for c in center])
+
+
+def synthetic_products(size: int, centers: List[List[float]], seed: int, noise: float) -> Iterator[Dict]:
+    """Yield synthetic product documents whose embeddings are clustered around the given centers."""
+    rng = random.Random(seed)
+    for i in range(size):
+        yield {
+            "product_id": f"SYN{i:08d}",
+            "name": f"Synthetic product {i}",
+            "category": f"Category {i % len(centers)}",
+            "price": round(rng.uniform(5, 2500), 2),
+            "stock_count": rng.randint(0, 100),
+            "description": "synthetic benchmark product",
+            "embedding": _noisy(rng, rng.choice(centers), noise),
+        }
+
+
+def populate_index(search_client: SearchClient, documents: Iterator[Dict], size: int) -> None:
+    batch = []
+    for document in documents:
+        batch.append(document)
+        if len(batch) == UPLOAD_BATCH_SIZE:
+            search_client.upload_documents(documents=batch)
+            batch = []
+    if batch:
+        search_client.upload_documents(documents=batch)
+
+    # indexing is asynchronous on the service side, wait until all documents are searchable
+    deadline = time.monotonic() + 600
+    while search_client.get_document_count() < size and time.monotonic() < deadline:
+        time.sleep(2)
+
+
+def run_queries(search_client: SearchClient, queries: List[List[float]], top_k: int, exhaustive: bool):
+    latencies: List[float] = []
+    results: List[List[str]] = []
+    for query in queries:
+        vector_query = VectorizedQuery(vector=query, k_nearest_neighbors=top_k, fields="embedding",
+                                       exhaustive=exhaustive)
+        with stopwatch(latencies):
+            hits = list(search_client.search(search_text=None, vector_queries=[vector_query], top=top_k,
+                                             select=["product_id"]))
+        results.append([hit["product_id"] for hit in hits])
+    return results, latencies
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000], help="Catalog sizes")
+    parser.add_argument("--queries", type=int, default=50, help="Number of queries per catalog")
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--clusters", type=int, default=64, help="Number of embedding clusters")
+    parser.add_argument("--noise", type=float, default=0.03, help="Per-dimension noise around the cluster centers")
+    parser.add_argument("--m", type=int, default=settings.hnsw_m)
+    parser.add_argument("--ef-construction", type=int, default=settings.hnsw_ef_construction)
+    parser.add_argument("--ef-search", type=int, default=settings.hnsw_ef_search)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--keep-indexes", action="store_true", help="Do not delete the benchmark indexes")
+    args = parser.parse_args()
+
+    credential = AzureKeyCredential(settings.azure_search_admin_key)
+    index_client = SearchIndexClient(settings.azure_search_endpoint, credential)
+    rng = random.Random(args.seed)
+    centers = _make_centers(rng, args.clusters)
+    query_vectors = [_noisy(rng, rng.choice(centers), args.noise) for _ in range(args.queries)]
+
+    rows = []
+    for size in args.sizes:
+        index_name = f"products-bench-{size}"
+        print(f"Creating index '{index_name}' and uploading {size} synthetic products...")
+        index_client.create_or_update_index(define_products_index(
+            index_name=index_name,
+            vector_search_profile="hnswProfile",
+            hnsw_m=args.m,
+            hnsw_ef_construction=args.ef_construction,
+            hnsw_ef_search=args.ef_search,
+        ))
+        search_client = SearchClient(endpoint=settings.azure_search_endpoint, index_name=index_name,
+                                     credential=credential)
+        try:
+            populate_index(search_client, synthetic_products(size, centers, args.seed + size, args.noise), size)
+
+            exact_results, exact_latencies = run_queries(search_client, query_vectors, args.top_k, exhaustive=True)
+            approx_results, approx_latencies = run_queries(search_client, query_vectors, args.top_k, exhaustive=False)
+
+            recall = sum(recall_at_k(approx, exact, args.top_k)
+                         for approx, exact in zip(approx_results, exact_results)) / len(query_vectors)
+            for mode, latencies, mode_recall in (("exhaustive", exact_latencies, 1.0),
+                                                 ("hnsw", approx_latencies, recall)):
+                summary = summarize_latencies(latencies)
+                rows.append({
+                    "catalog_size": size,
+                    "mode": mode,
+                    f"recall@{args.top_k}": mode_recall,
+                    "p50_ms": summary["p50_ms"],
+                    "p95_ms": summary["p95_ms"],
+                })
+        finally:
+            if not args.keep_indexes:
+                index_client.delete_index(index_name)
+
+    print(f"\n--- Vector search benchmark (m={args.m}, efConstruction={args.ef_construction}, "
+          f"efSearch={args.ef_search}, top_k={args.top_k}) ---")
+    print_table(rows)
@@ -0,0 +1,87 @@
+# benchmark_warm_up.py
+"""
+Benchmark the latency of the first requests of a fresh worker process with and without connection warm-up.
+
+Every trial starts a new Python process (so no connection is open yet), optionally runs
+`warm_up_connections`, and then times the requests a first customer message typically sends:
+one chat completion, one customer lookup in the search index and one embedding.
+
+Usage:
+    uv run agent_hackathon/utils/benchmark_warm_up.py --trials 5
+"""
+
+import argparse
+import asyncio
+import json
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+from agent_hackathon.utils.benchmarking import percentile, print_table
+
+
+async def first_requests(warm_up: bool) -> Dict[str, float]:
+    """Runs in the child process. Returns the latency of each first request in seconds."""
+    from agent_hackathon.agent_models import azure_client
+    from agent_hackathon.utils.config import settings
+    from agent_hackathon.utils.database_service import db_service
+    from agent_hackathon.utils.http_transport import warm_up_connections
+
+    timings: Dict[str, float] = {}
+    if warm_up:
+        start = time.perf_counter()
+        await warm_up_connections()
+        timings["warm_up"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    await azure_client.chat.completions.create(
+        model=settings.azure_openai_gpt_deployment,
+        messages=[{"role": "user", "content": "Hi"}],
+        max_tokens=1,
+    )
+    timings["chat"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    await asyncio.to_thread(db_service.get_customer_by_identifier, "CUST001")
+    timings["search"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    await asyncio.to_thread(db_service.embedder.embed_string, "wireless headphones")
+    timings["embedding"] = time.perf_counter() - start
+
+    timings["first_message"] = timings["chat"] + timings["search"] + timings["embedding"]
+    return timings
+
+
+def run_trial(warm_up: bool) -> Dict[str, float]:
+    output = subprocess.run(
+        [sys.executable, "-m", "agent_hackathon.utils.benchmark_warm_up", "--child", "warm" if warm_up else "cold"],
+        check=True, capture_output=True, text=True,
+    ).stdout
+    # the last line is the result, everything before is log output
+    return json.loads(output.strip().splitlines()[-1])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--trials", type=int, default=5, help="Fresh processes per mode")
+    parser.add_argument("--child", choices=["cold", "warm"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(asyncio.run(first_requests(warm_up=args.child == "warm"))))
+        sys.exit(0)
+
+    rows = []
+    for mode in ("cold", "warm"):
+        trials: List[Dict[str, float]] = [run_trial(warm_up=mode == "warm") for _ in range(args.trials)]
+        row = {"mode": mode}
+        for request in ("warm_up", "chat", "search", "embedding", "first_message"):
+            values = [trial[request] for trial in trials if request in trial]
+            row[f"{request}_p50_ms"] = 1000 * percentile(values, 50) if values else "-"
+        rows.append(row)
+
+    print(f"\n--- First request latency of a fresh process ({args.trials} trials per mode) ---")
+    print("The warm-up itself runs at chat start, before the first message arrives.")
+    print_table(rows)
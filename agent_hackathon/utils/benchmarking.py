@@ -0,0 +1,69 @@
+# benchmarking.py
+"""
+Small helpers shared by the benchmark scripts in this package.
+"""
+
+import math
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Sequence
+
+
+def percentile(values: Sequence[float], pct: float) -> float:
+    """Return the pct-th percentile (0-100) of values using linear interpolation."""
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100
+    lower, upper = math.floor(rank), math.ceil(rank)
+    if lower == upper:
+        return ordered[lower]
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (rank - lower)
+
+
+def summarize_latencies(latencies_s: Sequence[float]) -> Dict[str, float]:
+    """Summarize latencies given in seconds as milliseconds."""
+    return {
+        "count": len(latencies_s),
+        "mean_ms": 1000 * sum(latencies_s) / len(latencies_s) if latencies_s else float("nan"),
+        "p50_ms": 1000 * percentile(latencies_s, 50),
+        "p95_ms": 1000 * percentile(latencies_s, 95),
+        "max_ms": 1000 * max(latencies_s) if latencies_s else float("nan"),
+    }
+
+
+def recall_at_k(retrieved_ids: Sequence[str], relevant_ids: Sequence[str], k: int) -> float:
+    """Fraction of the relevant ids found in the first k retrieved ids."""
+    if not relevant_ids:
+        return 1.0
+    return len(set(retrieved_ids[:k]) & set(relevant_ids)) / len(set(relevant_ids))
+
+
+@contextmanager
+def stopwatch(latencies_s: List[float]) -> Iterator[None]:
+    """Append the wall clock duration of the with-block (in seconds) to latencies_s."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        latencies_s.append(time.perf_counter() - start)
+
+
+def print_table(rows: List[Dict[str, object]]) -> None:
+    """Print a list of dicts as a simple aligned table."""
+    if not rows:
+        print("(no results)")
+        return
+    columns = list(rows[0].keys())
+    formatted = [[_format_cell(row.get(col)) for col in columns] for row in rows]
+    widths = [max(len(col), *(len(r[i]) for r in formatted)) for i, col in enumerate(columns)]
+    print("  ".join(col.ljust(w) for col, w in zip(columns, widths)))
+    print("  ".join("-" * w for w in widths))
+    for r in formatted:
+        print("  ".join(cell.ljust(w) for cell, w in zip(r, widths)))
+
+
+def _format_cell(value: object) -> str:
+    if isinstance(value, float):
+        return f"{value:.3f}" if abs(value) < 100 else f"{value:.1f}"
+    return str(value)
@@ -1,21 +1,133 @@
 # database_service.py
 import json
+import time
 from typing import List, Optional, Dict, Any
 from pathlib import Path
 from datetime import datetime, date
 from decimal import Decimal
+from collections import defaultdict
+from dataclasses import dataclass
 from threading import Lock
+from concurrent.futures import Future
 from loguru import logger
 
 from azure.core.credentials import AzureKeyCredential
 from azure.search.documents import SearchClient
 from azure.search.documents.models import VectorizedQuery
 
-from agent_hackathon.data_models import Customer, Product, Order, OrderItem
+from agent_hackathon.data_models import (
+    Customer,
+    Product,
+    Order,
+    OrderItem,
+    StockAvailability,
+    StockAvailabilityResult,
+    OrderStatusSummary,
+    SpendingSummary,
+    ProductPurchase,
+    TopProductsSummary,
+)
 from agent_hackathon.utils.embedder import Embedder
+from agent_hackathon.utils.http_transport import search_transport
+from agent_hackathon.utils.stats import StatsRecorder
+from agent_hackathon.utils.write_behind_queue import WriteBehindQueue
 
 from agent_hackathon.utils.config import settings
 
+# Must match the semantic configuration in upload_data_to_azure_search.define_products_index
+PRODUCTS_SEMANTIC_CONFIGURATION = "semantic-config"
+
+
+# Key field and fields that may be changed with a partial update, per index
+INDEX_KEY_FIELDS = {"customers": "customer_id", "orders": "order_id", "products": "product_id"}
+MERGEABLE_FIELDS = {
+    "customers": {"name", "email", "phone", "address"},
+    "orders": {"customer_id", "status", "total_amount", "order_date", "tracking_number", "items"},
+    "products": {"name", "category", "price", "stock_count", "description"},
+}
+
+
+# Fields requested by the accessors, derived from the models (the product embedding is not part of Product)
+CUSTOMER_FIELDS = list(Customer.model_fields)
+PRODUCT_FIELDS = list(Product.model_fields)
+ORDER_FIELDS = list(Order.model_fields)
+
+
+@dataclass
+class QueryStats:
+    queries: int = 0
+    response_bytes: int = 0
+    latency_s: float = 0.0
+    decode_s: float = 0.0
+
+
+# keyed by accessor
+_query_stats: StatsRecorder[QueryStats] = StatsRecorder(QueryStats)
+
+
+def _response_hook(responses: List[tuple]):
+    """raw_response_hook that records (body size, arrival time) of every HTTP response of a query."""
+    def hook(pipeline_response) -> None:
+        responses.append((len(pipeline_response.http_response.body() or b""), time.perf_counter()))
+    return hook
+
+
+def _record_query(accessor: str, responses: List[tuple], start: float, end: float) -> None:
+    with _query_stats.update(accessor) as stats:
+        stats.queries += 1
+        stats.response_bytes += sum(size for size, _ in responses)
+        stats.latency_s += end - start
+        # deserialization starts once the (last) response arrived
+        stats.decode_s += end - responses[-1][1] if responses else 0.0
+
+
+def query_stats() -> Dict[str, QueryStats]:
+    """Snapshot of the recorded query stats, keyed by accessor."""
+    return _query_stats.snapshot()
+
+
+def reset_query_stats() -> None:
+    _query_stats.clear()
+
+
+def log_query_stats() -> None:
+    for accessor, stats in sorted(query_stats().items()):
+        logger.info(f"[{accessor}] {stats.queries} queries, mean response {stats.response_bytes / stats.queries:.0f} "
+                    f"bytes, mean latency {1000 * stats.latency_s / stats.queries:.1f}ms "
+                    f"(decode {1000 * stats.decode_s / stats.queries:.1f}ms)")
+
+
+class _SearchDocuments(list):
+    """Documents of a search, plus its facets and total count if the search asked for them."""
+
+    def __init__(self, documents: List[Dict], facets: Optional[Dict[str, List[Dict]]], count: Optional[int]):
+        super().__init__(documents)
+        self.facets = facets or {}
+        self.count = count
+
+
+def _escape_odata(value: str) -> str:
+    """Escape a string literal for use inside an OData filter."""
+    return value.replace("'", "''")
+
+
+def _to_document_value(value: Any) -> Any:
+    """Convert model values (Decimal, date, nested models) into JSON values accepted by the index."""
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, date):
+        return f"{value.isoformat()}T00:00:00Z"
+    if hasattr(value, "model_dump"):
+        return _to_document_value(value.model_dump())
+    if isinstance(value, dict):
+        return {k: _to_document_value(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_to_document_value(v) for v in value]
+    return value
+
+
 class DatabaseService:
     def __init__(self,
                  azure_search_endpoint: str = None,
@@ -24,20 +136,49 @@ class DatabaseService:
         self.credential = AzureKeyCredential(settings.azure_search_key)
         self.azure_search_endpoint = azure_search_endpoint
 
+        # all search clients share one connection pool, see utils/http_transport.py
         self.products_search_client = SearchClient(endpoint=settings.azure_search_endpoint,
                             index_name="products",
-                            credential=self.credential)
+                            credential=self.credential,
+                            transport=search_transport())
         self.customers_search_client = SearchClient(endpoint=settings.azure_search_endpoint,
                             index_name="customers",
-                            credential=self.credential)
+                            credential=self.credential,
+                            transport=search_transport())
         self.orders_search_client = SearchClient(endpoint=settings.azure_search_endpoint,
                             index_name="orders",
-                            credential=self.credential)
+                            credential=self.credential,
+                            transport=search_transport())
+        self.admin_credential = AzureKeyCredential(settings.azure_search_admin_key)
         self.customer_admin_client = SearchClient(endpoint=settings.azure_search_endpoint,
                             index_name="customers",
-                            credential=AzureKeyCredential(settings.azure_search_admin_key))
+                            credential=self.admin_credential,
+                            transport=search_transport())
+        self.orders_admin_client = SearchClient(endpoint=settings.azure_search_endpoint,
+                            index_name="orders",
+                            credential=self.admin_credential,
+                            transport=search_transport())
+        self.products_admin_client = SearchClient(endpoint=settings.azure_search_endpoint,
+                            index_name="products",
+                            credential=self.admin_credential,
+                            transport=search_transport())
+
+        self.write_queue = WriteBehindQueue(
+            clients={
+                "customers": self.customer_admin_client,
+                "orders": self.orders_admin_client,
+                "products": self.products_admin_client,
+            },
+            key_fields=INDEX_KEY_FIELDS,
+            batch_size=settings.write_batch_size,
+            flush_interval_seconds=settings.write_flush_interval_seconds,
+            max_retries=settings.write_max_retries,
+            retry_backoff_seconds=settings.write_retry_backoff_seconds,
+        )
 
         self.embedder = Embedder()
+        # request only the fields each accessor needs, see _search / _get_document
+        self.projections_enabled = settings.query_projections_enabled
 
     def _parse_date(self, date_str: str) -> date:
         """Parse date string to date object."""
@@ -45,33 +186,83 @@ class DatabaseService:
             return date_str
         return datetime.fromisoformat(date_str).date()
 
+    # Projected queries
+    # Every accessor requests only the fields it needs (`select` / `selected_fields`), so e.g. the 1536-float
+    # product embedding never leaves the index. Response size and fetch time are recorded per accessor.
+    def _search(self,
+                accessor: str,
+                client: SearchClient,
+                fields: Optional[List[str]],
+                **kwargs: Any) -> _SearchDocuments:
+        """
+        Run a search requesting only `fields` (all fields if None) and return the documents, with the
+        facets (`facets=[...]`) and the total count (`include_total_count=True`) if requested.
+        """
+        responses: List[tuple] = []
+        start = time.perf_counter()
+        results = client.search(
+            select=fields if self.projections_enabled else None,
+            raw_response_hook=_response_hook(responses),
+            **kwargs,
+        )
+        documents = _SearchDocuments(
+            list(results),
+            facets=results.get_facets() if kwargs.get("facets") else None,
+            count=results.get_count() if kwargs.get("include_total_count") else None,
+        )
+        _record_query(accessor, responses, start, time.perf_counter())
+        return documents
+
+    def _get_document(self, accessor: str, client: SearchClient, key: str, fields: Optional[List[str]]) -> Dict:
+        """Look up one document by key requesting only `fields` (all fields if None)."""
+        responses: List[tuple] = []
+        start = time.perf_counter()
+        document = client.get_document(
+            key=key,
+            selected_fields=fields if self.projections_enabled else None,
+            raw_response_hook=_response_hook(responses),
+        )
+        _record_query(accessor, responses, start, time.perf_counter())
+        return document
+
+    def _to_order(self, order_data: Dict) -> Order:
+        """Convert an orders index document into an Order model."""
+        order_copy = order_data.copy()
+
+        # Parse and convert data
+        order_copy['order_date'] = self._parse_date(order_copy['order_date'])
+        order_copy['total_amount'] = Decimal(str(order_copy['total_amount']))
+
+        items = []
+        for item_data in order_copy.get('items', []):
+            # Convert price to Decimal in each item
+            item_copy = item_data.copy()
+            item_copy['price'] = Decimal(str(item_copy['price']))
+            items.append(OrderItem(**item_copy))
+        order_copy['items'] = items
+        return Order(**order_copy)
+
     # Accessors
     def get_order_by_id(self, order_id: str) -> Optional[Order]:
         """Get order by ID and return as Order model."""
-        order_data = self.orders_search_client.get_document(key=order_id)
+        order_data = self._get_document("get_order_by_id", self.orders_search_client, order_id, ORDER_FIELDS)
         try:
-            order_copy = order_data.copy()
-
-            # Parse and convert data
-            order_copy['order_date'] = self._parse_date(order_copy['order_date'])
-            order_copy['total_amount'] = Decimal(str(order_copy['total_amount']))
-
-            items = []
-            for item_data in order_copy.get('items', []):
-                item_copy = item_data.copy()
-                item_copy['price'] = Decimal(str(item_copy['price']))
-                items.append(OrderItem(**item_copy))
-            order_copy['items'] = items
-            return Order(**order_data)
+            return self._to_order(order_data)
         except Exception as e:
             logger.error(f"Error converting order {order_id} to model: {e}")
             return None
 
     def get_customer_by_identifier(self, identifier: str) -> Optional[Customer]:
         """Get customer by ID, email or name and return as Customer model."""
-        customers = self.customers_search_client.search(search_text="*", filter=f"customer_id eq '{identifier}' or email eq '{identifier}' or name eq '{identifier}'")
+        value = _escape_odata(identifier)
+        customers = self._search(
+            "get_customer_by_identifier",
+            self.customers_search_client,
+            CUSTOMER_FIELDS,
+            search_text="*",
+            filter=f"customer_id eq '{value}' or email eq '{value}' or name eq '{value}'",
+        )
 
-        customers = list(customers)
         if len(customers) == 0:
             logger.error(f"No customer found for {identifier}")
             return None
@@ -89,7 +280,8 @@ class DatabaseService:
 
     def get_product_by_id(self, product_id: str) -> Optional[Product]:
         """Get product by ID and return as Product model."""
-        product_data = self.products_search_client.get_document(key=product_id)
+        product_data = self._get_document("get_product_by_id", self.products_search_client, product_id,
+                                          PRODUCT_FIELDS)
 
         try:
             return Product(**product_data)
@@ -99,33 +291,63 @@ class DatabaseService:
 
     def get_orders_by_customer(self, customer_id: str) -> List[Order]:
         """Get all orders for a customer and return as list of Order models."""
-        raw_orders = self.orders_search_client.search(search_text="*", filter=f"customer_id eq '{customer_id}'")
+        raw_orders = self._search(
+            "get_orders_by_customer",
+            self.orders_search_client,
+            ORDER_FIELDS,
+            search_text="*",
+            filter=f"customer_id eq '{_escape_odata(customer_id)}'",
+        )
         orders = []
 
         for order_data in raw_orders:
             try:
-                order_copy = order_data.copy()
-
-                # Parse data
-                order_copy['order_date'] = self._parse_date(order_copy['order_date'])
-                order_copy['total_amount'] = Decimal(str(order_copy['total_amount']))
-
-                items = []
-                for item_data in order_copy.get('items', []):
-                    # Convert price to Decimal in each item
-                    item_copy = item_data.copy()
-                    item_copy['price'] = Decimal(str(item_copy['price']))
-                    items.append(OrderItem(**item_copy))
-                order_copy['items'] = items
-
-                orders.append(Order(**order_copy))
+                orders.append(self._to_order(order_data))
             except Exception as e:
                 logger.error(f"Error converting order to model: {e}")
                 # Continue processing other orders
 
         return orders
 
-    def search_products(self, query: str) -> List[Product]:
+    def _build_product_filter(self,
+                              category: Optional[str] = None,
+                              min_price: Optional[float] = None,
+                              max_price: Optional[float] = None,
+                              in_stock_only: bool = False) -> Optional[str]:
+        """Build an OData filter for the products index, None if no filter is requested."""
+        clauses = []
+        if category:
+            clauses.append(f"category eq '{_escape_odata(category)}'")
+        if min_price is not None:
+            clauses.append(f"price ge {float(min_price)}")
+        if max_price is not None:
+            clauses.append(f"price le {float(max_price)}")
+        if in_stock_only:
+            clauses.append("stock_count gt 0")
+        return " and ".join(clauses) if clauses else None
+
+    def search_products(self,
+                        query: str,
+                        category: Optional[str] = None,
+                        min_price: Optional[float] = None,
+                        max_price: Optional[float] = None,
+                        in_stock_only: bool = False,
+                        top_k: Optional[int] = None,
+                        hybrid: Optional[bool] = None,
+                        semantic_rerank: Optional[bool] = None,
+                        exhaustive: Optional[bool] = None) -> List[Product]:
+        """
+        Search products with keyword + vector (hybrid) retrieval.
+
+        The structured filters are evaluated by the index, so only matching products are ranked and returned.
+        top_k, hybrid, semantic_rerank and exhaustive fall back to the search settings when not given.
+        exhaustive=True forces an exact nearest neighbour scan even if the index uses the HNSW profile.
+        """
+        top_k = top_k or settings.search_top_k
+        hybrid = settings.search_hybrid if hybrid is None else hybrid
+        semantic_rerank = settings.search_semantic_rerank if semantic_rerank is None else semantic_rerank
+        exhaustive = settings.vector_search_exhaustive if exhaustive is None else exhaustive
+
         query_embedding = (
             self.embedder.embedder.embeddings.create(input=[query], model=settings.azure_openai_embedding_model_name)
             .data[0]
@@ -133,11 +355,26 @@ class DatabaseService:
         )
         vector_query = VectorizedQuery(
             vector=query_embedding,
-            k_nearest_neighbors=5,
+            k_nearest_neighbors=top_k,
             fields="embedding",
-            exhaustive=True,
+            exhaustive=exhaustive,
+        )
+        search_kwargs: Dict[str, Any] = {}
+        if semantic_rerank:
+            search_kwargs["query_type"] = "semantic"
+            search_kwargs["semantic_configuration_name"] = PRODUCTS_SEMANTIC_CONFIGURATION
+
+        products = self._search(
+            "search_products",
+            self.products_search_client,
+            PRODUCT_FIELDS,
+            # the semantic ranker always needs the query text, even for pure vector retrieval
+            search_text=query if (hybrid or semantic_rerank) else None,
+            vector_queries=[vector_query],
+            filter=self._build_product_filter(category, min_price, max_price, in_stock_only),
+            top=top_k,
+            **search_kwargs,
         )
-        products = self.products_search_client.search(search_text=None, vector_queries=[vector_query])
         results = []
 
         for product_data in products:
@@ -149,17 +386,190 @@ class DatabaseService:
 
         return results
 
+    def get_stock_availability(self, product_ids: List[str]) -> StockAvailabilityResult:
+        """
+        Get stock count and price of several products with one filtered query.
+
+        Only the three needed fields are selected. Product ids that are not in the index are returned
+        as missing_product_ids.
+        """
+        product_ids = list(dict.fromkeys(product_ids))
+        if not product_ids:
+            return StockAvailabilityResult(products=[], missing_product_ids=[])
+
+        # search.in takes one delimited string; product ids never contain a comma
+        id_list = ",".join(_escape_odata(product_id) for product_id in product_ids)
+        results = self._search(
+            "get_stock_availability",
+            self.products_search_client,
+            ["product_id", "stock_count", "price"],
+            search_text="*",
+            filter=f"search.in(product_id, '{id_list}', ',')",
+            top=len(product_ids),
+        )
+        found: Dict[str, StockAvailability] = {}
+        for product_data in results:
+            found[product_data["product_id"]] = StockAvailability(
+                product_id=product_data["product_id"],
+                stock_count=product_data["stock_count"],
+                price=Decimal(str(product_data["price"])),
+                in_stock=product_data["stock_count"] > 0,
+            )
+
+        return StockAvailabilityResult(
+            products=[found[product_id] for product_id in product_ids if product_id in found],
+            missing_product_ids=[product_id for product_id in product_ids if product_id not in found],
+        )
+
+    # Aggregations
+    # Computed by the index (facets) or by reducing a minimal projection of the orders, so callers get a
+    # small summary instead of every order.
+    def _orders_filter(self,
+                       customer_id: str,
+                       start_date: Optional[date] = None,
+                       end_date: Optional[date] = None,
+                       exclude_statuses: Optional[List[str]] = None) -> str:
+        clauses = [f"customer_id eq '{_escape_odata(customer_id)}'"]
+        if start_date is not None:
+            clauses.append(f"order_date ge {start_date.isoformat()}T00:00:00Z")
+        if end_date is not None:
+            clauses.append(f"order_date le {end_date.isoformat()}T23:59:59Z")
+        for status in exclude_statuses or []:
+            clauses.append(f"status ne '{_escape_odata(status)}'")
+        return " and ".join(clauses)
+
+    def get_order_status_counts(self, customer_id: str) -> OrderStatusSummary:
+        """Count a customer's orders per status with a facet query, no orders are transferred."""
+        results = self._search(
+            "get_order_status_counts",
+            self.orders_search_client,
+            ["order_id"],
+            search_text="*",
+            filter=self._orders_filter(customer_id),
+            facets=["status,count:100"],
+            include_total_count=True,
+            top=0,
+        )
+        status_counts = {facet["value"]: facet["count"] for facet in results.facets.get("status", [])}
+        return OrderStatusSummary(
+            customer_id=customer_id,
+            total_orders=results.count or 0,
+            status_counts=status_counts,
+        )
+
+    def get_spending_summary(self,
+                             customer_id: str,
+                             start_date: Optional[date] = None,
+                             end_date: Optional[date] = None,
+                             group_by: str = "month",
+                             exclude_statuses: Optional[List[str]] = None) -> SpendingSummary:
+        """
+        Sum up a customer's order totals, overall and per "month" or "year".
+
+        Cancelled and returned orders are excluded unless exclude_statuses says otherwise.
+        """
+        if exclude_statuses is None:
+            exclude_statuses = ["Cancelled", "Returned"]
+        period_length = {"year": 4, "month": 7}[group_by]
+
+        results = self._search(
+            "get_spending_summary",
+            self.orders_search_client,
+            ["total_amount", "order_date"],
+            search_text="*",
+            filter=self._orders_filter(customer_id, start_date, end_date, exclude_statuses),
+        )
+        order_count = 0
+        total_spent = Decimal("0")
+        spent_by_period: Dict[str, Decimal] = defaultdict(Decimal)
+        for order_data in results:
+            amount = Decimal(str(order_data["total_amount"]))
+            period = self._parse_date(order_data["order_date"]).isoformat()[:period_length]
+            order_count += 1
+            total_spent += amount
+            spent_by_period[period] += amount
+
+        return SpendingSummary(
+            customer_id=customer_id,
+            start_date=start_date,
+            end_date=end_date,
+            order_count=order_count,
+            total_spent=total_spent,
+            spent_by_period=dict(sorted(spent_by_period.items())),
+            excluded_statuses=exclude_statuses,
+        )
+
+    def get_top_products(self,
+                         customer_id: str,
+                         limit: int = 5,
+                         exclude_statuses: Optional[List[str]] = None) -> TopProductsSummary:
+        """Rank the products a customer bought by quantity, streaming over the order items only."""
+        if exclude_statuses is None:
+            exclude_statuses = ["Cancelled"]
+
+        results = self._search(
+            "get_top_products",
+            self.orders_search_client,
+            ["items"],
+            search_text="*",
+            filter=self._orders_filter(customer_id, exclude_statuses=exclude_statuses),
+        )
+        purchases: Dict[str, ProductPurchase] = {}
+        for order_data in results:
+            for item in order_data.get("items") or []:
+                purchase = purchases.setdefault(item["product_id"], ProductPurchase(
+                    product_id=item["product_id"], quantity=0, order_count=0, total_spent=Decimal("0")))
+                purchase.quantity += item["quantity"]
+                purchase.order_count += 1
+                purchase.total_spent += Decimal(str(item["price"])) * item["quantity"]
+
+        top = sorted(purchases.values(), key=lambda p: (-p.quantity, -p.total_spent, p.product_id))[:limit]
+        return TopProductsSummary(customer_id=customer_id, products=top)
+
     # Mutators
+    # Writes are partial updates (merge) that go through the write-behind queue. Each returns a
+    # Future[WriteResult] that resolves once the search service acknowledged the write.
+    def merge_document(self, index_name: str, key: str, fields: Dict[str, Any]) -> Future:
+        """Queue a partial update with only the changed fields of one document."""
+        unknown_fields = set(fields) - MERGEABLE_FIELDS[index_name]
+        if unknown_fields:
+            raise ValueError(f"Fields {sorted(unknown_fields)} cannot be updated in index '{index_name}'")
+        return self.write_queue.submit(index_name, key, _to_document_value(fields))
+
+    def bulk_merge(self, index_name: str, updates: Dict[str, Dict[str, Any]]) -> Dict[str, Future]:
+        """Queue partial updates for many documents (key -> changed fields), e.g. admin corrections."""
+        return {key: self.merge_document(index_name, key, fields) for key, fields in updates.items()}
+
+    def merge_customer(self, customer_id: str, fields: Dict[str, Any]) -> Future:
+        return self.merge_document("customers", customer_id, fields)
+
+    def merge_order(self, order_id: str, fields: Dict[str, Any]) -> Future:
+        return self.merge_document("orders", order_id, fields)
+
+    def update_stock_count(self, product_id: str, stock_count: int) -> Future:
+        if stock_count < 0:
+            raise ValueError(f"Stock count must be non-negative, got {stock_count} for {product_id}")
+        return self.merge_document("products", product_id, {"stock_count": stock_count})
+
+    def update_stock_counts(self, stock_counts: Dict[str, int]) -> Dict[str, Future]:
+        """Queue stock count updates for many products (product_id -> new stock count)."""
+        return {product_id: self.update_stock_count(product_id, count) for product_id, count in stock_counts.items()}
+
+    def flush_writes(self, timeout: Optional[float] = None) -> bool:
+        """Wait until all queued writes are acknowledged. Returns False on timeout."""
+        return self.write_queue.flush(timeout=timeout)
+
     def update_customer_name(self, customer_id: str, new_name: str) -> bool:
-        customer = self.customer_admin_client.get_document(key=customer_id)
+        """Update the name of a customer and wait for the write to be acknowledged."""
         try:
-            customer['name'] = new_name
-            self.customer_admin_client.upload_documents(documents=[customer])
-            logger.info(f"Updated customer {customer_id} with name: {new_name}")
-            return True
+            result = self.merge_customer(customer_id, {"name": new_name}).result(
+                timeout=settings.write_ack_timeout_seconds)
         except Exception as e:
-            logger.error(e.message)
+            logger.error(f"Error updating name of customer {customer_id}: {e}")
             return False
+        if result.succeeded:
+            logger.info(f"Updated customer {customer_id} with name: {new_name}")
+        return result.succeeded
 
 # Create singleton instance
 db_service = DatabaseService()
\ No newline at end of file
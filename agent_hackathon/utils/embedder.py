@@ -1,14 +1,29 @@
 
-from openai import AzureOpenAI
+from openai import AzureOpenAI, DefaultHttpxClient
 from agent_hackathon.utils.config import settings
+from agent_hackathon.utils.http_transport import shared_transport
+from agent_hackathon.utils.rate_limiter import RateLimitedTransport, get_rate_limiter
 
 class Embedder:
     def __init__(self):
+        # connection pool shared with every other client of this process
+        transport = shared_transport()
+        if settings.rate_limit_enabled:
+            # shared with every other Embedder of this process
+            rate_limiter = get_rate_limiter(
+                f"embedding:{settings.azure_openai_embedding_deployment}",
+                requests_per_minute=settings.embedding_requests_per_minute,
+                tokens_per_minute=settings.embedding_tokens_per_minute,
+                max_concurrency=settings.embedding_max_concurrency,
+            )
+            transport = RateLimitedTransport(rate_limiter, transport)
+
         self.embedder = AzureOpenAI(
             azure_deployment=settings.azure_openai_embedding_deployment,
             api_version=settings.azure_openai_api_version_embedding,
             azure_endpoint=settings.azure_openai_endpoint_embedding,
             api_key=settings.azure_openai_key_embedding,
+            http_client=DefaultHttpxClient(transport=transport),
         )
 
 
@@ -17,4 +32,14 @@ class Embedder:
         embedding_response = self.embedder.embeddings.create(
             input=string, model=settings.azure_openai_embedding_model_name
         )
-        return embedding_response.data[0].embedding
\ No newline at end of file
+        return embedding_response.data[0].embedding
+
+    def embed_strings(self, strings: list[str], batch_size: int = 256) -> list[list[float]]:
+        """Embed many texts with one request per batch_size texts, in the order given."""
+        embeddings = []
+        for start in range(0, len(strings), batch_size):
+            embedding_response = self.embedder.embeddings.create(
+                input=strings[start:start + batch_size], model=settings.azure_openai_embedding_model_name
+            )
+            embeddings += [data.embedding for data in sorted(embedding_response.data, key=lambda d: d.index)]
+        return embeddings
@@ -0,0 +1,330 @@
+# embedding_store.py
+"""
+Compact on-disk store of the product embeddings.
+
+A version of the store is a directory with one .npy sidecar file per representation plus an id table:
+
+- vectors.f32.npy    float32 matrix (rows x dim), the full precision vectors
+- vectors.i8.npy     int8 matrix with one float32 scale per row in scales.npy (optional)
+- vectors.bin.npy    sign bits packed into uint8 (rows x dim/8) (optional)
+- ids.json           product id and content hash per row, the dimension and the embedding model
+
+All matrices are opened with numpy memory mapping, so opening is cheap and every process reading the
+same store shares the pages through the OS page cache instead of holding its own copy.
+
+Mapped files must never be rewritten in place (a process reading a truncated mapping dies with SIGBUS).
+So the store directory holds versions (v-<timestamp>/) and a CURRENT file naming the active one.
+EmbeddingStoreWriter writes a new version into a temporary directory, renames it and then swaps CURRENT
+with os.replace: readers see either the old or the new version, never a mix. Processes that still map an
+old version keep using it; versions older than the previous one are deleted (on POSIX the pages of a
+deleted file stay valid as long as they are mapped).
+
+Rows are keyed by a hash of the embedding model and the embedded text (`content_hash`), so the upload
+script only embeds texts whose vector is not in the store yet.
+
+`search` ranks all rows with the quantized matrix (int8 dot products or binary Hamming distance) and
+rescores the best candidates with the float32 vectors; without quantization it scans the float32 matrix
+in chunks. OpenAI embeddings have unit length, so the dot
+product equals the cosine similarity.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import time
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Literal, Optional, Tuple
+
+import numpy as np
+
+Quantization = Literal["none", "int8", "binary"]
+
+FLOAT_FILE = "vectors.f32.npy"
+INT8_FILE = "vectors.i8.npy"
+SCALES_FILE = "scales.npy"
+BINARY_FILE = "vectors.bin.npy"
+IDS_FILE = "ids.json"
+CURRENT_FILE = "CURRENT"
+VERSION_PREFIX = "v-"
+TEMP_PREFIX = ".tmp-"
+RAW_FILE = "vectors.f32.raw"
+
+# rows of a matrix scanned at once (and quantized at once while writing)
+SCAN_CHUNK_ROWS = 4096
+# committed versions kept, the active one and the previous one (which readers may just be opening)
+KEEP_VERSIONS = 2
+
+
+def content_hash(text: str, model: str) -> str:
+    """Key of an embedding: the same text embedded with the same model always has the same vector."""
+    return hashlib.sha256(f"{model}\n{text}".encode("utf-8")).hexdigest()
+
+
+def quantize_int8(vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Symmetric per-row int8 quantization, returns the int8 matrix and the float32 scale of every row."""
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    quantized = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+    return quantized, scales.astype(np.float32)
+
+
+def quantize_binary(vectors: np.ndarray) -> np.ndarray:
+    """One bit per dimension (positive or not), packed into uint8."""
+    return np.packbits(vectors > 0, axis=1)
+
+
+def _version_path(path: Path) -> Path:
+    """Directory of the active version; a store written before versioning is its own version."""
+    current = path / CURRENT_FILE
+    if current.exists():
+        return path / current.read_text(encoding="utf-8").strip()
+    return path
+
+
+def _write_atomically(path: Path, text: str) -> None:
+    temp = path.with_name(f"{TEMP_PREFIX}{uuid.uuid4().hex}-{path.name}")
+    with open(temp, "w", encoding="utf-8") as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp, path)
+
+
+@dataclass
+class EmbeddingMatch:
+    product_id: str
+    score: float
+
+
+class EmbeddingStore:
+    def __init__(self, path: str | Path):
+        """Open the active version of an existing store read-only. The matrices are memory mapped, nothing is read."""
+        self.path = Path(path)
+        # a writer may swap in a new version and delete an old one while we open it, then open the new one
+        for attempt in range(3):
+            try:
+                self._open(_version_path(self.path))
+                return
+            except FileNotFoundError:
+                if attempt == 2:
+                    raise
+
+    def _open(self, version_path: Path) -> None:
+        self.version_path = version_path
+        with open(version_path / IDS_FILE, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        self.model: str = meta["model"]
+        self.dim: int = meta["dim"]
+        self.product_ids: List[str] = meta["product_ids"]
+        self.content_hashes: List[str] = meta["content_hashes"]
+        self._rows_by_hash: Dict[str, int] = {h: row for row, h in enumerate(self.content_hashes)}
+        self._rows_by_id: Dict[str, int] = {product_id: row for row, product_id in enumerate(self.product_ids)}
+
+        self.vectors: np.ndarray = np.load(version_path / FLOAT_FILE, mmap_mode="r")
+        self.int8_vectors: Optional[np.ndarray] = None
+        self.scales: Optional[np.ndarray] = None
+        self.binary_vectors: Optional[np.ndarray] = None
+        if (version_path / INT8_FILE).exists():
+            self.int8_vectors = np.load(version_path / INT8_FILE, mmap_mode="r")
+            self.scales = np.load(version_path / SCALES_FILE, mmap_mode="r")
+        if (version_path / BINARY_FILE).exists():
+            self.binary_vectors = np.load(version_path / BINARY_FILE, mmap_mode="r")
+
+    def __len__(self) -> int:
+        return len(self.product_ids)
+
+    @classmethod
+    def exists(cls, path: str | Path) -> bool:
+        version_path = _version_path(Path(path))
+        return (version_path / IDS_FILE).exists() and (version_path / FLOAT_FILE).exists()
+
+    @classmethod
+    def write(cls,
+              path: str | Path,
+              model: str,
+              rows: Iterable[Tuple[str, str, List[float]]],
+              quantizations: Iterable[Quantization] = ("int8",)) -> "EmbeddingStore":
+        """
+        Write a new version of the store from (product id, content hash, vector) rows and make it active.
+
+        Args:
+            path: directory of the store
+            model: embedding model the vectors were created with
+            rows: the rows, streamed to disk (see EmbeddingStoreWriter)
+            quantizations: quantized sidecars to write in addition to the float32 matrix
+        """
+        with EmbeddingStoreWriter(path, model, quantizations) as writer:
+            for product_id, hash_, vector in rows:
+                writer.add(product_id, hash_, vector)
+            return writer.commit()
+
+    # --- lookups ---
+
+    def vector_for_hash(self, hash_: str) -> Optional[List[float]]:
+        """The stored vector of a content hash as a list (e.g. to upload it), None if it is not stored."""
+        row = self._rows_by_hash.get(hash_)
+        return None if row is None else self.vectors[row].tolist()
+
+    def vector(self, product_id: str) -> Optional[np.ndarray]:
+        row = self._rows_by_id.get(product_id)
+        return None if row is None else np.asarray(self.vectors[row])
+
+    # --- search ---
+
+    def search(self,
+               query: List[float] | np.ndarray,
+               top_k: int = 5,
+               quantization: Quantization = "int8",
+               rescore_factor: int = 4) -> List[EmbeddingMatch]:
+        """
+        Return the top_k most similar products.
+
+        With quantization "int8" or "binary" all rows are ranked with the quantized sidecar and the best
+        top_k * rescore_factor candidates are rescored with the float32 vectors; "none" is an exact scan.
+        """
+        query = np.asarray(query, dtype=np.float32)
+        top_k = min(top_k, len(self))
+        if quantization == "none":
+            # exact scores of all rows, no rescoring needed
+            scores = self._scan(self.vectors, query)
+            rows = _top(scores, top_k)
+            return [EmbeddingMatch(product_id=self.product_ids[row], score=float(scores[row])) for row in rows]
+
+        candidates = self._candidates(query, min(len(self), top_k * rescore_factor), quantization)
+        # rescoring touches only the candidate rows of the float32 matrix (sorted for sequential reads)
+        rows = np.sort(candidates)
+        scores = np.asarray(self.vectors[rows]) @ query
+        best = np.argsort(-scores)[:top_k]
+        return [EmbeddingMatch(product_id=self.product_ids[rows[i]], score=float(scores[i])) for i in best]
+
+    def _scan(self, matrix: np.ndarray, query: np.ndarray) -> np.ndarray:
+        """Dot product of every row with the query, a chunk at a time so only one chunk is in memory as float32."""
+        scores = np.empty(len(self), dtype=np.float32)
+        for start in range(0, len(self), SCAN_CHUNK_ROWS):
+            chunk = np.asarray(matrix[start:start + SCAN_CHUNK_ROWS], dtype=np.float32)
+            scores[start:start + len(chunk)] = chunk @ query
+        return scores
+
+    def _candidates(self, query: np.ndarray, count: int, quantization: Quantization) -> np.ndarray:
+        if quantization == "int8":
+            if self.int8_vectors is None:
+                raise ValueError(f"The store at {self.path} has no int8 sidecar")
+            # asymmetric: int8 rows against the float32 query, converted in chunks so BLAS can be used
+            approx = self._scan(self.int8_vectors, query)
+            approx *= self.scales
+        elif quantization == "binary":
+            if self.binary_vectors is None:
+                raise ValueError(f"The store at {self.path} has no binary sidecar")
+            query_bits = quantize_binary(query[None, :])[0]
+            # fewer differing bits = more similar
+            approx = -np.bitwise_count(np.bitwise_xor(self.binary_vectors, query_bits)).sum(axis=1, dtype=np.int32)
+        else:
+            raise ValueError(f"Unknown quantization '{quantization}'")
+        if count >= len(approx):
+            return np.arange(len(approx))
+        return np.argpartition(-approx, count - 1)[:count]
+
+
+def _top(scores: np.ndarray, count: int) -> np.ndarray:
+    """Indices of the `count` highest scores, best first."""
+    if count < len(scores):
+        candidates = np.argpartition(-scores, count - 1)[:count]
+    else:
+        candidates = np.arange(len(scores))
+    return candidates[np.argsort(-scores[candidates])]
+
+
+class EmbeddingStoreWriter:
+    """
+    Writes a new version of a store row by row.
+
+    The vectors are appended to a raw float32 file in a temporary directory, so memory holds only the ids
+    and hashes, not the vectors. `commit` converts them to the .npy matrices chunk by chunk and swaps the
+    version in; leaving the `with` block without committing (e.g. on an error) deletes the temporary directory.
+    """
+
+    def __init__(self, path: str | Path, model: str, quantizations: Iterable[Quantization] = ("int8",)):
+        self.path = Path(path)
+        self.model = model
+        self.quantizations = set(quantizations)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._temp_path = self.path / f"{TEMP_PREFIX}{uuid.uuid4().hex}"
+        self._temp_path.mkdir()
+        self._raw = open(self._temp_path / RAW_FILE, "wb")
+        self.dim: Optional[int] = None
+        self.product_ids: List[str] = []
+        self.content_hashes: List[str] = []
+
+    def __len__(self) -> int:
+        return len(self.product_ids)
+
+    def __enter__(self) -> "EmbeddingStoreWriter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.abort()
+
+    def add(self, product_id: str, hash_: str, vector: List[float] | np.ndarray) -> None:
+        vector = np.asarray(vector, dtype=np.float32)
+        if self.dim is None:
+            self.dim = len(vector)
+        elif len(vector) != self.dim:
+            raise ValueError(f"Vector of {product_id} has dimension {len(vector)}, expected {self.dim}")
+        self._raw.write(vector.tobytes())
+        self.product_ids.append(product_id)
+        self.content_hashes.append(hash_)
+
+    def commit(self) -> EmbeddingStore:
+        """Write the matrices and the id table, make the new version active and return it opened."""
+        if not self.product_ids:
+            raise ValueError("An embedding store needs at least one vector")
+        self._raw.close()
+        shape = (len(self.product_ids), self.dim)
+        raw = np.memmap(self._temp_path / RAW_FILE, dtype=np.float32, mode="r", shape=shape)
+        outputs = {FLOAT_FILE: np.lib.format.open_memmap(self._temp_path / FLOAT_FILE, "w+", np.float32, shape)}
+        if "int8" in self.quantizations:
+            outputs[INT8_FILE] = np.lib.format.open_memmap(self._temp_path / INT8_FILE, "w+", np.int8, shape)
+            outputs[SCALES_FILE] = np.lib.format.open_memmap(self._temp_path / SCALES_FILE, "w+", np.float32,
+                                                             (shape[0],))
+        if "binary" in self.quantizations:
+            outputs[BINARY_FILE] = np.lib.format.open_memmap(self._temp_path / BINARY_FILE, "w+", np.uint8,
+                                                             (shape[0], (self.dim + 7) // 8))
+        for start in range(0, shape[0], SCAN_CHUNK_ROWS):
+            chunk = np.asarray(raw[start:start + SCAN_CHUNK_ROWS])
+            end = start + len(chunk)
+            outputs[FLOAT_FILE][start:end] = chunk
+            if INT8_FILE in outputs:
+                outputs[INT8_FILE][start:end], outputs[SCALES_FILE][start:end] = quantize_int8(chunk)
+            if BINARY_FILE in outputs:
+                outputs[BINARY_FILE][start:end] = quantize_binary(chunk)
+        for matrix in outputs.values():
+            matrix.flush()
+        del raw, outputs
+        (self._temp_path / RAW_FILE).unlink()
+        with open(self._temp_path / IDS_FILE, "w", encoding="utf-8") as f:
+            json.dump({"model": self.model, "dim": self.dim, "product_ids": self.product_ids,
+                       "content_hashes": self.content_hashes}, f)
+            f.flush()
+            os.fsync(f.fileno())
+
+        version = f"{VERSION_PREFIX}{time.time_ns():020d}"
+        os.replace(self._temp_path, self.path / version)
+        _write_atomically(self.path / CURRENT_FILE, version)
+        self._remove_old_versions()
+        return EmbeddingStore(self.path)
+
+    def abort(self) -> None:
+        """Discard the rows written so far (a no-op after commit)."""
+        self._raw.close()
+        shutil.rmtree(self._temp_path, ignore_errors=True)
+
+    def _remove_old_versions(self) -> None:
+        versions = sorted(p for p in self.path.iterdir() if p.is_dir() and p.name.startswith(VERSION_PREFIX))
+        for old in versions[:-KEEP_VERSIONS]:
+            shutil.rmtree(old, ignore_errors=True)
+        # files of a store written before versioning, unlinking keeps them valid for processes mapping them
+        for name in (FLOAT_FILE, INT8_FILE, SCALES_FILE, BINARY_FILE, IDS_FILE):
+            (self.path / name).unlink(missing_ok=True)
@@ -0,0 +1,174 @@
+# generate_synthetic_data.py
+"""
+Generate a large, seeded synthetic dataset with the schema of data/database.json.
+
+The output directory gets one JSONL file per index (customers.jsonl, products.jsonl, orders.jsonl), the
+format the upload script reads with --data <directory>. Records are written as they are generated, so
+memory stays bounded by the product price table (8 bytes per product) regardless of the dataset size.
+
+The data is referentially consistent (orders only reference generated customers and products, item
+prices are the product prices, totals are the sum of the items) and every record is validated against
+the models in data_models.py. Popularity is skewed: customers and products are drawn with a power law,
+so a few hot customers have many orders and a few hot products appear in many of them (--skew); the
+hot ones are those with the lowest ids.
+
+Usage:
+    uv run agent_hackathon/utils/generate_synthetic_data.py --customers 1000000 --products 100000 \
+        --orders 5000000 --output data/synthetic
+"""
+
+import argparse
+import json
+import random
+import time
+from array import array
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Any, Dict, Iterator, Type
+
+from pydantic import BaseModel
+
+from agent_hackathon.data_models import Customer, Order, Product
+
+FIRST_NAMES = ["Sarah", "Michael", "Emma", "James", "Olivia", "David", "Sophia", "Daniel", "Mia", "Lucas",
+               "Ava", "Noah", "Isabella", "Ethan", "Amelia", "Liam", "Harper", "Mason", "Ella", "Logan"]
+LAST_NAMES = ["Chen", "Johnson", "Garcia", "Smith", "Müller", "Nguyen", "Brown", "Rossi", "Kim", "Patel",
+              "Williams", "Lopez", "Wilson", "Anderson", "Taylor", "Thomas", "Moore", "Martin", "Lee", "Clark"]
+STREETS = ["Oak Street", "Maple Avenue", "Pine Road", "Cedar Lane", "Elm Street", "Main Street", "Lake Drive"]
+CITIES = [("Portland", "OR", "972"), ("Seattle", "WA", "981"), ("Austin", "TX", "787"), ("Denver", "CO", "802"),
+          ("Boston", "MA", "021"), ("Chicago", "IL", "606"), ("Miami", "FL", "331"), ("Phoenix", "AZ", "850")]
+
+# category -> (product names, price range, description template)
+CATEGORIES = {
+    "Laptops": (["UltraBook", "ProBook", "AirBook", "WorkStation"], (499, 2999),
+                "{size}-inch laptop with {ram}GB RAM and {storage}GB SSD"),
+    "Phones": (["SmartPhone", "Galaxy Edge", "Pixel Pro"], (199, 1399), "Smartphone with {size}-inch display"),
+    "Tablets": (["Tab", "Pad Pro", "Slate"], (149, 1199), "{size}-inch tablet with {storage}GB storage"),
+    "Monitors": (["View", "UltraWide", "ColorPro"], (129, 1499), "{size}-inch monitor for work and gaming"),
+    "Audio": (["SoundWave", "BassPods", "StudioMax"], (19, 499), "Wireless headphones with noise cancellation"),
+    "Accessories": (["Charger", "Cable", "Sleeve", "Dock"], (9, 149), "Accessory compatible with most devices"),
+    "Storage": (["FlashDrive", "SSD Portable", "NAS"], (19, 699), "{storage}GB storage for backups and media"),
+    "Cameras": (["SnapShot", "ProShot", "ActionCam"], (99, 2499), "Camera with {ram}MP sensor"),
+}
+# order status -> weight, statuses with a tracking number
+STATUSES = {"Delivered": 0.45, "Shipped": 0.2, "Processing": 0.2, "Cancelled": 0.08, "Returned": 0.07}
+TRACKED_STATUSES = {"Delivered", "Shipped", "Returned"}
+
+
+def skewed_index(rng: random.Random, count: int, skew: float) -> int:
+    """Index in [0, count) drawn with a power law: skew 1 is uniform, larger values favour low indexes."""
+    return min(count - 1, int(count * rng.random() ** skew))
+
+
+def _id(prefix: str, number: int, count: int) -> str:
+    return f"{prefix}{number:0{max(3, len(str(count)))}d}"
+
+
+def generate_customers(rng: random.Random, count: int) -> Iterator[Dict[str, Any]]:
+    for n in range(1, count + 1):
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        city, state, zip_prefix = rng.choice(CITIES)
+        yield {
+            "customer_id": _id("CUST", n, count),
+            "name": f"{first} {last}",
+            "email": f"{first.lower()}.{last.lower()}{n}@example.com",
+            "phone": f"+1-555-{rng.randint(0, 9999):04d}",
+            "address": f"{rng.randint(1, 9999)} {rng.choice(STREETS)}, {city}, {state} {zip_prefix}{rng.randint(0, 99):02d}",
+        }
+
+
+def generate_products(rng: random.Random, count: int, prices: array) -> Iterator[Dict[str, Any]]:
+    """Products; their prices are appended to `prices` for the orders."""
+    for n in range(1, count + 1):
+        category = rng.choice(list(CATEGORIES))
+        names, (low, high), description = CATEGORIES[category]
+        price = round(round(rng.uniform(low, high)) - 0.01, 2)
+        prices.append(price)
+        yield {
+            "product_id": _id("PROD", n, count),
+            "name": f"{rng.choice(names)} {rng.randint(1, 20)}",
+            "category": category,
+            "price": price,
+            # about one in ten products is out of stock
+            "stock_count": 0 if rng.random() < 0.1 else rng.randint(1, 500),
+            "description": description.format(size=rng.choice([6, 11, 13, 15, 24, 27]),
+                                              ram=rng.choice([8, 16, 24, 32, 48]),
+                                              storage=rng.choice([128, 256, 512, 1024, 2048])),
+        }
+
+
+def generate_orders(rng: random.Random, count: int, customer_count: int, prices: array, skew: float,
+                    start_date: date, end_date: date) -> Iterator[Dict[str, Any]]:
+    days = (end_date - start_date).days + 1
+    statuses, weights = list(STATUSES), list(STATUSES.values())
+    tracking_number = 1_000_000
+    for n in range(1, count + 1):
+        items = {}
+        for _ in range(skewed_index(rng, 4, 2.0) + 1):
+            product = skewed_index(rng, len(prices), skew)
+            items[product] = items.get(product, 0) + skewed_index(rng, 3, 3.0) + 1
+        status = rng.choices(statuses, weights)[0]
+        tracking = None
+        if status in TRACKED_STATUSES:
+            tracking_number += 1
+            tracking = f"TRK{tracking_number:09d}"
+        yield {
+            "order_id": _id("ORD", n, count),
+            "customer_id": _id("CUST", skewed_index(rng, customer_count, skew) + 1, customer_count),
+            "status": status,
+            "total_amount": round(sum(prices[product] * quantity for product, quantity in items.items()), 2),
+            "order_date": (start_date + timedelta(days=rng.randrange(days))).isoformat(),
+            "tracking_number": tracking,
+            "items": [{"product_id": _id("PROD", product + 1, len(prices)), "quantity": quantity,
+                       "price": prices[product]} for product, quantity in items.items()],
+        }
+
+
+def write_jsonl(path: Path, records: Iterator[Dict[str, Any]], model: Type[BaseModel], validate: bool) -> int:
+    count = 0
+    with open(path, "w", encoding="utf-8") as f:
+        for record in records:
+            if validate:
+                model(**record)
+            f.write(json.dumps(record, ensure_ascii=False))
+            f.write("\n")
+            count += 1
+    return count
+
+
+def iter_jsonl(path: Path) -> Iterator[Dict[str, Any]]:
+    """Read the records of a JSONL file one by one."""
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--customers", type=int, default=10_000, help="Number of customers")
+    parser.add_argument("--products", type=int, default=1_000, help="Number of products")
+    parser.add_argument("--orders", type=int, default=50_000, help="Number of orders")
+    parser.add_argument("--skew", type=float, default=2.0,
+                        help="Power law exponent of customer and product popularity, 1 is uniform")
+    parser.add_argument("--start-date", type=date.fromisoformat, default=date(2023, 1, 1), help="First order date")
+    parser.add_argument("--end-date", type=date.fromisoformat, default=date(2024, 12, 31), help="Last order date")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed, the same seed gives the same data")
+    parser.add_argument("--no-validate", action="store_true", help="Skip validating the records with the models")
+    parser.add_argument("--output", type=Path, default=Path("data/synthetic"), help="Output directory")
+    args = parser.parse_args()
+
+    args.output.mkdir(parents=True, exist_ok=True)
+    validate = not args.no_validate
+    rng = random.Random(args.seed)
+    product_prices = array("d")
+
+    for name, records, model in [
+        ("customers", lambda: generate_customers(rng, args.customers), Customer),
+        ("products", lambda: generate_products(rng, args.products, product_prices), Product),
+        ("orders", lambda: generate_orders(rng, args.orders, args.customers, product_prices, args.skew,
+                                           args.start_date, args.end_date), Order),
+    ]:
+        start = time.perf_counter()
+        written = write_jsonl(args.output / f"{name}.jsonl", records(), model, validate)
+        print(f"Wrote {written} {name} to {args.output / f'{name}.jsonl'} in {time.perf_counter() - start:.1f}s")
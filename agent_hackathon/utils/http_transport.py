@@ -0,0 +1,166 @@
+# http_transport.py
+"""
+Process-wide HTTP connection pools shared by all Azure clients, and an optional connection warm-up.
+
+Without this every client keeps its own pool: the chat client per deployment, the embedding client and
+each SearchClient in DatabaseService. A fresh worker then pays DNS, TCP and TLS setup to the same
+endpoints several times, the first of them during the first customer message.
+
+- `shared_transport` / `shared_async_transport`: one httpx pool each for the sync (embedding) and async
+  (chat) openai clients. The rate limiting transports wrap them.
+- `search_transport`: azure-core transports for the SearchClients, all using one requests session.
+- `warm_up_connections`: opens connections to every endpoint ahead of the first request, started in the
+  background at `@cl.on_chat_start` and at terminal start if HTTP_WARM_UP_ENABLED is set.
+
+Pool limits and the keep-alive expiry come from the HTTP_* settings. Idle connections are closed by the
+Azure load balancers after about four minutes, so the keep-alive expiry should stay below that.
+"""
+
+import asyncio
+import threading
+import time
+from typing import Dict, List, Optional
+
+import httpx
+import requests
+from azure.core.pipeline.transport import RequestsTransport
+from loguru import logger
+
+from agent_hackathon.utils.config import settings
+
+_lock = threading.Lock()
+_sync_transport: Optional[httpx.HTTPTransport] = None
+_async_transport: Optional[httpx.AsyncHTTPTransport] = None
+_requests_session: Optional[requests.Session] = None
+
+
+class _SharedHTTPTransport(httpx.HTTPTransport):
+    # shared by several clients, closing one client must not close the pool of the others
+    def close(self) -> None:
+        pass
+
+
+class _SharedAsyncHTTPTransport(httpx.AsyncHTTPTransport):
+    async def aclose(self) -> None:
+        pass
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=settings.http_max_connections,
+        max_keepalive_connections=settings.http_max_keepalive_connections,
+        keepalive_expiry=settings.http_keepalive_expiry_seconds,
+    )
+
+
+def shared_transport() -> httpx.HTTPTransport:
+    """The process-wide sync httpx transport (connection pool)."""
+    global _sync_transport
+    with _lock:
+        if _sync_transport is None:
+            _sync_transport = _SharedHTTPTransport(limits=_limits())
+        return _sync_transport
+
+
+def shared_async_transport() -> httpx.AsyncHTTPTransport:
+    """The process-wide async httpx transport (connection pool)."""
+    global _async_transport
+    with _lock:
+        if _async_transport is None:
+            _async_transport = _SharedAsyncHTTPTransport(limits=_limits())
+        return _async_transport
+
+
+def _shared_session() -> requests.Session:
+    global _requests_session
+    with _lock:
+        if _requests_session is None:
+            _requests_session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=4,
+                                                    pool_maxsize=settings.http_max_keepalive_connections)
+            _requests_session.mount("https://", adapter)
+            _requests_session.mount("http://", adapter)
+        return _requests_session
+
+
+def search_transport() -> RequestsTransport:
+    """An azure-core transport for a SearchClient, all of them share one requests session."""
+    return RequestsTransport(session=_shared_session(), session_owner=False)
+
+
+# --- warm-up ---
+
+async def _warm_up_httpx(url: str, connections: int) -> None:
+    transport = shared_async_transport()
+
+    async def open_connection() -> None:
+        # any response keeps the connection in the pool, authentication is not needed for that
+        response = await transport.handle_async_request(httpx.Request("HEAD", url))
+        await response.aclose()
+
+    await asyncio.gather(*(open_connection() for _ in range(connections)))
+
+
+def _warm_up_httpx_sync(url: str) -> None:
+    response = shared_transport().handle_request(httpx.Request("HEAD", url))
+    response.close()
+
+
+def _warm_up_search(url: str) -> None:
+    _shared_session().head(url, timeout=10).close()
+
+
+async def warm_up_connections(connections: Optional[int] = None) -> Dict[str, float]:
+    """
+    Open connections to the chat, embedding and search endpoints in the shared pools.
+
+    Args:
+        connections: connections to open to the chat and search endpoints, default HTTP_WARM_UP_CONNECTIONS
+
+    Returns:
+        Seconds spent per endpoint; endpoints that failed are logged and left out
+    """
+    connections = connections or settings.http_warm_up_connections
+    chat_url = str(settings.azure_openai_endpoint)
+    embedding_url = str(settings.azure_openai_endpoint_embedding)
+    search_url = str(settings.azure_search_endpoint)
+
+    async def timed(name: str, coroutine) -> Optional[tuple]:
+        start = time.perf_counter()
+        try:
+            await coroutine
+        except Exception as e:
+            logger.warning(f"Connection warm-up of {name} failed: {e}")
+            return None
+        return name, time.perf_counter() - start
+
+    # the search pool is used from worker threads, so it is warmed up with concurrent requests as well
+    tasks: List = [timed("chat", _warm_up_httpx(chat_url, connections)),
+                   timed("embedding", asyncio.to_thread(_warm_up_httpx_sync, embedding_url))]
+    tasks += [timed("search", asyncio.to_thread(_warm_up_search, search_url)) for _ in range(connections)]
+
+    timings: Dict[str, float] = {}
+    for result in await asyncio.gather(*tasks):
+        if result is not None:
+            name, seconds = result
+            timings[name] = max(timings.get(name, 0.0), seconds)
+    logger.info("Connection warm-up: " + ", ".join(f"{name} {1000 * s:.0f}ms" for name, s in timings.items()))
+    return timings
+
+
+_warm_up_task: Optional[asyncio.Task] = None
+
+
+def start_warm_up() -> Optional[asyncio.Task]:
+    """
+    Warm up the connections in the background if HTTP_WARM_UP_ENABLED is set.
+
+    Connections that are still open are reused by the warm-up requests, so calling this again (e.g. per
+    chat) only reopens connections the keep-alive expiry has closed in between.
+    """
+    global _warm_up_task
+    if not settings.http_warm_up_enabled:
+        return None
+    if _warm_up_task is None or _warm_up_task.done():
+        _warm_up_task = asyncio.create_task(warm_up_connections())
+    return _warm_up_task
@@ -0,0 +1,175 @@
+# model_tiering.py
+"""
+Per-agent model tiers with optional escalation to a larger deployment.
+
+TieredModel wraps the model of one agent. Every model call is timed and its token usage is recorded per
+agent and tier (deployment), see `log_model_tier_stats`. If an escalation model is configured, a turn of
+the primary (smaller) model is checked before it is returned, and repeated with the escalation model if it
+failed: it refused, replied with nothing, called a tool or handoff that does not exist or produced
+arguments that are not valid JSON. A routing agent can also require a tool or handoff call whenever the
+user's latest message names something that has to be routed (e.g. an order id); other direct replies,
+like greetings or clarifying questions, are fine.
+
+Functions registered with `on_model_response` are called with the agent's name after each (non-streamed)
+model turn, e.g. to time handoffs up to the receiving agent's first answer.
+"""
+
+import json
+import re
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from agents import Model, ModelResponse
+from loguru import logger
+
+from agent_hackathon.utils.stats import StatsRecorder
+
+
+@dataclass
+class TierStats:
+    calls: int = 0
+    escalations: int = 0
+    latency_s: float = 0.0
+    input_tokens: int = 0
+    output_tokens: int = 0
+
+
+# keyed by (agent name, tier)
+_stats: StatsRecorder[TierStats] = StatsRecorder(TierStats)
+_response_listeners: List[Callable[[str], None]] = []
+
+
+def on_model_response(listener: Callable[[str], None]) -> Callable[[str], None]:
+    """Register a function that is called with the agent's name whenever one of its model turns returned."""
+    _response_listeners.append(listener)
+    return listener
+
+
+def _record(agent_name: str, tier: str, latency_s: float, response: Optional[ModelResponse]) -> None:
+    with _stats.update((agent_name, tier)) as stats:
+        stats.calls += 1
+        stats.latency_s += latency_s
+        if response is not None and response.usage is not None:
+            stats.input_tokens += response.usage.input_tokens
+            stats.output_tokens += response.usage.output_tokens
+
+
+def model_tier_stats() -> Dict[Tuple[str, str], TierStats]:
+    """Snapshot of the recorded stats, keyed by (agent name, tier)."""
+    return _stats.snapshot()
+
+
+def log_model_tier_stats() -> None:
+    for (agent_name, tier), stats in sorted(model_tier_stats().items()):
+        logger.info(f"[{agent_name} @ {tier}] {stats.calls} calls, "
+                    f"mean latency {1000 * stats.latency_s / stats.calls:.0f}ms, "
+                    f"{stats.input_tokens} input / {stats.output_tokens} output tokens, "
+                    f"{stats.escalations} turns escalated away")
+
+
+def _latest_user_message(input: Any) -> str:
+    """Text of the last user message of a model input (a string or a list of input items)."""
+    if isinstance(input, str):
+        return input
+    for item in reversed(input or []):
+        if isinstance(item, dict) and item.get("role") == "user":
+            content = item.get("content")
+            if isinstance(content, str):
+                return content
+            return " ".join(part.get("text", "") for part in content or [] if isinstance(part, dict))
+    return ""
+
+
+def turn_failure(response: ModelResponse,
+                 tools: list,
+                 handoffs: list,
+                 input: Any = None,
+                 require_tool_call_for: Optional[re.Pattern] = None) -> Optional[str]:
+    """Return why a model turn failed, or None if it looks valid."""
+    valid_names = {tool.name for tool in tools} | {handoff.tool_name for handoff in handoffs}
+    tool_calls = [item for item in response.output if getattr(item, "type", None) == "function_call"]
+    for call in tool_calls:
+        if call.name not in valid_names:
+            return f"unknown tool or handoff '{call.name}'"
+        try:
+            json.loads(call.arguments or "{}")
+        except json.JSONDecodeError:
+            return f"invalid JSON arguments for '{call.name}'"
+    if tool_calls:
+        return None
+
+    parts = [part for item in response.output if getattr(item, "type", None) == "message" for part in item.content]
+    if any(getattr(part, "type", None) == "refusal" for part in parts):
+        return "refusal"
+    if not any((getattr(part, "text", None) or "").strip() for part in parts):
+        return "empty response"
+    if require_tool_call_for is not None and valid_names:
+        entity = require_tool_call_for.search(_latest_user_message(input))
+        if entity is not None:
+            return f"no tool call although the message names '{entity.group(0)}'"
+    return None
+
+
+class TieredModel(Model):
+    def __init__(self,
+                 agent_name: str,
+                 model: Model,
+                 tier: str,
+                 escalation_model: Optional[Model] = None,
+                 escalation_tier: Optional[str] = None,
+                 require_tool_call_for: Optional[re.Pattern] = None):
+        """
+        Args:
+            agent_name: name of the agent using this model, for the stats
+            model: the model answering every turn first
+            tier: name of the model's tier (deployment) for the stats
+            escalation_model: model that repeats turns the first model failed, None disables escalation
+            escalation_tier: name of the escalation model's tier
+            require_tool_call_for: treat turns without any tool or handoff call as failed if the user's
+                latest message matches this pattern
+        """
+        self.agent_name = agent_name
+        self.model = model
+        self.tier = tier
+        self.escalation_model = escalation_model
+        self.escalation_tier = escalation_tier
+        self.require_tool_call_for = require_tool_call_for
+
+    async def _timed_response(self, model: Model, tier: str, args, kwargs) -> ModelResponse:
+        start = time.perf_counter()
+        response = None
+        try:
+            response = await model.get_response(*args, **kwargs)
+            return response
+        finally:
+            _record(self.agent_name, tier, time.perf_counter() - start, response)
+
+    async def get_response(self, *args: Any, **kwargs: Any) -> ModelResponse:
+        response = await self._checked_response(args, kwargs)
+        for listener in _response_listeners:
+            listener(self.agent_name)
+        return response
+
+    async def _checked_response(self, args, kwargs) -> ModelResponse:
+        response = await self._timed_response(self.model, self.tier, args, kwargs)
+        if self.escalation_model is None:
+            return response
+
+        failure = turn_failure(response, kwargs.get("tools") or [], kwargs.get("handoffs") or [],
+                               kwargs.get("input"), self.require_tool_call_for)
+        if failure is None:
+            return response
+
+        logger.info(f"[{self.agent_name}] escalating turn from {self.tier} to {self.escalation_tier}: {failure}")
+        with _stats.update((self.agent_name, self.tier)) as stats:
+            stats.escalations += 1
+        escalated = await self._timed_response(self.escalation_model, self.escalation_tier, args, kwargs)
+        # the tokens of the failed turn were spent as well, keep them in the run's usage
+        if escalated.usage is not None and response.usage is not None:
+            escalated.usage.add(response.usage)
+        return escalated
+
+    def stream_response(self, *args: Any, **kwargs: Any):
+        # a streamed turn is already visible before it could be validated, so it is never escalated
+        return self.model.stream_response(*args, **kwargs)
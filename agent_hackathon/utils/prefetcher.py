@@ -0,0 +1,147 @@
+# prefetcher.py
+"""
+Speculative, session-scoped prefetching of a customer's context.
+
+Once a customer has been identified, the next tool calls are almost always the customer's orders and the
+products in those orders. `CustomerContextPrefetcher.prefetch_customer` starts these lookups in the
+background (bounded by a semaphore), and the tools ask the prefetcher first via `get`, which returns a
+finished result immediately or waits for the one still in flight instead of starting the same lookup again.
+
+The prefetcher lives as long as the session, but its results are only valid in the run that started them:
+each result is handed out once, `start_run` (called by the frontends before every run) drops the results of
+the previous run, and `invalidate` (called after a tool changed data) drops all of them, so a later
+lookup goes to the database again. `cancel` stops outstanding prefetches at the end of a session; a tool
+waiting for a cancelled prefetch loads the result itself.
+"""
+
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional, Set, Tuple
+
+from loguru import logger
+
+from agent_hackathon.utils.database_service import db_service
+
+
+@dataclass
+class PrefetchStats:
+    scheduled: int = 0
+    hits: int = 0
+    misses: int = 0
+    saved_s: float = 0.0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+@dataclass
+class _Prefetch:
+    task: asyncio.Task
+    started_at: float
+    run: int = 0
+    finished_at: Optional[float] = None
+
+
+class CustomerContextPrefetcher:
+    def __init__(self, max_concurrency: int = 4, max_products: int = 20):
+        self.max_products = max_products
+        self.stats = PrefetchStats()
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._prefetches: Dict[Tuple[str, str], _Prefetch] = {}
+        self._tasks: Set[asyncio.Task] = set()
+        self._prefetched_customers: Set[str] = set()
+        # number of the current run, prefetches of earlier runs are not handed out
+        self._run = 0
+
+    def start_run(self) -> None:
+        """A new run starts: results prefetched for earlier runs may be stale by now."""
+        self._run += 1
+        self.invalidate()
+
+    def invalidate(self) -> None:
+        """Drop all prefetched results, e.g. after a tool changed data; they are fetched again when needed."""
+        for prefetch in self._prefetches.values():
+            prefetch.task.cancel()
+        self._prefetches.clear()
+        self._prefetched_customers.clear()
+
+    def prefetch_customer(self, customer_id: str) -> None:
+        """Start fetching the customer's orders and the products in them in the background."""
+        if customer_id in self._prefetched_customers:
+            return
+        self._prefetched_customers.add(customer_id)
+        self._schedule("orders", customer_id, db_service.get_orders_by_customer, on_done=self._prefetch_order_products)
+
+    async def get(self, kind: str, key: str, loader: Callable[[str], Any]) -> Any:
+        """Return the prefetched result for (kind, key), or load it now if nothing was prefetched."""
+        prefetch = self._prefetches.pop((kind, key), None)
+        if prefetch is None or prefetch.run != self._run or prefetch.task.cancelled():
+            self.stats.misses += 1
+            return await asyncio.to_thread(loader, key)
+
+        requested_at = time.perf_counter()
+        try:
+            result = await asyncio.shield(prefetch.task)
+        except asyncio.CancelledError:
+            if not prefetch.task.cancelled():
+                # the tool call itself was cancelled
+                raise
+            # the prefetch was cancelled (cancel / invalidate) while we waited for it: a miss
+            self.stats.misses += 1
+            return await asyncio.to_thread(loader, key)
+        except Exception:
+            # a failed prefetch counts as a miss, the caller gets a fresh attempt
+            self.stats.misses += 1
+            return await asyncio.to_thread(loader, key)
+
+        self.stats.hits += 1
+        # the part of the lookup that happened before it was requested
+        self.stats.saved_s += max(0.0, min(prefetch.finished_at, requested_at) - prefetch.started_at)
+        logger.info(f"Prefetch hit: {kind} {key}")
+        return result
+
+    def cancel(self) -> None:
+        """Cancel all outstanding prefetches, e.g. when the session ends."""
+        for task in list(self._tasks):
+            task.cancel()
+        self._prefetches.clear()
+
+    def log_stats(self) -> None:
+        logger.info(f"[prefetch] {self.stats.scheduled} prefetches, {self.stats.hits} hits, {self.stats.misses} misses "
+                    f"(hit rate {100 * self.stats.hit_rate:.0f}%), {1000 * self.stats.saved_s:.0f}ms lookup time saved")
+
+    def _schedule(self, kind: str, key: str, loader: Callable[[str], Any],
+                  on_done: Optional[Callable[[Any], None]] = None) -> None:
+        if (kind, key) in self._prefetches:
+            return
+        prefetch = _Prefetch(task=None, started_at=time.perf_counter(), run=self._run)
+
+        async def run() -> Any:
+            async with self._semaphore:
+                prefetch.started_at = time.perf_counter()
+                try:
+                    result = await asyncio.to_thread(loader, key)
+                finally:
+                    prefetch.finished_at = time.perf_counter()
+            if on_done is not None and prefetch.run == self._run:
+                on_done(result)
+            return result
+
+        prefetch.task = asyncio.create_task(run())
+        prefetch.task.add_done_callback(self._on_task_done)
+        self._tasks.add(prefetch.task)
+        self._prefetches[(kind, key)] = prefetch
+        self.stats.scheduled += 1
+
+    def _on_task_done(self, task: asyncio.Task) -> None:
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning(f"Prefetch failed: {task.exception()}")
+
+    def _prefetch_order_products(self, orders) -> None:
+        product_ids = list(dict.fromkeys(item.product_id for order in orders for item in order.items))
+        for product_id in product_ids[:self.max_products]:
+            self._schedule("product", product_id, db_service.get_product_by_id)
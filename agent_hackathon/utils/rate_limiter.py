@@ -0,0 +1,338 @@
+# rate_limiter.py
+"""
+Process-wide adaptive rate limiting for the Azure OpenAI clients.
+
+Each Azure OpenAI deployment has its own requests-per-minute (RPM) and tokens-per-minute (TPM) quota,
+so there is one AdaptiveRateLimiter per deployment, shared by every client and session in the process.
+The limiter is installed as an httpx transport wrapper (RateLimitedTransport / AsyncRateLimitedTransport),
+so it sees every request the openai clients send, including their own retries, and every response.
+
+- Token buckets on requests and estimated tokens keep the process below the configured quota.
+- Concurrency is adjusted adaptively: halved on every 429, increased by one after a run of successes.
+  A `retry-after` header pauses all requests to that deployment for the requested time, instead of
+  every session retrying on its own.
+- Waiting requests are granted round-robin across sessions (see `current_session_id`), so one busy
+  Chainlit session cannot starve the others.
+
+Queue wait times and throttle events are available through `stats()` and logged when they happen.
+"""
+
+import asyncio
+import threading
+import time
+from collections import deque, OrderedDict
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Deque, Dict, Mapping, Optional
+
+import httpx
+from loguru import logger
+
+# Set by the frontends to the id of the conversation a request belongs to, used for fair queueing
+current_session_id: ContextVar[str] = ContextVar("current_session_id", default="default")
+
+# Rough token estimate for request bodies (bytes per token) and the assumed completion size
+BYTES_PER_TOKEN = 4
+DEFAULT_COMPLETION_TOKENS = 500
+
+
+class _TokenBucket:
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.tokens = float(per_minute)
+        self.updated = time.monotonic()
+
+    def refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` is available. Amounts above the capacity only wait for a full bucket."""
+        if self.rate <= 0:
+            # a limit of 0 per minute disables the bucket
+            return 0.0
+        missing = min(amount, self.capacity) - self.tokens
+        return max(0.0, missing / self.rate)
+
+
+@dataclass
+class _Waiter:
+    cost: float
+    enqueued_at: float
+    grant: threading.Event = field(default_factory=threading.Event)
+    loop: Optional[asyncio.AbstractEventLoop] = None
+    future: Optional[asyncio.Future] = None
+
+
+@dataclass
+class RateLimiterStats:
+    requests: int = 0
+    throttle_events: int = 0
+    total_wait_s: float = 0.0
+    max_wait_s: float = 0.0
+    concurrency_limit: int = 0
+    in_flight: int = 0
+    queued: int = 0
+
+    @property
+    def mean_wait_ms(self) -> float:
+        return 1000 * self.total_wait_s / self.requests if self.requests else 0.0
+
+
+class AdaptiveRateLimiter:
+    def __init__(self,
+                 name: str,
+                 requests_per_minute: int,
+                 tokens_per_minute: int,
+                 max_concurrency: int = 16,
+                 min_concurrency: int = 1,
+                 increase_after_successes: int = 20,
+                 log_wait_threshold_s: float = 1.0):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.increase_after_successes = increase_after_successes
+        self.log_wait_threshold_s = log_wait_threshold_s
+
+        self._request_bucket = _TokenBucket(requests_per_minute)
+        self._token_bucket = _TokenBucket(tokens_per_minute)
+        self._concurrency = max_concurrency
+        self._in_flight = 0
+        self._successes = 0
+        self._paused_until = 0.0
+        # session id -> waiting requests of that session; sessions are served round-robin
+        self._queues: "OrderedDict[str, Deque[_Waiter]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._timer: Optional[threading.Timer] = None
+        # monotonic time the pending timer fires at
+        self._timer_deadline = 0.0
+        self._stats = RateLimiterStats(concurrency_limit=max_concurrency)
+
+    # --- acquiring and releasing capacity ---
+
+    def acquire(self, cost: float, session_id: Optional[str] = None) -> float:
+        """Block until the request may be sent. Returns the time waited in seconds."""
+        waiter = self._enqueue(cost, session_id, loop=None)
+        waiter.grant.wait()
+        return self._granted(waiter)
+
+    async def acquire_async(self, cost: float, session_id: Optional[str] = None) -> float:
+        """Wait (without blocking the event loop) until the request may be sent. Returns the time waited."""
+        loop = asyncio.get_running_loop()
+        waiter = self._enqueue(cost, session_id, loop=loop)
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            self._cancel(waiter)
+            raise
+        return self._granted(waiter)
+
+    def release(self, status_code: Optional[int], retry_after_s: Optional[float] = None) -> None:
+        """Report the outcome of a request and free its concurrency slot."""
+        with self._lock:
+            self._in_flight -= 1
+            if status_code == 429:
+                self._on_throttled(retry_after_s)
+            elif status_code is not None and status_code < 400:
+                self._successes += 1
+                if self._successes >= self.increase_after_successes and self._concurrency < self.max_concurrency:
+                    self._concurrency += 1
+                    self._successes = 0
+            self._dispatch()
+
+    def stats(self) -> RateLimiterStats:
+        with self._lock:
+            self._stats.concurrency_limit = self._concurrency
+            self._stats.in_flight = self._in_flight
+            self._stats.queued = sum(len(q) for q in self._queues.values())
+            return RateLimiterStats(**self._stats.__dict__)
+
+    # --- internals, called with the lock held unless noted otherwise ---
+
+    def _enqueue(self, cost: float, session_id: Optional[str], loop) -> _Waiter:
+        waiter = _Waiter(cost=cost, enqueued_at=time.monotonic(), loop=loop,
+                         future=loop.create_future() if loop else None)
+        with self._lock:
+            self._queues.setdefault(session_id or current_session_id.get(), deque()).append(waiter)
+            self._dispatch()
+        return waiter
+
+    def _granted(self, waiter: _Waiter) -> float:
+        # called without the lock
+        waited = time.monotonic() - waiter.enqueued_at
+        with self._lock:
+            self._stats.requests += 1
+            self._stats.total_wait_s += waited
+            self._stats.max_wait_s = max(self._stats.max_wait_s, waited)
+        if waited >= self.log_wait_threshold_s:
+            logger.info(f"[{self.name}] request waited {waited:.2f}s for rate limit capacity")
+        return waited
+
+    def _cancel(self, waiter: _Waiter) -> None:
+        # called without the lock, when an async waiter is cancelled
+        with self._lock:
+            for session_id, queue in self._queues.items():
+                if waiter in queue:
+                    queue.remove(waiter)
+                    if not queue:
+                        del self._queues[session_id]
+                    # the next waiter may be cheaper, i.e. due earlier
+                    self._dispatch()
+                    return
+            # the grant raced with the cancellation, give the slot back
+            self._in_flight -= 1
+            self._dispatch()
+
+    def _on_throttled(self, retry_after_s: Optional[float]) -> None:
+        self._stats.throttle_events += 1
+        self._successes = 0
+        self._concurrency = max(self.min_concurrency, self._concurrency // 2)
+        pause = retry_after_s if retry_after_s is not None else 1.0
+        self._paused_until = max(self._paused_until, time.monotonic() + pause)
+        # the service is out of quota, so our buckets are too optimistic
+        self._request_bucket.tokens = min(self._request_bucket.tokens, 0.0)
+        self._token_bucket.tokens = min(self._token_bucket.tokens, 0.0)
+        logger.warning(f"[{self.name}] throttled (429), pausing {pause:.1f}s, "
+                       f"concurrency limit now {self._concurrency}")
+
+    def _dispatch(self) -> None:
+        """Grant waiting requests round-robin across sessions while there is capacity."""
+        now = time.monotonic()
+        self._request_bucket.refill(now)
+        self._token_bucket.refill(now)
+        while self._queues and self._in_flight < self._concurrency:
+            if now < self._paused_until:
+                self._schedule_dispatch(self._paused_until - now)
+                return
+            session_id, queue = next(iter(self._queues.items()))
+            waiter = queue[0]
+            delay = max(self._request_bucket.wait_time(1), self._token_bucket.wait_time(waiter.cost))
+            if delay > 0:
+                self._schedule_dispatch(delay)
+                return
+            queue.popleft()
+            # move the session to the back so the other sessions get their turn
+            self._queues.move_to_end(session_id)
+            if not queue:
+                del self._queues[session_id]
+            self._request_bucket.tokens -= 1
+            self._token_bucket.tokens -= min(waiter.cost, self._token_bucket.capacity)
+            self._in_flight += 1
+            if waiter.loop is None:
+                waiter.grant.set()
+            else:
+                waiter.loop.call_soon_threadsafe(_resolve_future, waiter.future)
+
+    def _schedule_dispatch(self, delay: float) -> None:
+        deadline = time.monotonic() + delay
+        if self._timer is not None and self._timer.is_alive():
+            if self._timer_deadline <= deadline:
+                return
+            # e.g. a cheaper request is at the front now: don't let it wait for the later deadline
+            self._timer.cancel()
+        self._timer = threading.Timer(delay, self._dispatch_locked)
+        self._timer.daemon = True
+        self._timer_deadline = deadline
+        self._timer.start()
+
+    def _dispatch_locked(self) -> None:
+        with self._lock:
+            # a timer cancelled while it waited for the lock must not drop the timer that replaced it
+            if threading.current_thread() is self._timer:
+                self._timer = None
+            self._dispatch()
+
+
+def _resolve_future(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+def estimate_request_tokens(request: httpx.Request) -> int:
+    """Estimate the tokens a request consumes from its body size plus the expected completion."""
+    try:
+        body_size = len(request.content)
+    except httpx.RequestNotRead:
+        body_size = 0
+    completion = DEFAULT_COMPLETION_TOKENS if request.url.path.endswith("/chat/completions") else 0
+    return body_size // BYTES_PER_TOKEN + completion
+
+
+def retry_after_seconds(headers: Optional[Mapping[str, str]]) -> Optional[float]:
+    """
+    Delay the service asked for in the (case-insensitive) headers of a throttled or failed response, if any.
+    Used for the httpx responses of Azure OpenAI and for the azure-core responses of Azure AI Search.
+    """
+    headers = headers or {}
+    for header, scale in (("retry-after-ms", 0.001), ("x-ms-retry-after-ms", 0.001), ("retry-after", 1.0)):
+        value = headers.get(header)
+        if value is not None:
+            try:
+                return float(value) * scale
+            except ValueError:
+                pass
+    return None
+
+
+class RateLimitedTransport(httpx.BaseTransport):
+    """Sync httpx transport that sends every request through an AdaptiveRateLimiter."""
+
+    def __init__(self, limiter: AdaptiveRateLimiter, transport: Optional[httpx.BaseTransport] = None):
+        self.limiter = limiter
+        self.transport = transport or httpx.HTTPTransport()
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        self.limiter.acquire(estimate_request_tokens(request))
+        status_code, retry_after = None, None
+        try:
+            response = self.transport.handle_request(request)
+            status_code, retry_after = response.status_code, retry_after_seconds(response.headers)
+            return response
+        finally:
+            self.limiter.release(status_code, retry_after)
+
+    def close(self) -> None:
+        self.transport.close()
+
+
+class AsyncRateLimitedTransport(httpx.AsyncBaseTransport):
+    """Async httpx transport that sends every request through an AdaptiveRateLimiter."""
+
+    def __init__(self, limiter: AdaptiveRateLimiter, transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.limiter = limiter
+        self.transport = transport or httpx.AsyncHTTPTransport()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        await self.limiter.acquire_async(estimate_request_tokens(request))
+        status_code, retry_after = None, None
+        try:
+            response = await self.transport.handle_async_request(request)
+            status_code, retry_after = response.status_code, retry_after_seconds(response.headers)
+            return response
+        finally:
+            self.limiter.release(status_code, retry_after)
+
+    async def aclose(self) -> None:
+        await self.transport.aclose()
+
+
+_limiters: Dict[str, AdaptiveRateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(name: str, requests_per_minute: int, tokens_per_minute: int,
+                     max_concurrency: int) -> AdaptiveRateLimiter:
+    """Return the process-wide limiter for `name` (one per deployment), creating it on first use."""
+    with _limiters_lock:
+        if name not in _limiters:
+            _limiters[name] = AdaptiveRateLimiter(name, requests_per_minute, tokens_per_minute, max_concurrency)
+        return _limiters[name]
+
+
+def log_rate_limiter_stats() -> None:
+    for limiter in list(_limiters.values()):
+        stats = limiter.stats()
+        logger.info(f"[{limiter.name}] {stats.requests} requests, mean wait {stats.mean_wait_ms:.0f}ms, "
+                    f"max wait {1000 * stats.max_wait_s:.0f}ms, {stats.throttle_events} throttle events, "
+                    f"concurrency limit {stats.concurrency_limit}, {stats.queued} queued")
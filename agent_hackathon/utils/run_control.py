@@ -0,0 +1,223 @@
+# run_control.py
+"""
+Per-session serialization and a per-worker cap on concurrent agent runs for the frontend.
+
+Without it, a message sent while `Runner.run` still works on the previous one starts a second run on the
+same session: both burn model tokens and race to save the conversation. RunController makes the runs of
+a session wait for each other, and with CANCEL_SUPERSEDED_RUNS a new message cancels the run in flight
+(and drops older messages still waiting, also while they wait for a run slot), so only the latest run
+answers. Messages of cancelled or dropped runs are not lost: the next run of the session gets them
+together with its own (`RunHandle.messages`). Cancelling the run task aborts its pending model requests;
+a tool call already running in a worker thread finishes in the background, its result is discarded.
+Once a run calls `RunHandle.finish` (its answer is ready and about to be shown and saved) it is no
+longer cancelled, so a save never races the next run's load.
+
+All sessions of a worker share MAX_CONCURRENT_RUNS run slots; runs beyond that wait in a queue. Queue
+depth, queue wait, cancelled runs and the tokens they had already used ("wasted" tokens) are recorded,
+see `run_control_stats` and `log_run_control_stats`.
+"""
+
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple, TypeVar
+
+from agents import Agent, RunContextWrapper, RunHooks
+from loguru import logger
+
+from agent_hackathon.utils.config import settings
+from agent_hackathon.utils.stats import StatsRecorder
+
+T = TypeVar("T")
+
+
+class RunCancelled(Exception):
+    """The run was cancelled or dropped because a newer message of the same session superseded it."""
+
+
+@dataclass
+class RunControlStats:
+    runs_started: int = 0
+    runs_completed: int = 0
+    runs_superseded: int = 0
+    wasted_tokens: int = 0
+    active_runs: int = 0
+    queue_depth: int = 0
+    max_queue_depth: int = 0
+    total_queue_wait_s: float = 0.0
+
+    @property
+    def mean_queue_wait_ms(self) -> float:
+        return 1000 * self.total_queue_wait_s / self.runs_started if self.runs_started else 0.0
+
+
+class RunHandle(RunHooks):
+    """
+    Passed to the run: the messages it answers, and the hooks for `Runner.run`, which keep a reference to
+    the run context, whose usage holds the tokens used so far.
+    """
+
+    def __init__(self, messages: List[Any]):
+        # the messages of superseded runs of the session that were not answered, then this run's message
+        self.messages = messages
+        self.context: Optional[RunContextWrapper] = None
+        self.finishing = False
+
+    async def on_agent_start(self, context: RunContextWrapper, agent: Agent) -> None:
+        self.context = context
+
+    def finish(self) -> None:
+        """The answer is ready: from now on a newer message waits for this run instead of cancelling it."""
+        self.finishing = True
+
+    @property
+    def total_tokens(self) -> int:
+        return self.context.usage.total_tokens if self.context is not None else 0
+
+
+@dataclass
+class _SessionState:
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+    # number of the latest message, the messages not answered yet, and the run working on the session
+    latest: int = 0
+    pending: List[Tuple[int, Any]] = field(default_factory=list)
+    run_task: Optional[asyncio.Task] = None
+    run: Optional[RunHandle] = None
+    users: int = 0
+
+
+class RunController:
+    def __init__(self, max_concurrent_runs: int, cancel_superseded: bool):
+        """
+        Args:
+            max_concurrent_runs: runs of this worker executing at the same time, further runs are queued
+            cancel_superseded: cancel a session's run in flight when a new message of the session arrives
+        """
+        self.cancel_superseded = cancel_superseded
+        self._slots = asyncio.Semaphore(max_concurrent_runs)
+        self._sessions: Dict[str, _SessionState] = {}
+        self._stats: StatsRecorder[RunControlStats] = StatsRecorder(RunControlStats)
+
+    async def run(self, session_id: str, message: Any, respond: Callable[[RunHandle], Awaitable[T]]) -> T:
+        """
+        Run `respond` (which runs the agents with the given handle as hooks and answers `handle.messages`)
+        once the session's previous runs are done and a run slot is free.
+
+        Raises:
+            RunCancelled: if a newer message of the session superseded this one
+        """
+        state = self._sessions.setdefault(session_id, _SessionState())
+        state.users += 1
+        state.latest += 1
+        number = state.latest
+        state.pending.append((number, message))
+        try:
+            if (self.cancel_superseded and state.run_task is not None and not state.run_task.done()
+                    and not state.run.finishing):
+                logger.info(f"Cancelling the run of session {session_id}, superseded by a new message")
+                state.run_task.cancel()
+
+            async with state.lock:
+                self._check_superseded(session_id, state, number)
+                async with self._run_slot():
+                    # a newer message may have arrived while this one waited for a slot
+                    self._check_superseded(session_id, state, number)
+                    return await self._run(session_id, state, number, respond)
+        finally:
+            state.users -= 1
+            if state.users == 0:
+                del self._sessions[session_id]
+
+    def _check_superseded(self, session_id: str, state: _SessionState, number: int) -> None:
+        if self.cancel_superseded and number < state.latest:
+            # the message stays pending and is answered by the newer run
+            self._count("runs_superseded")
+            raise RunCancelled(f"Message superseded before its run started (session {session_id})")
+
+    async def _run(self, session_id: str, state: _SessionState, number: int,
+                   respond: Callable[[RunHandle], Awaitable[T]]) -> T:
+        self._count("runs_started")
+        run = RunHandle([message for n, message in state.pending if n <= number])
+        state.run = run
+        state.run_task = asyncio.create_task(respond(run))
+        try:
+            result = await asyncio.shield(state.run_task)
+        except asyncio.CancelledError:
+            if not state.run_task.cancelled():
+                # this handler itself was cancelled (e.g. the chat ended): take the run down with it, unless
+                # it is already showing and saving its answer, then let that complete first
+                if run.finishing:
+                    await asyncio.wait([state.run_task])
+                else:
+                    state.run_task.cancel()
+                raise
+            with self._stats.update() as stats:
+                stats.runs_superseded += 1
+                stats.wasted_tokens += run.total_tokens
+            logger.info(f"Run of session {session_id} cancelled after {run.total_tokens} tokens")
+            raise RunCancelled(f"Run superseded by a newer message (session {session_id})")
+        except BaseException:
+            # failed runs report their error, their messages are not retried
+            self._answered(state, number)
+            raise
+        finally:
+            state.run_task = state.run = None
+        self._answered(state, number)
+        self._count("runs_completed")
+        return result
+
+    @staticmethod
+    def _answered(state: _SessionState, number: int) -> None:
+        state.pending = [(n, message) for n, message in state.pending if n > number]
+
+    @asynccontextmanager
+    async def _run_slot(self) -> AsyncIterator[None]:
+        queued_at = time.perf_counter()
+        with self._stats.update() as stats:
+            stats.queue_depth += 1
+            stats.max_queue_depth = max(stats.max_queue_depth, stats.queue_depth)
+        try:
+            await self._slots.acquire()
+        finally:
+            with self._stats.update() as stats:
+                stats.queue_depth -= 1
+        with self._stats.update() as stats:
+            stats.active_runs += 1
+            stats.total_queue_wait_s += time.perf_counter() - queued_at
+        try:
+            yield
+        finally:
+            self._slots.release()
+            with self._stats.update() as stats:
+                stats.active_runs -= 1
+
+    def _count(self, stat: str) -> None:
+        with self._stats.update() as stats:
+            setattr(stats, stat, getattr(stats, stat) + 1)
+
+    def stats(self) -> RunControlStats:
+        return self._stats.get()
+
+
+_controller: Optional[RunController] = None
+
+
+def get_run_controller() -> RunController:
+    """The run controller of this worker, configured by MAX_CONCURRENT_RUNS and CANCEL_SUPERSEDED_RUNS."""
+    global _controller
+    if _controller is None:
+        _controller = RunController(settings.max_concurrent_runs, settings.cancel_superseded_runs)
+    return _controller
+
+
+def run_control_stats() -> RunControlStats:
+    return get_run_controller().stats()
+
+
+def log_run_control_stats() -> None:
+    stats = run_control_stats()
+    logger.info(f"[runs] {stats.runs_started} started, {stats.runs_completed} completed, "
+                f"{stats.runs_superseded} superseded ({stats.wasted_tokens} tokens wasted), "
+                f"{stats.active_runs} active, {stats.queue_depth} queued (max {stats.max_queue_depth}), "
+                f"mean queue wait {stats.mean_queue_wait_ms:.0f}ms")
@@ -0,0 +1,345 @@
+# session_store.py
+"""
+Pluggable store for the conversation state of the frontend sessions.
+
+A session consists of the conversation input list (`result.to_input_list()`) and the name of the agent
+that answered last. Keeping it in Chainlit's in-process `user_session` pins a user to one worker, grows
+without bound and is lost on restart; SQLiteSessionStore keeps it in a SQLite file that several worker
+processes can share instead.
+
+- Items are stored one row each, as zlib-compressed compact JSON. A save only rewrites the items after
+  the part of the history that did not change, usually just the new turn. (A handoff filter may condense
+  the history, then everything after the first changed item is rewritten.)
+- `load` reads only the session's metadata; the items are read when `StoredSession.items` is first used.
+  `save` returns the saved session with its items; passed back to `load` as `cached`, it is reused as long
+  as nobody saved the session since, so a chat reads its history from the store only on its first run.
+- Sessions idle for longer than the TTL are deleted, checked at most once per `EVICTION_INTERVAL_S`.
+
+`get_session_store` returns the store configured with the SESSION_STORE_* settings ("memory" keeps the
+sessions in this process, like before). Load/save latency and the stored size per session are recorded,
+see `log_session_store_stats`.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from loguru import logger
+
+from agent_hackathon.utils.config import settings
+from agent_hackathon.utils.stats import StatsRecorder
+
+EVICTION_INTERVAL_S = 60.0
+
+
+@dataclass
+class StoredSession:
+    session_id: str
+    agent_name: Optional[str]
+    item_count: int
+    updated_at: float
+    _load_items: Callable[[], List[Dict[str, Any]]] = field(repr=False, default=list)
+    _items: Optional[List[Dict[str, Any]]] = field(repr=False, default=None)
+
+    @property
+    def items(self) -> List[Dict[str, Any]]:
+        """The conversation input list, loaded on first access."""
+        if self._items is None:
+            self._items = self._load_items()
+        return self._items
+
+
+@dataclass
+class SessionStoreStats:
+    loads: int = 0
+    saves: int = 0
+    load_s: float = 0.0
+    save_s: float = 0.0
+    items_written: int = 0
+    evicted: int = 0
+    # session id -> stored size in bytes (compressed for SQLite) of the sessions saved and not deleted since
+    session_bytes: Dict[str, int] = field(default_factory=dict)
+
+
+def common_prefix_length(old: List[Dict[str, Any]], new: List[Dict[str, Any]]) -> int:
+    """Number of leading items new shares with old, i.e. the items a save does not have to rewrite."""
+    length = 0
+    for old_item, new_item in zip(old, new):
+        if old_item != new_item:
+            break
+        length += 1
+    return length
+
+
+class SessionStore(ABC):
+    # whether sessions outlive the process (and should be kept when a chat ends)
+    persistent = False
+
+    def __init__(self, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self._stats: StatsRecorder[SessionStoreStats] = StatsRecorder(SessionStoreStats)
+        # session id -> time of its last save by this process, to prune session_bytes (guarded by the stats lock)
+        self._saved_at: Dict[str, float] = {}
+        self._last_eviction = 0.0
+
+    @abstractmethod
+    def _load(self, session_id: str) -> Optional[StoredSession]:
+        ...
+
+    @abstractmethod
+    def _save(self, session_id: str, items: List[Dict[str, Any]], agent_name: str, unchanged: int,
+              updated_at: float) -> int:
+        """Store the items after the first `unchanged` ones, returns the stored size of the session in bytes."""
+
+    @abstractmethod
+    def _delete(self, session_id: str) -> None:
+        ...
+
+    @abstractmethod
+    def _evict(self, idle_before: float) -> List[str]:
+        """Delete sessions not updated since idle_before, returns their ids."""
+
+    def load(self, session_id: str, cached: Optional[StoredSession] = None) -> Optional[StoredSession]:
+        """
+        The session's metadata (items are loaded lazily), None for an unknown or expired session.
+
+        Args:
+            session_id: id of the session
+            cached: the session as returned by the last `save` of this caller, returned instead of the
+                stored one (with its items already loaded) if the session was not saved since
+        """
+        start = time.perf_counter()
+        session = self._load(session_id)
+        if session is not None and session.updated_at < time.time() - self.ttl_seconds:
+            session = None
+        if (session is not None and cached is not None and cached.session_id == session_id
+                and cached.updated_at == session.updated_at):
+            session = cached
+        with self._stats.update() as stats:
+            stats.loads += 1
+            stats.load_s += time.perf_counter() - start
+        return session
+
+    def save(self, session_id: str, items: List[Dict[str, Any]], agent_name: str,
+             previous: Optional[StoredSession] = None) -> StoredSession:
+        """
+        Store the conversation input list and the active agent of a session, returns the saved session.
+
+        Args:
+            session_id: id of the session
+            items: the full conversation input list
+            agent_name: name of the agent that continues the conversation
+            previous: the session as loaded before the run; its items that did not change are not rewritten
+        """
+        unchanged = common_prefix_length(previous.items, items) if previous is not None else 0
+        start = time.perf_counter()
+        updated_at = time.time()
+        size = self._save(session_id, items, agent_name, unchanged, updated_at)
+        with self._stats.update() as stats:
+            stats.saves += 1
+            stats.save_s += time.perf_counter() - start
+            stats.items_written += len(items) - unchanged
+            stats.session_bytes[session_id] = size
+            self._saved_at[session_id] = updated_at
+        self._maybe_evict()
+        return StoredSession(session_id=session_id, agent_name=agent_name, item_count=len(items),
+                             updated_at=updated_at, _items=list(items))
+
+    def delete(self, session_id: str) -> None:
+        self._delete(session_id)
+        with self._stats.update() as stats:
+            self._forget(stats, session_id)
+
+    def _forget(self, stats: SessionStoreStats, session_id: str) -> None:
+        """Drop the stats of a deleted session. Called with the stats lock held."""
+        stats.session_bytes.pop(session_id, None)
+        self._saved_at.pop(session_id, None)
+
+    def _maybe_evict(self) -> None:
+        now = time.time()
+        if now - self._last_eviction < EVICTION_INTERVAL_S:
+            return
+        self._last_eviction = now
+        evicted = self._evict(now - self.ttl_seconds)
+        with self._stats.update() as stats:
+            stats.evicted += len(evicted)
+            # sessions another process evicted (or saved since) are not returned here, but expire all the same
+            expired = [sid for sid, saved_at in self._saved_at.items() if saved_at < now - self.ttl_seconds]
+            for session_id in [*evicted, *expired]:
+                self._forget(stats, session_id)
+        if evicted:
+            logger.info(f"[session store] evicted {len(evicted)} sessions idle for more than {self.ttl_seconds:.0f}s")
+
+    def stats(self) -> SessionStoreStats:
+        return self._stats.get()
+
+
+class InMemorySessionStore(SessionStore):
+    """Sessions kept in this process only, as plain lists."""
+
+    def __init__(self, ttl_seconds: float):
+        super().__init__(ttl_seconds)
+        self._sessions: Dict[str, StoredSession] = {}
+        self._lock = threading.Lock()
+
+    def _load(self, session_id: str) -> Optional[StoredSession]:
+        with self._lock:
+            return self._sessions.get(session_id)
+
+    def _save(self, session_id: str, items: List[Dict[str, Any]], agent_name: str, unchanged: int,
+              updated_at: float) -> int:
+        with self._lock:
+            self._sessions[session_id] = StoredSession(session_id=session_id, agent_name=agent_name,
+                                                       item_count=len(items), updated_at=updated_at,
+                                                       _items=list(items))
+        return len(json.dumps(items, default=str))
+
+    def _delete(self, session_id: str) -> None:
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def _evict(self, idle_before: float) -> List[str]:
+        with self._lock:
+            expired = [sid for sid, session in self._sessions.items() if session.updated_at < idle_before]
+            for session_id in expired:
+                del self._sessions[session_id]
+        return expired
+
+
+class SQLiteSessionStore(SessionStore):
+    """Sessions in a SQLite file (WAL mode), shareable by several worker processes on one host."""
+
+    persistent = True
+
+    def __init__(self, path: str, ttl_seconds: float, compression_level: int = 6):
+        super().__init__(ttl_seconds)
+        self.path = path
+        self.compression_level = compression_level
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False, timeout=10.0, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.executescript("""
+            CREATE TABLE IF NOT EXISTS sessions (
+                session_id TEXT PRIMARY KEY,
+                agent_name TEXT,
+                item_count INTEGER NOT NULL,
+                size_bytes INTEGER NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS sessions_updated_at ON sessions (updated_at);
+            CREATE TABLE IF NOT EXISTS session_items (
+                session_id TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                data BLOB NOT NULL,
+                PRIMARY KEY (session_id, seq)
+            ) WITHOUT ROWID;
+        """)
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """A write transaction, rolled back if anything in it fails."""
+        with self._lock:
+            connection = self._connection
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                yield connection
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+
+    def _encode(self, item: Dict[str, Any]) -> bytes:
+        return zlib.compress(json.dumps(item, separators=(",", ":"), default=str).encode("utf-8"),
+                             self.compression_level)
+
+    @staticmethod
+    def _decode(data: bytes) -> Dict[str, Any]:
+        return json.loads(zlib.decompress(data))
+
+    def _load(self, session_id: str) -> Optional[StoredSession]:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT agent_name, item_count, updated_at FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return StoredSession(session_id=session_id, agent_name=row[0], item_count=row[1], updated_at=row[2],
+                             _load_items=lambda: self.load_items(session_id))
+
+    def load_items(self, session_id: str, start: int = 0) -> List[Dict[str, Any]]:
+        """The session's items from position `start` on."""
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT data FROM session_items WHERE session_id = ? AND seq >= ? ORDER BY seq", (session_id, start)
+            ).fetchall()
+        return [self._decode(data) for (data,) in rows]
+
+    def _save(self, session_id: str, items: List[Dict[str, Any]], agent_name: str, unchanged: int,
+              updated_at: float) -> int:
+        new_rows = [(session_id, seq, self._encode(item)) for seq, item in enumerate(items) if seq >= unchanged]
+        with self._transaction() as connection:
+            connection.execute("DELETE FROM session_items WHERE session_id = ? AND seq >= ?", (session_id, unchanged))
+            connection.executemany("INSERT INTO session_items (session_id, seq, data) VALUES (?, ?, ?)", new_rows)
+            (size,) = connection.execute(
+                "SELECT COALESCE(SUM(LENGTH(data)), 0) FROM session_items WHERE session_id = ?", (session_id,)
+            ).fetchone()
+            connection.execute(
+                "INSERT INTO sessions (session_id, agent_name, item_count, size_bytes, updated_at) "
+                "VALUES (?, ?, ?, ?, ?) ON CONFLICT (session_id) DO UPDATE SET agent_name = excluded.agent_name, "
+                "item_count = excluded.item_count, size_bytes = excluded.size_bytes, "
+                "updated_at = excluded.updated_at",
+                (session_id, agent_name, len(items), size, updated_at),
+            )
+        return size
+
+    def _delete(self, session_id: str) -> None:
+        with self._transaction() as connection:
+            connection.execute("DELETE FROM session_items WHERE session_id = ?", (session_id,))
+            connection.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+    def _evict(self, idle_before: float) -> List[str]:
+        with self._transaction() as connection:
+            expired = [session_id for (session_id,) in connection.execute(
+                "SELECT session_id FROM sessions WHERE updated_at < ?", (idle_before,)
+            )]
+            connection.execute(
+                "DELETE FROM session_items WHERE session_id IN "
+                "(SELECT session_id FROM sessions WHERE updated_at < ?)", (idle_before,)
+            )
+            connection.execute("DELETE FROM sessions WHERE updated_at < ?", (idle_before,))
+        return expired
+
+
+_store: Optional[SessionStore] = None
+_store_lock = threading.Lock()
+
+
+def get_session_store() -> SessionStore:
+    """The process-wide session store configured by SESSION_STORE_BACKEND."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            if settings.session_store_backend == "sqlite":
+                _store = SQLiteSessionStore(settings.session_store_path, settings.session_ttl_seconds)
+            else:
+                _store = InMemorySessionStore(settings.session_ttl_seconds)
+        return _store
+
+
+def log_session_store_stats() -> None:
+    if _store is None:
+        return
+    stats = _store.stats()
+    sizes = list(stats.session_bytes.values())
+    logger.info(f"[session store] {stats.loads} loads (mean {1000 * stats.load_s / max(stats.loads, 1):.1f}ms), "
+                f"{stats.saves} saves (mean {1000 * stats.save_s / max(stats.saves, 1):.1f}ms, "
+                f"{stats.items_written} items written), {len(sizes)} sessions saved, "
+                f"mean {sum(sizes) / max(len(sizes), 1):.0f} / max {max(sizes, default=0)} bytes per session, "
+                f"{stats.evicted} evicted")
@@ -1,4 +1,5 @@
 # settings.py
+from typing import List, Literal, Optional
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from pydantic import AnyHttpUrl, field_validator
 
@@ -24,6 +25,79 @@ class ENVSettings(BaseSettings):
     azure_search_endpoint: AnyHttpUrl
     search_option: str
 
+    # product search tuning
+    search_top_k: int = 5
+    search_hybrid: bool = True
+    search_semantic_rerank: bool = False
+
+    # vector index tuning, changing the profile or the hnsw build parameters requires recreating the index
+    vector_search_profile: str = "hnswProfile"  # "hnswProfile" or "exhaustiveKnnProfile"
+    hnsw_m: int = 4
+    hnsw_ef_construction: int = 400
+    hnsw_ef_search: int = 500
+    vector_search_exhaustive: bool = False
+
+    # write-behind queue for partial updates
+    write_batch_size: int = 100
+    write_flush_interval_seconds: float = 0.5
+    write_max_retries: int = 3
+    # first retry delay, doubled per attempt; a Retry-After of the service takes precedence
+    write_retry_backoff_seconds: float = 0.5
+    write_ack_timeout_seconds: float = 30.0
+
+    # process-wide rate limits per Azure OpenAI deployment, 0 disables the requests/tokens bucket
+    rate_limit_enabled: bool = True
+    chat_requests_per_minute: int = 0
+    chat_tokens_per_minute: int = 0
+    chat_max_concurrency: int = 16
+    embedding_requests_per_minute: int = 0
+    embedding_tokens_per_minute: int = 0
+    embedding_max_concurrency: int = 8
+
+    # per-agent deployments, empty means azure_openai_gpt_deployment
+    coordinator_deployment: Optional[str] = None
+    account_billing_deployment: Optional[str] = None
+    product_support_deployment: Optional[str] = None
+    order_management_deployment: Optional[str] = None
+    # repeat failed turns of an agent's deployment with the escalation deployment (default: azure_openai_gpt_deployment)
+    model_escalation_enabled: bool = False
+    escalation_deployment: Optional[str] = None
+
+    # condense the conversation passed on at handoffs
+    handoff_input_filter_enabled: bool = True
+    handoff_max_user_turns: int = 4
+
+    # background prefetch of a customer's orders and products once the customer is identified
+    prefetch_enabled: bool = False
+    prefetch_max_concurrency: int = 4
+    prefetch_max_products: int = 20
+
+    # request only the fields an accessor needs from the search indexes
+    query_projections_enabled: bool = True
+
+    # local, memory-mapped copy of the product embeddings (see utils/embedding_store.py)
+    embedding_store_path: str = "data/embeddings"
+    embedding_store_quantizations: List[Literal["int8", "binary"]] = ["int8", "binary"]
+
+    # connection pools shared by all Azure clients of a process, and warm-up of their connections
+    http_max_connections: int = 100
+    http_max_keepalive_connections: int = 20
+    http_keepalive_expiry_seconds: float = 60.0
+    http_warm_up_enabled: bool = False
+    http_warm_up_connections: int = 2
+
+    # where the frontend keeps the conversation of each session ("memory" or "sqlite")
+    session_store_backend: Literal["memory", "sqlite"] = "memory"
+    session_store_path: str = "sessions.sqlite3"
+    session_ttl_seconds: float = 86400.0
+
+    # agent runs per worker process (further runs are queued), cancel a session's run when a new message arrives
+    max_concurrent_runs: int = 8
+    cancel_superseded_runs: bool = False
+
+    # how often the frontend logs the process-wide stats of all subsystems (and once at shutdown), 0 disables
+    stats_log_interval_seconds: float = 300.0
+
     model_config = SettingsConfigDict(
         env_file=('.env.shared', '.env'),
         env_file_encoding="utf-8",
@@ -0,0 +1,57 @@
+# stats.py
+"""
+Thread-safe recording of the stats dataclasses the subsystems keep (query stats, model tiers, handoffs, ...).
+
+A StatsRecorder holds one stats dataclass per key (e.g. per accessor or agent, or a single one under the
+key None), creates it on first use, and updates and copies it under one lock:
+
+    _stats = StatsRecorder(QueryStats)
+
+    with _stats.update("get_order_status") as stats:
+        stats.queries += 1
+
+    for accessor, stats in sorted(_stats.snapshot().items()):
+        logger.info(...)
+"""
+
+import copy
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Generic, Hashable, Iterator, Optional, TypeVar
+
+S = TypeVar("S")
+
+
+class StatsRecorder(Generic[S]):
+    def __init__(self, factory: Callable[[], S]):
+        """
+        Args:
+            factory: creates the stats of a new key, usually the stats dataclass itself
+        """
+        self._factory = factory
+        self._stats: Dict[Any, S] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def update(self, key: Optional[Hashable] = None) -> Iterator[S]:
+        """The stats of `key` (created if needed), to be changed in the `with` block while the lock is held."""
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = self._factory()
+            yield stats
+
+    def get(self, key: Optional[Hashable] = None) -> S:
+        """Copy of the stats of `key`, fresh stats if nothing was recorded for it."""
+        with self._lock:
+            stats = self._stats.get(key)
+            return copy.deepcopy(stats) if stats is not None else self._factory()
+
+    def snapshot(self) -> Dict[Any, S]:
+        """Copies of the stats of all keys."""
+        with self._lock:
+            return copy.deepcopy(self._stats)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._stats.clear()
@@ -0,0 +1,143 @@
+# tool_memoization.py
+"""
+Run-scoped memoization of read-only function tools.
+
+Within one `Runner.run` the agents often repeat identical lookups, e.g. the coordinator and the specialist
+both calling `get_order_status` for the same order. Tools wrapped with `memoized` return the cached result
+for a call with identical arguments in the same run. Tools wrapped with `mutating` clear the cache after
+they ran, so no read after a write is served from before the write.
+
+The cache lives in the run context, which therefore has to be a dict (the frontends pass `context={}`);
+with any other context the tools are simply not memoized. A new run starts with an empty cache. Other
+run-scoped caches (e.g. the prefetcher) register an `on_invalidate` hook to be cleared by mutating tools too.
+
+Only answers are cached. A tool whose lookup failed (e.g. the search service timed out) returns a
+ToolFailure instead of its "not found" value; it is shown to the model like any other result, but not
+cached, so the next identical call runs the lookup again.
+"""
+
+import asyncio
+import json
+from dataclasses import dataclass, field, replace
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from agents import FunctionTool, RunContextWrapper
+from loguru import logger
+
+from agent_hackathon.utils.stats import StatsRecorder
+
+CONTEXT_KEY = "tool_cache"
+
+
+class ToolFailure(str):
+    """Result of a tool call that failed for a transient reason; the text tells the model to try again."""
+
+
+@dataclass
+class ToolCacheStats:
+    hits: int = 0
+    misses: int = 0
+    invalidations: int = 0
+    failures: int = 0
+
+
+@dataclass
+class RunToolCache:
+    entries: Dict[Tuple[str, str], asyncio.Future] = field(default_factory=dict)
+    stats: ToolCacheStats = field(default_factory=ToolCacheStats)
+
+
+# totals of all runs of this process
+_totals: StatsRecorder[ToolCacheStats] = StatsRecorder(ToolCacheStats)
+_invalidation_hooks: List[Callable[[RunContextWrapper[Any]], None]] = []
+
+
+def on_invalidate(hook: Callable[[RunContextWrapper[Any]], None]) -> Callable[[RunContextWrapper[Any]], None]:
+    """Register a function that is called with the run context whenever a mutating tool ran."""
+    _invalidation_hooks.append(hook)
+    return hook
+
+
+def _run_cache(ctx: RunContextWrapper[Any]) -> Optional[RunToolCache]:
+    context = getattr(ctx, "context", None)
+    if not isinstance(context, dict):
+        return None
+    return context.setdefault(CONTEXT_KEY, RunToolCache())
+
+
+def _count(cache: RunToolCache, stat: str) -> None:
+    setattr(cache.stats, stat, getattr(cache.stats, stat) + 1)
+    with _totals.update() as totals:
+        setattr(totals, stat, getattr(totals, stat) + 1)
+
+
+def memoized(tool: FunctionTool) -> FunctionTool:
+    """Cache the results of a read-only tool per run and argument values."""
+    invoke = tool.on_invoke_tool
+
+    async def on_invoke_tool(ctx: RunContextWrapper[Any], input: str) -> Any:
+        cache = _run_cache(ctx)
+        try:
+            key = (tool.name, json.dumps(json.loads(input or "{}"), sort_keys=True))
+        except json.JSONDecodeError:
+            cache = None
+        if cache is None:
+            return await invoke(ctx, input)
+
+        cached = cache.entries.get(key)
+        if cached is not None:
+            _count(cache, "hits")
+            logger.info(f"Tool cache hit: {tool.name}({key[1]})")
+            # concurrent identical calls wait for the first one instead of running again
+            return await asyncio.shield(cached)
+
+        _count(cache, "misses")
+        future = asyncio.get_running_loop().create_future()
+        cache.entries[key] = future
+        try:
+            result = await invoke(ctx, input)
+        except BaseException as e:
+            # failures are not cached
+            cache.entries.pop(key, None)
+            future.set_exception(e)
+            future.exception()  # mark as retrieved if nobody else is waiting
+            raise
+        if isinstance(result, ToolFailure):
+            # concurrent identical calls get the failure as well, the next call runs again
+            cache.entries.pop(key, None)
+            _count(cache, "failures")
+        future.set_result(result)
+        return result
+
+    return replace(tool, on_invoke_tool=on_invoke_tool)
+
+
+def mutating(tool: FunctionTool) -> FunctionTool:
+    """Clear the run's tool cache after the tool ran, as it may have changed what cached reads returned."""
+    invoke = tool.on_invoke_tool
+
+    async def on_invoke_tool(ctx: RunContextWrapper[Any], input: str) -> Any:
+        try:
+            return await invoke(ctx, input)
+        finally:
+            cache = _run_cache(ctx)
+            if cache is not None and cache.entries:
+                cache.entries.clear()
+                _count(cache, "invalidations")
+            for hook in _invalidation_hooks:
+                hook(ctx)
+
+    return replace(tool, on_invoke_tool=on_invoke_tool)
+
+
+def tool_cache_stats(context: Any = None) -> ToolCacheStats:
+    """Stats of one run (pass its context) or the totals of this process."""
+    if isinstance(context, dict) and CONTEXT_KEY in context:
+        return context[CONTEXT_KEY].stats
+    return _totals.get()
+
+
+def log_tool_cache_stats() -> None:
+    stats = tool_cache_stats()
+    logger.info(f"[tool cache] {stats.hits} duplicate tool calls served from cache, {stats.misses} executed, "
+                f"{stats.invalidations} invalidations by mutating tools, {stats.failures} failed calls not cached")
@@ -1,13 +1,15 @@
+import argparse
 import json
 import os
-from typing import List
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional
 
 from azure.core.credentials import AzureKeyCredential
 from azure.search.documents import SearchClient
 from azure.search.documents.indexes import SearchIndexClient
 from azure.search.documents.indexes._generated.models import SemanticConfiguration, VectorSearchProfile, SemanticField, \
     SemanticPrioritizedFields, SemanticSearch, ExhaustiveKnnAlgorithmConfiguration, VectorSearch, AzureOpenAIVectorizer, \
-    AzureOpenAIVectorizerParameters
+    AzureOpenAIVectorizerParameters, HnswAlgorithmConfiguration, HnswParameters
 from azure.search.documents.indexes.models import (
     ComplexField,
     CorsOptions,
@@ -20,6 +22,8 @@ from azure.search.documents.indexes.models import (
 from openai import AzureOpenAI
 
 from agent_hackathon.utils.embedder import Embedder
+from agent_hackathon.utils.embedding_store import EmbeddingStore, EmbeddingStoreWriter, content_hash
+from agent_hackathon.utils.generate_synthetic_data import iter_jsonl
 
 # --- Configuration ---
 from agent_hackathon.utils.config import settings
@@ -47,9 +51,19 @@ def create_index_if_not_exists(index_client: SearchIndexClient, index: SearchInd
 
 # --- Index Creation Functions ---
 
-def define_products_index() -> SearchIndex:
-    """Defines the 'products' Azure Search Index."""
-    products_index_name = "products"
+def define_products_index(index_name: str = "products",
+                          vector_search_profile: str = None,
+                          hnsw_m: int = None,
+                          hnsw_ef_construction: int = None,
+                          hnsw_ef_search: int = None) -> SearchIndex:
+    """
+    Defines the 'products' Azure Search Index.
+
+    Both an HNSW (approximate) and an exhaustive KNN profile are declared; the embedding field uses
+    vector_search_profile. Parameters that are not given are taken from the settings.
+    """
+    products_index_name = index_name
+    vector_search_profile = vector_search_profile or settings.vector_search_profile
     products_fields = [
         SimpleField(name="product_id", type=SearchFieldDataType.String, key=True, sortable=True, filterable=True,
                     facetable=True),
@@ -64,15 +78,24 @@ def define_products_index() -> SearchIndex:
             type=SearchFieldDataType.Collection(SearchFieldDataType.Single),
             searchable=True,
             vector_search_dimensions=1536,
-            vector_search_profile_name="exhaustiveKnnProfile",
+            vector_search_profile_name=vector_search_profile,
         ),
 
     ]
     vector_search = VectorSearch(
         algorithms=[
+            HnswAlgorithmConfiguration(
+                name="hnsw",
+                parameters=HnswParameters(
+                    m=hnsw_m or settings.hnsw_m,
+                    ef_construction=hnsw_ef_construction or settings.hnsw_ef_construction,
+                    ef_search=hnsw_ef_search or settings.hnsw_ef_search,
+                    metric="cosine",
+                ),
+            ),
             ExhaustiveKnnAlgorithmConfiguration(
                 name="exhaustiveKnn",
-            )
+            ),
         ],
         vectorizers=[
             AzureOpenAIVectorizer(
@@ -85,10 +108,14 @@ def define_products_index() -> SearchIndex:
             )
         ],
         profiles=[
+            VectorSearchProfile(
+                name="hnswProfile",
+                algorithm_configuration_name="hnsw",
+            ),
             VectorSearchProfile(
                 name="exhaustiveKnnProfile",
                 algorithm_configuration_name="exhaustiveKnn",
-            )
+            ),
         ],
     )
 
@@ -173,8 +200,66 @@ def define_orders_index() -> SearchIndex:
     )
 
 
+def load_dataset(data_path: str) -> Dict[str, Iterable[dict]]:
+    """
+    Documents per index, read from a database.json-style file (index name -> list of documents) or from
+    a directory with one <index name>.jsonl file per index (see generate_synthetic_data.py), which is
+    read lazily line by line.
+    """
+    path = Path(data_path)
+    if path.is_dir():
+        return {jsonl_path.stem: iter_jsonl(jsonl_path) for jsonl_path in sorted(path.glob("*.jsonl"))}
+    with open(path, "r", encoding='utf-8') as f:
+        return json.load(f)
+
+
+def batched(documents: Iterable[dict], batch_size: int) -> Iterator[List[dict]]:
+    batch = []
+    for document in documents:
+        batch.append(document)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def embed_products(embedder: Embedder, documents: List[dict], store: Optional[EmbeddingStore],
+                   store_writer: EmbeddingStoreWriter) -> int:
+    """
+    Add the description embedding to every product document.
+
+    Vectors already in the local embedding store (same text and model) are reused, the other texts are
+    embedded in one request. The vectors are streamed into the new version of the store written by
+    store_writer. Returns the number of reused vectors.
+    """
+    model = settings.azure_openai_embedding_model_name
+    hashes = [content_hash(document["description"], model) for document in documents]
+    embeddings = [store.vector_for_hash(hash_) if store is not None else None for hash_ in hashes]
+
+    missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+    if missing:
+        new_embeddings = embedder.embed_strings([documents[i]["description"] for i in missing])
+        for i, embedding in zip(missing, new_embeddings):
+            embeddings[i] = embedding
+
+    for document, hash_, embedding in zip(documents, hashes, embeddings):
+        document["embedding"] = embedding
+        # written to disk right away, so the vectors of large uploads are not kept in memory
+        store_writer.add(document["product_id"], hash_, embedding)
+    return len(documents) - len(missing)
+
+
 # --- Main Script Logic ---
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create the search indexes and upload the data.")
+    parser.add_argument("--data", default="database.json",
+                        help="database.json-style file or directory with <index>.jsonl files")
+    parser.add_argument("--batch-size", type=int, default=500, help="Documents per upload request")
+    parser.add_argument("--embedding-store", default=settings.embedding_store_path,
+                        help="Local embedding store to reuse product embeddings from and save them to")
+    args = parser.parse_args()
+
     if not search_admin_key:
         print("🚨 MAX_AZURE_SEARCH_ADMIN_KEY environment variable is not set.")
         exit(1)
@@ -196,16 +281,15 @@ if __name__ == "__main__":
 
     print("\n--- Index Creation/Verification Complete ---\n")
 
-    # Load data from JSON
+    # Load data from JSON / JSONL
     try:
-        with open("database.json", "r", encoding='utf-8') as f:
-            dataset = json.load(f)
-        print("📚 Dataset loaded successfully from database.json.")
+        dataset = load_dataset(args.data)
+        print(f"📚 Dataset loaded successfully from {args.data}.")
     except FileNotFoundError:
-        print("🚨 Error: database.json not found. Please ensure the file exists.")
+        print(f"🚨 Error: {args.data} not found. Please ensure the file exists.")
         dataset = {}  # Initialize to empty dict to avoid further errors
     except json.JSONDecodeError:
-        print("🚨 Error: Could not decode JSON from database.json. Please check its format.")
+        print(f"🚨 Error: Could not decode JSON from {args.data}. Please check its format.")
         dataset = {}
 
     # Upload documents to each index
@@ -215,37 +299,60 @@ if __name__ == "__main__":
             if index_name in created_indices:  # Check if the index exists before uploading
                 print(f"Index '{index_name}' already exists. Skipping upload.")
                 continue
-            if not documents:
-                print(f"No documents found for index '{index_name}' in database.json. Skipping upload.")
-                continue
 
             print(f"Uploading documents to '{index_name}' index...")
+            # set before anything can fail, the finally block below reads them
+            embedding_store = store_writer = None
             try:
                 search_client = SearchClient(
                     endpoint=service_endpoint,
                     index_name=index_name,
                     credential=AzureKeyCredential(search_admin_key)
                 )
+                reused_embeddings = 0
                 if index_name == "products":
-                    for document in documents:
-                        embedding = embedder.embed_string(document["description"])
-                        document["embedding"] = embedding
+                    if EmbeddingStore.exists(args.embedding_store):
+                        embedding_store = EmbeddingStore(args.embedding_store)
+                    # a new store version, swapped in at the end; the mapped one above is never rewritten
+                    store_writer = EmbeddingStoreWriter(
+                        args.embedding_store, settings.azure_openai_embedding_model_name,
+                        quantizations=settings.embedding_store_quantizations,
+                    )
 
-                # The upload_documents method returns a list of IndexingResult objects
-                results = search_client.upload_documents(documents=documents)
+                total_documents = successful_uploads = 0
+                for batch in batched(documents, args.batch_size):
+                    if store_writer is not None:
+                        reused_embeddings += embed_products(embedder, batch, embedding_store, store_writer)
 
-                successful_uploads = sum(1 for result in results if result.succeeded)
-                if successful_uploads == len(documents):
-                    print(f"Successfully uploaded {successful_uploads} documents to '{index_name}'. ✅")
-                else:
-                    print(
-                        f"Uploaded {successful_uploads}/{len(documents)} documents to '{index_name}'. Some uploads may have failed.")
+                    # The upload_documents method returns a list of IndexingResult objects
+                    results = search_client.upload_documents(documents=batch)
+
+                    total_documents += len(batch)
+                    successful_uploads += sum(1 for result in results if result.succeeded)
                     for i, result in enumerate(results):
                         if not result.succeeded:
                             print(
-                                f"  Failed document (original index {i}): ID={documents[i].get('product_id') or documents[i].get('customer_id') or documents[i].get('order_id')}, Error: {result.error_message}")
+                                f"  Failed document: ID={batch[i].get('product_id') or batch[i].get('customer_id') or batch[i].get('order_id')}, Error: {result.error_message}")
+
+                if total_documents == 0:
+                    print(f"No documents found for index '{index_name}' in {args.data}. Skipping upload.")
+                elif successful_uploads == total_documents:
+                    print(f"Successfully uploaded {successful_uploads} documents to '{index_name}'. ✅")
+                else:
+                    print(
+                        f"Uploaded {successful_uploads}/{total_documents} documents to '{index_name}'. Some uploads may have failed.")
+
+                if store_writer is not None and len(store_writer):
+                    print(f"Embedded {len(store_writer) - reused_embeddings} product descriptions, "
+                          f"reused {reused_embeddings} from {args.embedding_store}.")
+                    store_writer.commit()
+                    # committed, nothing left to abort
+                    store_writer = None
             except Exception as e:
                 print(f"🚨 An error occurred while uploading documents to '{index_name}': {e}")
+            finally:
+                if store_writer is not None:
+                    store_writer.abort()
     else:
         print("No data to upload.")
 
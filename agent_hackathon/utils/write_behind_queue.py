@@ -0,0 +1,237 @@
+# write_behind_queue.py
+"""
+Batched, coalescing write-behind queue for partial document updates (merge) in Azure AI Search.
+
+Updates are submitted per (index, key) with only the changed fields. While an update is waiting to be
+flushed, further updates to the same key are merged into it (later values win), so a burst of changes
+to one document costs a single write. A background thread flushes the pending writes in batches, either
+when a batch is full or after the flush interval.
+
+Every submitted update returns a Future that resolves to a WriteResult once the search service has
+acknowledged the write, i.e. once the document change is persisted by the service. Transient failures
+are retried after an exponential backoff (or the Retry-After the service asked for); permanent failures
+(e.g. unknown key) resolve the Future with succeeded=False.
+"""
+
+import atexit
+import threading
+import time
+from concurrent.futures import Future, InvalidStateError
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from azure.search.documents import SearchClient
+from loguru import logger
+
+from agent_hackathon.data_models import WriteResult
+from agent_hackathon.utils.rate_limiter import retry_after_seconds
+
+# Status codes for which Azure AI Search recommends retrying the indexing action
+RETRYABLE_STATUS_CODES = {409, 422, 429, 503}
+MAX_RETRY_DELAY_SECONDS = 30.0
+
+
+@dataclass
+class _PendingWrite:
+    index_name: str
+    key: str
+    fields: Dict[str, Any]
+    futures: List[Future] = field(default_factory=list)
+    attempts: int = 0
+    queued_at: float = field(default_factory=time.monotonic)
+    # monotonic time before which a failed write is not retried
+    retry_at: float = 0.0
+
+
+class WriteBehindQueue:
+    def __init__(self,
+                 clients: Dict[str, SearchClient],
+                 key_fields: Dict[str, str],
+                 batch_size: int = 100,
+                 flush_interval_seconds: float = 0.5,
+                 max_retries: int = 3,
+                 retry_backoff_seconds: float = 0.5):
+        """
+        Args:
+            clients: index name -> search client with admin (write) permissions
+            key_fields: index name -> name of the key field of that index
+            batch_size: maximum number of documents per merge request
+            flush_interval_seconds: maximum time a write waits before it is flushed
+            max_retries: retries for transient failures before a write is reported as failed
+            retry_backoff_seconds: delay before the first retry, doubled for every further attempt
+        """
+        self.clients = clients
+        self.key_fields = key_fields
+        self.batch_size = batch_size
+        self.flush_interval_seconds = flush_interval_seconds
+        self.max_retries = max_retries
+        self.retry_backoff_seconds = retry_backoff_seconds
+
+        self._pending: Dict[Tuple[str, str], _PendingWrite] = {}
+        self._in_flight = 0
+        # callers waiting in flush(), while there are any pending writes are sent without waiting
+        self._flush_waiters = 0
+        self._closed = False
+        self._condition = threading.Condition()
+        self._worker: Optional[threading.Thread] = None
+        atexit.register(self.close)
+
+    def submit(self, index_name: str, key: str, fields: Dict[str, Any]) -> Future:
+        """Queue a partial update of the document `key` in `index_name`. Returns a Future[WriteResult]."""
+        if index_name not in self.clients:
+            raise ValueError(f"No write client configured for index '{index_name}'")
+        future: Future = Future()
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("Write-behind queue is closed")
+            pending = self._pending.get((index_name, key))
+            if pending is None:
+                pending = _PendingWrite(index_name=index_name, key=key, fields={})
+                self._pending[(index_name, key)] = pending
+            pending.fields.update(fields)
+            pending.futures.append(future)
+            self._ensure_worker()
+            self._condition.notify_all()
+        return future
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Flush all pending writes and wait until they are acknowledged. Returns False on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            self._flush_waiters += 1
+            self._condition.notify_all()
+            try:
+                while self._pending or self._in_flight:
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        return False
+                    self._condition.wait(remaining)
+            finally:
+                self._flush_waiters -= 1
+        return True
+
+    def close(self) -> None:
+        """Flush outstanding writes and stop the background thread."""
+        if self._closed:
+            return
+        self.flush()
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+    def pending_count(self) -> int:
+        with self._condition:
+            return len(self._pending)
+
+    def _ensure_worker(self) -> None:
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._run, name="write-behind-queue", daemon=True)
+            self._worker.start()
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                batch = self._wait_for_batch()
+                if batch is None:
+                    return
+                self._in_flight += len(batch)
+            try:
+                self._write_batch(batch)
+            finally:
+                with self._condition:
+                    self._in_flight -= len(batch)
+                    self._condition.notify_all()
+
+    def _wait_for_batch(self) -> Optional[List[_PendingWrite]]:
+        """Block until a batch is due and take it out of the pending writes. Called with the lock held."""
+        while True:
+            if self._closed and not self._pending:
+                return None
+            now = time.monotonic()
+            # failed writes wait for their backoff, even when flushing
+            ready = [write for write in self._pending.values() if write.retry_at <= now]
+            timeout = None
+            if ready:
+                age = now - min(write.queued_at for write in ready)
+                if self._flush_waiters or self._closed or len(ready) >= self.batch_size \
+                        or age >= self.flush_interval_seconds or any(write.attempts for write in ready):
+                    break
+                timeout = self.flush_interval_seconds - age
+            backing_off = [write.retry_at - now for write in self._pending.values() if write.retry_at > now]
+            if backing_off:
+                timeout = min(backing_off) if timeout is None else min(timeout, *backing_off)
+            self._condition.wait(timeout)
+
+        # one request per index, so only take writes of the index with the first ready write
+        index_name = ready[0].index_name
+        batch = [write for write in ready if write.index_name == index_name][:self.batch_size]
+        for write in batch:
+            del self._pending[(write.index_name, write.key)]
+        return batch
+
+    def _write_batch(self, batch: List[_PendingWrite]) -> None:
+        index_name = batch[0].index_name
+        key_field = self.key_fields[index_name]
+        documents = [{key_field: write.key, **write.fields} for write in batch]
+        for write in batch:
+            write.attempts += 1
+
+        try:
+            results = self.clients[index_name].merge_documents(documents=documents)
+        except Exception as e:
+            logger.error(f"Merge of {len(batch)} documents into '{index_name}' failed: {e}")
+            retry_after = retry_after_seconds(getattr(getattr(e, "response", None), "headers", None))
+            for write in batch:
+                self._retry_or_fail(write, status_code=getattr(e, "status_code", None), error_message=str(e),
+                                    retry_after=retry_after)
+            return
+
+        results_by_key = {result.key: result for result in results}
+        succeeded = 0
+        for write in batch:
+            result = results_by_key.get(write.key)
+            if result is not None and result.succeeded:
+                self._resolve(write, WriteResult(index_name=index_name, key=write.key, succeeded=True,
+                                                 status_code=result.status_code,
+                                                 coalesced_writes=len(write.futures)))
+                succeeded += 1
+            elif result is None:
+                self._retry_or_fail(write, status_code=None, error_message="No indexing result returned")
+            else:
+                self._retry_or_fail(write, status_code=result.status_code, error_message=result.error_message)
+        logger.info(f"Merged {succeeded}/{len(batch)} documents into '{index_name}' "
+                    f"({sum(len(w.futures) for w in batch)} queued updates)")
+
+    def _retry_or_fail(self, write: _PendingWrite, status_code: Optional[int], error_message: Optional[str],
+                       retry_after: Optional[float] = None) -> None:
+        retryable = status_code is None or status_code in RETRYABLE_STATUS_CODES
+        if retryable and write.attempts <= self.max_retries:
+            if retry_after is None:
+                retry_after = self.retry_backoff_seconds * 2 ** (write.attempts - 1)
+            write.retry_at = time.monotonic() + min(retry_after, MAX_RETRY_DELAY_SECONDS)
+            with self._condition:
+                newer = self._pending.get((write.index_name, write.key))
+                if newer is not None:
+                    # updates submitted meanwhile are newer than the failed ones
+                    write.fields.update(newer.fields)
+                    write.futures.extend(newer.futures)
+                self._pending[(write.index_name, write.key)] = write
+                self._condition.notify_all()
+            return
+
+        logger.error(f"Write to '{write.index_name}' for key {write.key} failed: {status_code} {error_message}")
+        self._resolve(write, WriteResult(index_name=write.index_name, key=write.key, succeeded=False,
+                                         status_code=status_code, error_message=error_message,
+                                         coalesced_writes=len(write.futures)))
+
+    @staticmethod
+    def _resolve(write: _PendingWrite, result: WriteResult) -> None:
+        for future in write.futures:
+            # the caller may have cancelled its future meanwhile, that must not stop the worker thread
+            if future.done():
+                continue
+            try:
+                future.set_result(result)
+            except InvalidStateError:
+                # cancelled between the check and set_result
+                pass
@@ -0,0 +1,24 @@
+"""
+The tests run without Azure: they only exercise local logic and never send a request. The settings still
+need the Azure variables, so placeholders are set for the ones missing from the environment.
+"""
+
+import os
+
+for name, value in {
+    "AZURE_OPENAI_KEY": "test",
+    "AZURE_SEARCH_KEY": "test",
+    "AZURE_SEARCH_ADMIN_KEY": "test",
+    "AZURE_OPENAI_KEY_EMBEDDING": "test",
+    "AZURE_OPENAI_ENDPOINT": "https://openai.example.com",
+    "AZURE_OPENAI_GPT_DEPLOYMENT": "gpt",
+    "AZURE_OPENAI_API_VERSION": "2024-10-21",
+    "AZURE_OPENAI_API_VERSION_EMBEDDING": "2024-10-21",
+    "AZURE_OPENAI_ENDPOINT_EMBEDDING": "https://openai.example.com",
+    "AZURE_OPENAI_EMBEDDING_DEPLOYMENT": "embedding",
+    "AZURE_OPENAI_EMBEDDING_MODEL_NAME": "text-embedding-3-small",
+    "AZURE_SPEECH_REGION": "westeurope",
+    "AZURE_SEARCH_ENDPOINT": "https://search.example.com",
+    "SEARCH_OPTION": "hybrid",
+}.items():
+    os.environ.setdefault(name, value)
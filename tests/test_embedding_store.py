@@ -0,0 +1,87 @@
+import numpy as np
+import pytest
+
+from agent_hackathon.utils import embedding_store
+from agent_hackathon.utils.embedding_store import EmbeddingStore, EmbeddingStoreWriter, content_hash
+
+
+def random_rows(count, dim=16, seed=0):
+    vectors = np.random.default_rng(seed).normal(size=(count, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return [(f"PROD{i}", content_hash(f"product {i}", "model"), vectors[i]) for i in range(count)], vectors
+
+
+def versions(path):
+    return sorted(p.name for p in path.iterdir() if p.name.startswith(embedding_store.VERSION_PREFIX))
+
+
+def test_round_trip(tmp_path):
+    rows, vectors = random_rows(10)
+    store = EmbeddingStore.write(tmp_path, "model", rows, quantizations=("int8", "binary"))
+
+    reopened = EmbeddingStore(tmp_path)
+    assert EmbeddingStore.exists(tmp_path)
+    assert (reopened.model, reopened.dim, len(reopened)) == ("model", 16, 10)
+    assert reopened.product_ids == store.product_ids == [row[0] for row in rows]
+    np.testing.assert_array_equal(reopened.vector("PROD3"), vectors[3])
+    assert reopened.vector_for_hash(rows[4][1]) == vectors[4].tolist()
+    assert reopened.vector("PROD99") is None
+
+
+def test_search_finds_the_query_vector(tmp_path, monkeypatch):
+    # small chunks, so the scans cover several chunks
+    monkeypatch.setattr(embedding_store, "SCAN_CHUNK_ROWS", 7)
+    rows, vectors = random_rows(50)
+    store = EmbeddingStore.write(tmp_path, "model", rows, quantizations=("int8", "binary"))
+
+    expected = np.argsort(-(vectors @ vectors[17]))[:3]
+    exact = store.search(vectors[17], top_k=3, quantization="none")
+    assert [match.product_id for match in exact] == [f"PROD{i}" for i in expected]
+    assert exact[0].score == pytest.approx(1.0, abs=1e-5)
+    for quantization in ("int8", "binary"):
+        assert store.search(vectors[17], top_k=1, quantization=quantization)[0].product_id == "PROD17"
+    assert len(store.search(vectors[0], top_k=100, quantization="none")) == 50
+
+
+def test_missing_sidecar_is_an_error(tmp_path):
+    rows, vectors = random_rows(3)
+    store = EmbeddingStore.write(tmp_path, "model", rows, quantizations=())
+    with pytest.raises(ValueError):
+        store.search(vectors[0], quantization="int8")
+
+
+def test_old_versions_are_pruned(tmp_path):
+    rows, _ = random_rows(3)
+    for _ in range(4):
+        EmbeddingStore.write(tmp_path, "model", rows)
+    active = (tmp_path / embedding_store.CURRENT_FILE).read_text(encoding="utf-8")
+    assert len(versions(tmp_path)) == embedding_store.KEEP_VERSIONS
+    assert versions(tmp_path)[-1] == active
+
+
+def test_open_store_survives_a_new_version(tmp_path):
+    rows, vectors = random_rows(3)
+    old = EmbeddingStore.write(tmp_path, "model", rows)
+    new_rows, new_vectors = random_rows(3, seed=1)
+    for _ in range(3):
+        EmbeddingStore.write(tmp_path, "model", new_rows)
+
+    np.testing.assert_array_equal(old.vector("PROD0"), vectors[0])
+    np.testing.assert_array_equal(EmbeddingStore(tmp_path).vector("PROD0"), new_vectors[0])
+
+
+def test_writer_leaves_nothing_behind_without_commit(tmp_path):
+    rows, _ = random_rows(3)
+    with pytest.raises(RuntimeError):
+        with EmbeddingStoreWriter(tmp_path, "model") as writer:
+            writer.add(*rows[0])
+            raise RuntimeError("upload failed")
+    assert list(tmp_path.iterdir()) == []
+    assert not EmbeddingStore.exists(tmp_path)
+
+
+def test_writer_rejects_mixed_dimensions(tmp_path):
+    with EmbeddingStoreWriter(tmp_path, "model") as writer:
+        writer.add("PROD0", "hash0", [1.0, 0.0])
+        with pytest.raises(ValueError):
+            writer.add("PROD1", "hash1", [1.0, 0.0, 0.0])
@@ -0,0 +1,53 @@
+import asyncio
+from types import SimpleNamespace
+
+from agents import HandoffInputData, ModelResponse, Usage
+
+from agent_hackathon.handoff_filters import CONTEXT_MESSAGE_PREFIX, HandoffTranscript, handoff_input_filter
+from agent_hackathon.utils.model_tiering import TieredModel
+
+HISTORY = (
+    {"role": "user", "content": "Hi, I am CUST001."},
+    {"role": "assistant", "content": "Hello! How can I help?"},
+    {"role": "user", "content": "Where is ORD001?"},
+)
+
+
+class FakeModel:
+    async def get_response(self, *args, **kwargs):
+        return ModelResponse(output=[], usage=Usage(), response_id=None)
+
+
+def handoff(target):
+    return handoff_input_filter(target)(HandoffInputData(input_history=HISTORY, pre_handoff_items=(), new_items=()))
+
+
+def test_specialist_input_is_condensed_and_the_transcript_keeps_the_history():
+    async def scenario():
+        transcript = HandoffTranscript.start()
+        return transcript, handoff("OrderManagementAgent")
+
+    transcript, data = asyncio.run(scenario())
+    assert data.input_history[0]["content"].startswith(CONTEXT_MESSAGE_PREFIX)
+    assert "ORD001" in data.input_history[0]["content"]
+    assert {"role": "assistant", "content": "Hello! How can I help?"} not in data.input_history
+    # the run ended without new items
+    assert transcript.input_list(SimpleNamespace(new_items=[])) == list(HISTORY)
+
+
+def test_handoff_is_timed_up_to_the_first_response_of_the_receiving_agent():
+    coordinator = TieredModel("CustomerSupportCoordinator", FakeModel(), "small")
+    specialist = TieredModel("OrderManagementAgent", FakeModel(), "small")
+
+    async def scenario():
+        transcript = HandoffTranscript.start()
+        handoff("OrderManagementAgent")
+        await coordinator.get_response()
+        assert transcript.handoff_latencies == []
+        await specialist.get_response()
+        await specialist.get_response()
+        return transcript
+
+    transcript = asyncio.run(scenario())
+    assert [agent for agent, _ in transcript.handoff_latencies] == ["OrderManagementAgent"]
+    assert transcript.handoff_latencies[0][1] >= 0
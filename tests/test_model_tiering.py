@@ -0,0 +1,84 @@
+import asyncio
+import re
+
+from agents import FunctionTool, ModelResponse, Usage
+from openai.types.responses import (
+    ResponseFunctionToolCall,
+    ResponseOutputMessage,
+    ResponseOutputRefusal,
+    ResponseOutputText,
+)
+
+from agent_hackathon.utils.model_tiering import TieredModel, turn_failure
+
+ORDER_ID = re.compile(r"\bORD\d+\b")
+TOOLS = [FunctionTool(name="transfer_to_orders", description="", params_json_schema={}, on_invoke_tool=None)]
+
+
+def message(*parts):
+    return ModelResponse(output=[ResponseOutputMessage(id="msg", type="message", role="assistant",
+                                                       status="completed", content=list(parts))],
+                         usage=Usage(), response_id=None)
+
+
+def text(value):
+    return ResponseOutputText(type="output_text", text=value, annotations=[])
+
+
+def tool_call(name, arguments="{}"):
+    return ModelResponse(output=[ResponseFunctionToolCall(type="function_call", call_id="call", name=name,
+                                                          arguments=arguments)],
+                         usage=Usage(), response_id=None)
+
+
+def failure(response, user_message="Hello!"):
+    return turn_failure(response, TOOLS, [], [{"role": "user", "content": user_message}], ORDER_ID)
+
+
+def test_direct_replies_are_valid():
+    assert failure(message(text("Hi, how can I help you?"))) is None
+    assert failure(message(text("Which order do you mean?")), "Where is my order?") is None
+
+
+def test_valid_tool_call():
+    assert failure(tool_call("transfer_to_orders"), "Where is ORD001?") is None
+
+
+def test_real_failures():
+    assert failure(message(ResponseOutputRefusal(type="refusal", refusal="I can't help."))) == "refusal"
+    assert failure(message(text("  "))) == "empty response"
+    assert failure(ModelResponse(output=[], usage=Usage(), response_id=None)) == "empty response"
+    assert failure(tool_call("transfer_to_billing")).startswith("unknown tool")
+    assert failure(tool_call("transfer_to_orders", "{not json")).startswith("invalid JSON")
+
+
+def test_named_entity_requires_a_tool_call():
+    assert failure(message(text("Your order is on its way.")), "Where is ORD001?") is not None
+    # only the latest user message counts
+    items = [{"role": "user", "content": "Where is ORD001?"}, {"role": "assistant", "content": "Shipped."},
+             {"role": "user", "content": [{"type": "input_text", "text": "Thanks!"}]}]
+    assert turn_failure(message(text("You're welcome.")), TOOLS, [], items, ORDER_ID) is None
+
+
+class FakeModel:
+    def __init__(self, response):
+        self.response = response
+        self.calls = 0
+
+    async def get_response(self, *args, **kwargs):
+        self.calls += 1
+        return self.response
+
+
+def test_only_failed_turns_are_escalated():
+    small, large = FakeModel(message(text("Hi!"))), FakeModel(tool_call("transfer_to_orders"))
+    model = TieredModel("Coordinator", small, "small", large, "large", require_tool_call_for=ORDER_ID)
+
+    def turn(user_message):
+        return asyncio.run(model.get_response(input=[{"role": "user", "content": user_message}], tools=TOOLS,
+                                              handoffs=[]))
+
+    assert turn("Hello") is small.response
+    assert large.calls == 0
+    assert turn("Status of ORD002?") is large.response
+    assert large.calls == 1
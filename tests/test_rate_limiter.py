@@ -0,0 +1,38 @@
+import asyncio
+
+import httpx
+
+from agent_hackathon.utils.rate_limiter import AdaptiveRateLimiter, retry_after_seconds
+
+
+def test_retry_after_headers():
+    assert retry_after_seconds(httpx.Headers({"Retry-After-Ms": "250"})) == 0.25
+    assert retry_after_seconds({"retry-after": "2"}) == 2.0
+    assert retry_after_seconds({"retry-after": "Wed, 21 Oct 2026 07:28:00 GMT"}) is None
+    assert retry_after_seconds(None) is None
+
+
+def test_earlier_deadline_replaces_the_pending_timer():
+    # 10 tokens per second, the bucket starts full
+    limiter = AdaptiveRateLimiter("test", requests_per_minute=0, tokens_per_minute=600)
+    limiter.acquire(600, session_id="a")
+    limiter.release(200)
+
+    async def scenario():
+        # needs a full bucket again: a dispatch timer of ~60s
+        expensive = asyncio.create_task(limiter.acquire_async(600, session_id="a"))
+        await asyncio.sleep(0.01)
+        expensive.cancel()
+        # due after ~0.1s, must not wait for the timer of the cancelled request
+        return await asyncio.wait_for(limiter.acquire_async(1, session_id="b"), timeout=2)
+
+    assert asyncio.run(scenario()) < 1
+    assert limiter.stats().in_flight == 1
+
+
+def test_throttling_halves_the_concurrency():
+    limiter = AdaptiveRateLimiter("test", requests_per_minute=0, tokens_per_minute=0, max_concurrency=8)
+    limiter.acquire(1)
+    limiter.release(429, retry_after_s=0.01)
+    stats = limiter.stats()
+    assert (stats.throttle_events, stats.concurrency_limit) == (1, 4)
@@ -0,0 +1,88 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from agent_hackathon.utils.run_control import RunCancelled, RunController
+
+
+def responder(answered, started=None, delay=0.05, finish=False, tokens=0):
+    """respond() that records the messages it answered, after `delay` seconds."""
+    async def respond(run):
+        run.context = SimpleNamespace(usage=SimpleNamespace(total_tokens=tokens))
+        if started is not None:
+            started.set()
+        if finish:
+            run.finish()
+        await asyncio.sleep(delay)
+        answered.append(list(run.messages))
+        return run.messages[-1]
+    return respond
+
+
+def test_runs_of_a_session_wait_for_each_other():
+    controller = RunController(max_concurrent_runs=4, cancel_superseded=False)
+    answered = []
+
+    async def scenario():
+        return await asyncio.gather(controller.run("s1", "first", responder(answered)),
+                                    controller.run("s1", "second", responder(answered)))
+
+    assert asyncio.run(scenario()) == ["first", "second"]
+    assert answered == [["first"], ["second"]]
+    assert controller.stats().runs_completed == 2
+
+
+def test_new_message_supersedes_the_run_in_flight():
+    controller = RunController(max_concurrent_runs=4, cancel_superseded=True)
+    answered = []
+
+    async def scenario():
+        started = asyncio.Event()
+        first = asyncio.create_task(controller.run("s1", "first", responder(answered, started, tokens=120)))
+        await started.wait()
+        second = await controller.run("s1", "second", responder(answered))
+        with pytest.raises(RunCancelled):
+            await first
+        return second
+
+    assert asyncio.run(scenario()) == "second"
+    # the cancelled run's message is answered by the newer run
+    assert answered == [["first", "second"]]
+    stats = controller.stats()
+    assert (stats.runs_superseded, stats.runs_completed, stats.wasted_tokens) == (1, 1, 120)
+
+
+def test_waiting_messages_are_dropped_for_the_latest():
+    controller = RunController(max_concurrent_runs=4, cancel_superseded=True)
+    answered = []
+
+    async def scenario():
+        started = asyncio.Event()
+        first = asyncio.create_task(controller.run("s1", "first", responder(answered, started, finish=True)))
+        await started.wait()
+        # the first run is finishing, so it is not cancelled; the second message waits and is superseded
+        second = asyncio.create_task(controller.run("s1", "second", responder(answered)))
+        await asyncio.sleep(0)
+        third = await controller.run("s1", "third", responder(answered))
+        with pytest.raises(RunCancelled):
+            await second
+        return await first, third
+
+    assert asyncio.run(scenario()) == ("first", "third")
+    assert answered == [["first"], ["second", "third"]]
+
+
+def test_runs_beyond_the_limit_are_queued():
+    controller = RunController(max_concurrent_runs=1, cancel_superseded=False)
+    answered = []
+
+    async def scenario():
+        return await asyncio.gather(*(controller.run(f"s{i}", f"message {i}", responder(answered))
+                                      for i in range(3)))
+
+    assert asyncio.run(scenario()) == ["message 0", "message 1", "message 2"]
+    stats = controller.stats()
+    # the first run got the slot right away, the other two waited
+    assert (stats.max_queue_depth, stats.active_runs, stats.queue_depth) == (2, 0, 0)
+    assert stats.mean_queue_wait_ms > 0
@@ -0,0 +1,84 @@
+import pytest
+
+from agent_hackathon.utils import session_store
+from agent_hackathon.utils.session_store import InMemorySessionStore, SQLiteSessionStore
+
+HISTORY = [{"role": "user", "content": "Where is ORD001?"}, {"role": "assistant", "content": "It has shipped."}]
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_store(request, tmp_path):
+    def make(ttl_seconds=3600.0):
+        if request.param == "memory":
+            return InMemorySessionStore(ttl_seconds)
+        return SQLiteSessionStore(str(tmp_path / "sessions.sqlite3"), ttl_seconds)
+    return make
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Wall clock of the session store, advanced by hand."""
+    class Clock:
+        now = 1_000_000.0
+
+        def time(self):
+            return self.now
+
+    clock = Clock()
+    monkeypatch.setattr(session_store.time, "time", clock.time)
+    return clock
+
+
+def test_round_trip(make_store):
+    store = make_store()
+    store.save("s1", HISTORY, "OrderManagementAgent")
+    session = store.load("s1")
+    assert (session.agent_name, session.item_count, session.items) == ("OrderManagementAgent", 2, HISTORY)
+    assert store.load("unknown") is None
+
+
+def test_only_changed_items_are_rewritten(make_store):
+    store = make_store()
+    first = store.save("s1", HISTORY, "CustomerSupportCoordinator")
+    longer = [*HISTORY, {"role": "user", "content": "Thanks!"}]
+    store.save("s1", longer, "CustomerSupportCoordinator", previous=first)
+    assert store.load("s1").items == longer
+    assert store.stats().items_written == 3
+
+
+def test_expired_session_is_not_loaded_and_evicted(make_store, clock):
+    store = make_store(ttl_seconds=60)
+    store.save("old", HISTORY, "CustomerSupportCoordinator")
+    clock.now += 61
+    assert store.load("old") is None
+
+    clock.now += session_store.EVICTION_INTERVAL_S
+    # a save triggers the eviction of sessions idle for longer than the TTL
+    store.save("new", HISTORY, "CustomerSupportCoordinator")
+    stats = store.stats()
+    assert stats.evicted == 1
+    assert set(stats.session_bytes) == {"new"}
+    assert store.load("new") is not None
+
+
+def test_cached_session_is_reused_until_saved_elsewhere(make_store, clock):
+    store = make_store()
+    saved = store.save("s1", HISTORY, "CustomerSupportCoordinator")
+    assert store.load("s1", cached=saved) is saved
+
+    clock.now += 1
+    # another worker continues the conversation
+    other = [*HISTORY, {"role": "user", "content": "And ORD002?"}]
+    store.save("s1", other, "OrderManagementAgent")
+    reloaded = store.load("s1", cached=saved)
+    assert reloaded is not saved
+    assert reloaded.items == other
+
+
+def test_delete_drops_the_session_and_its_stats(make_store):
+    store = make_store()
+    store.save("s1", HISTORY, "CustomerSupportCoordinator")
+    store.delete("s1")
+    assert store.load("s1") is None
+    assert store.stats().session_bytes == {}
+
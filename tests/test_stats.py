@@ -0,0 +1,38 @@
+import threading
+from dataclasses import dataclass, field
+
+from agent_hackathon.utils.stats import StatsRecorder
+
+
+@dataclass
+class Counts:
+    calls: int = 0
+    sizes: dict = field(default_factory=dict)
+
+
+def test_concurrent_updates_are_not_lost():
+    recorder = StatsRecorder(Counts)
+
+    def work():
+        for _ in range(1000):
+            with recorder.update("a") as stats:
+                stats.calls += 1
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert recorder.get("a").calls == 4000
+
+
+def test_copies_are_detached():
+    recorder = StatsRecorder(Counts)
+    with recorder.update() as stats:
+        stats.sizes["s1"] = 10
+    snapshot = recorder.snapshot()
+    snapshot[None].sizes["s2"] = 20
+    assert recorder.get().sizes == {"s1": 10}
+    assert recorder.get("unknown") == Counts()
+    recorder.clear()
+    assert recorder.snapshot() == {}
@@ -0,0 +1,94 @@
+import asyncio
+
+from agents import FunctionTool, RunContextWrapper
+
+from agent_hackathon.utils.tool_memoization import ToolFailure, memoized, mutating, tool_cache_stats
+
+
+def make_tool(name, results):
+    """A tool returning the given results one after the other, counting its calls."""
+    calls = []
+
+    async def invoke(ctx, input):
+        calls.append(input)
+        return results[len(calls) - 1]
+
+    tool = FunctionTool(name=name, description="", params_json_schema={}, on_invoke_tool=invoke)
+    return tool, calls
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_identical_calls_are_served_from_cache():
+    tool, calls = make_tool("lookup", ["order", "other order"])
+    tool = memoized(tool)
+    ctx = RunContextWrapper(context={})
+
+    async def scenario():
+        return [await tool.on_invoke_tool(ctx, '{"id": "ORD1"}'), await tool.on_invoke_tool(ctx, '{ "id":"ORD1" }')]
+
+    assert run(scenario()) == ["order", "order"]
+    assert len(calls) == 1
+    assert tool_cache_stats(ctx.context).hits == 1
+
+
+def test_failed_lookup_is_retried_on_the_next_call():
+    tool, calls = make_tool("lookup", [ToolFailure("Error retrieving order ORD1: timeout"), "order"])
+    tool = memoized(tool)
+    ctx = RunContextWrapper(context={})
+
+    async def scenario():
+        return [await tool.on_invoke_tool(ctx, '{"id": "ORD1"}') for _ in range(3)]
+
+    first, second, third = run(scenario())
+    assert isinstance(first, ToolFailure)
+    assert second == third == "order"
+    assert len(calls) == 2
+    stats = tool_cache_stats(ctx.context)
+    assert (stats.failures, stats.misses, stats.hits) == (1, 2, 1)
+
+
+def test_concurrent_identical_calls_run_once():
+    calls = []
+
+    async def invoke(ctx, input):
+        calls.append(input)
+        await asyncio.sleep(0.01)
+        return "order"
+
+    tool = memoized(FunctionTool(name="slow", description="", params_json_schema={}, on_invoke_tool=invoke))
+    ctx = RunContextWrapper(context={})
+
+    async def scenario():
+        return await asyncio.gather(*(tool.on_invoke_tool(ctx, '{"id": "ORD1"}') for _ in range(3)))
+
+    assert run(scenario()) == ["order"] * 3
+    assert len(calls) == 1
+
+
+def test_mutating_tool_clears_the_cache():
+    read, read_calls = make_tool("read", ["old name", "new name"])
+    write, _ = make_tool("write", [True])
+    read, write = memoized(read), mutating(write)
+    ctx = RunContextWrapper(context={})
+
+    async def scenario():
+        before = await read.on_invoke_tool(ctx, "{}")
+        await write.on_invoke_tool(ctx, "{}")
+        return before, await read.on_invoke_tool(ctx, "{}")
+
+    assert run(scenario()) == ("old name", "new name")
+    assert len(read_calls) == 2
+
+
+def test_context_without_dict_is_not_memoized():
+    tool, calls = make_tool("lookup", ["a", "b"])
+    tool = memoized(tool)
+    ctx = RunContextWrapper(context=None)
+
+    async def scenario():
+        return [await tool.on_invoke_tool(ctx, "{}"), await tool.on_invoke_tool(ctx, "{}")]
+
+    assert run(scenario()) == ["a", "b"]
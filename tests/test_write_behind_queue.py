@@ -0,0 +1,116 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from agent_hackathon.utils.write_behind_queue import WriteBehindQueue
+
+
+class FakeClient:
+    """Records merged batches; `outcomes` lists what the following requests return (status code per key)."""
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.batches = []
+        self.sent_at = []
+
+    def merge_documents(self, documents):
+        self.batches.append(documents)
+        self.sent_at.append(time.monotonic())
+        outcome = self.outcomes.pop(0) if self.outcomes else 200
+        if isinstance(outcome, Exception):
+            raise outcome
+        return [SimpleNamespace(key=document["id"], succeeded=outcome == 200, status_code=outcome,
+                                error_message=None if outcome == 200 else "failed")
+                for document in documents]
+
+
+def make_queue(client, **kwargs):
+    return WriteBehindQueue({"customers": client}, {"customers": "id"}, retry_backoff_seconds=0.01, **kwargs)
+
+
+def test_updates_to_one_document_are_coalesced():
+    client = FakeClient()
+    queue = make_queue(client, flush_interval_seconds=10)
+    futures = [queue.submit("customers", "CUST001", {"first_name": "Ann"}),
+               queue.submit("customers", "CUST001", {"last_name": "Lee"}),
+               queue.submit("customers", "CUST001", {"first_name": "Anna"}),
+               queue.submit("customers", "CUST002", {"first_name": "Bo"})]
+    assert queue.flush(timeout=5)
+
+    assert client.batches == [[{"id": "CUST001", "first_name": "Anna", "last_name": "Lee"},
+                               {"id": "CUST002", "first_name": "Bo"}]]
+    results = [future.result(timeout=1) for future in futures]
+    assert all(result.succeeded for result in results)
+    assert [result.coalesced_writes for result in results] == [3, 3, 3, 1]
+    queue.close()
+
+
+def test_transient_failures_are_retried_with_backoff():
+    client = FakeClient(503, 503)
+    queue = make_queue(client, flush_interval_seconds=0)
+    future = queue.submit("customers", "CUST001", {"first_name": "Ann"})
+    result = future.result(timeout=5)
+
+    assert result.succeeded
+    assert len(client.batches) == 3
+    # 0.01s, then 0.02s
+    assert client.sent_at[2] - client.sent_at[1] >= 0.02
+    queue.close()
+
+
+def test_retry_after_of_the_service_is_respected():
+    error = Exception("throttled")
+    error.response = SimpleNamespace(headers={"retry-after-ms": "200"})
+    client = FakeClient(error)
+    queue = make_queue(client, flush_interval_seconds=0)
+    assert queue.submit("customers", "CUST001", {"first_name": "Ann"}).result(timeout=5).succeeded
+    assert client.sent_at[1] - client.sent_at[0] >= 0.2
+    queue.close()
+
+
+def test_permanent_and_exhausted_failures_resolve_as_failed():
+    client = FakeClient(404, 503, 503)
+    queue = make_queue(client, flush_interval_seconds=0, max_retries=1)
+    not_found = queue.submit("customers", "CUST404", {"first_name": "Ann"}).result(timeout=5)
+    assert (not_found.succeeded, not_found.status_code) == (False, 404)
+
+    unavailable = queue.submit("customers", "CUST001", {"first_name": "Ann"}).result(timeout=5)
+    assert (unavailable.succeeded, unavailable.status_code) == (False, 503)
+    assert len(client.batches) == 3
+    queue.close()
+
+
+def test_cancelled_future_does_not_keep_the_others_from_resolving():
+    client = FakeClient()
+    queue = make_queue(client, flush_interval_seconds=10)
+    cancelled = queue.submit("customers", "CUST001", {"first_name": "Ann"})
+    coalesced = queue.submit("customers", "CUST001", {"last_name": "Lee"})
+    other = queue.submit("customers", "CUST002", {"first_name": "Bo"})
+    assert cancelled.cancel()
+    assert queue.flush(timeout=5)
+
+    assert coalesced.result(timeout=1).succeeded
+    assert other.result(timeout=1).succeeded
+    queue.close()
+
+
+def test_flush_times_out_while_the_service_hangs():
+    release = threading.Event()
+    client = FakeClient()
+    merge = client.merge_documents
+    client.merge_documents = lambda documents: (release.wait(5), merge(documents))[1]
+    queue = make_queue(client, flush_interval_seconds=0)
+    queue.submit("customers", "CUST001", {"first_name": "Ann"})
+    assert not queue.flush(timeout=0.05)
+    release.set()
+    assert queue.flush(timeout=5)
+    queue.close()
+
+
+def test_submit_to_unknown_index_is_rejected():
+    queue = make_queue(FakeClient())
+    with pytest.raises(ValueError):
+        queue.submit("orders", "ORD001", {"status": "shipped"})
+    queue.close()